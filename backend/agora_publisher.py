@@ -0,0 +1,145 @@
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import aiohttp
+from agora_token_builder import RtmTokenBuilder
+
+from metrics import Counter, Histogram
+
+PUBLISH_SECONDS = Histogram('agora_publish_seconds', 'Agora RTM publish request latency, per attempt', ['status'])
+PUBLISH_TOTAL = Counter('agora_publish_total', 'Agora RTM publishes by result', ['result'])
+
+
+class AgoraPublishError(Exception):
+    """Publishing to Agora RTM failed after all retries"""
+
+
+class AgoraPublisher:
+    """Long-lived Agora RTM REST publisher.
+
+    Keeps one pooled keep-alive session and a cached server RTM token, so a
+    publish is a single warm request. Created and closed in the app lifespan.
+    """
+
+    def __init__(self, app_id: str, app_certificate: str, server_user_id: str,
+                 base_url: str = "https://api.agora.io", token_ttl: int = 3600,
+                 refresh_margin: int = 300, timeout: float = 5.0, retries: int = 3,
+                 backoff: float = 0.2):
+        self.app_id = app_id
+        self.app_certificate = app_certificate
+        self.server_user_id = server_user_id
+        self.base_url = base_url.rstrip('/')
+        self.token_ttl = token_ttl
+        self.refresh_margin = refresh_margin
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._token: Optional[str] = None
+        self._token_expires = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Idempotency keys already delivered, so a retried broadcast isn't sent twice
+        self._published: "OrderedDict[str, float]" = OrderedDict()
+
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/dev/v2/project/{self.app_id}/rtm/users/{self.server_user_id}/channel_messages"
+
+    def token(self) -> str:
+        """Server RTM token, rebuilt shortly before it expires"""
+        now = int(time.time())
+        if self._token is None or now >= self._token_expires - self.refresh_margin:
+            self._token_expires = now + self.token_ttl
+            self._token = RtmTokenBuilder.buildToken(
+                self.app_id,
+                self.app_certificate,
+                self.server_user_id,
+                1,  # Role.Rtm_User
+                self._token_expires
+            )
+        return self._token
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        # Build the token now rather than on the first broadcast
+        self.token()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _remember(self, idempotency_key: str):
+        self._published[idempotency_key] = time.time()
+        while len(self._published) > 10000:
+            self._published.popitem(last=False)
+
+    async def publish(self, channel: str, payload: str, idempotency_key: Optional[str] = None,
+                      historical: bool = True) -> bool:
+        """Publish payload to channel; returns False if idempotency_key was already delivered"""
+        if idempotency_key and idempotency_key in self._published:
+            PUBLISH_TOTAL.inc(result='duplicate')
+            return False
+        if self._session is None or self._session.closed:
+            await self.start()
+
+        body = {
+            "channel_name": channel,
+            "payload": payload,
+            "enable_historical_messaging": historical
+        }
+        last_error = ""
+
+        for attempt in range(self.retries + 1):
+            headers = {
+                "Content-Type": "application/json",
+                "x-agora-token": self.token(),
+                "x-agora-uid": self.server_user_id
+            }
+            if idempotency_key:
+                headers["X-Request-ID"] = idempotency_key
+
+            start = time.perf_counter()
+            try:
+                async with self._session.post(self.url, headers=headers, json=body) as response:
+                    PUBLISH_SECONDS.observe(time.perf_counter() - start, status=response.status)
+                    if response.status == 200:
+                        if idempotency_key:
+                            self._remember(idempotency_key)
+                        PUBLISH_TOTAL.inc(result='ok')
+                        return True
+                    last_error = f"{response.status} {await response.text()}"
+                    # Client errors won't succeed on retry (except rate limiting)
+                    if response.status < 500 and response.status != 429:
+                        break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                PUBLISH_SECONDS.observe(time.perf_counter() - start, status='error')
+                last_error = str(e) or type(e).__name__
+
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+        PUBLISH_TOTAL.inc(result='failed')
+        raise AgoraPublishError(f"Agora RTM failed: {last_error}")
+
+    async def publish_many(self, messages: List[Tuple[str, str]], key_prefix: Optional[str] = None,
+                           concurrency: int = 8) -> int:
+        """Publish (channel, payload) pairs concurrently; returns how many were sent"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(channel: str, payload: str) -> bool:
+            async with semaphore:
+                key = f"{key_prefix}:{channel}" if key_prefix else None
+                return await self.publish(channel, payload, idempotency_key=key)
+
+        results = await asyncio.gather(*(send(c, p) for c, p in messages), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            raise AgoraPublishError(f"{len(errors)}/{len(messages)} channels failed: {errors[0]}")
+        return sum(1 for r in results if r is True)
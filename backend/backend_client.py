@@ -0,0 +1,60 @@
+import asyncio
+from typing import Dict, Optional
+
+import aiohttp
+
+
+class BackendError(Exception):
+    """Non-2xx response from the backend API"""
+
+    def __init__(self, status: int, body: str):
+        super().__init__(f"backend returned {status}: {body[:200]}")
+        self.status = status
+        self.body = body
+
+
+class BackendClient:
+    """Shared keep-alive HTTP session to BACKEND_URL for the bot's async handlers"""
+
+    def __init__(self, base_url: str, pool_size: int = 100, timeout: float = 5.0):
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = asyncio.Lock()
+
+    async def session(self) -> aiohttp.ClientSession:
+        # Created lazily so it binds to the event loop the bot actually runs on
+        if self._session is None or self._session.closed:
+            async with self._lock:
+                if self._session is None or self._session.closed:
+                    connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30)
+                    self._session = aiohttp.ClientSession(
+                        connector=connector,
+                        timeout=aiohttp.ClientTimeout(total=self.timeout),
+                    )
+        return self._session
+
+    async def request(self, method: str, path: str, json: Optional[Dict] = None,
+                      timeout: Optional[float] = None) -> Dict:
+        """Send a request and return the decoded JSON body, raising BackendError on non-2xx"""
+        session = await self.session()
+        kwargs = {'json': json} if json is not None else {}
+        if timeout is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=timeout)
+
+        async with session.request(method, f"{self.base_url}{path}", **kwargs) as response:
+            if response.status >= 300:
+                raise BackendError(response.status, await response.text())
+            return await response.json()
+
+    async def get(self, path: str, timeout: Optional[float] = None) -> Dict:
+        return await self.request('GET', path, timeout=timeout)
+
+    async def post(self, path: str, json: Dict, timeout: Optional[float] = None) -> Dict:
+        return await self.request('POST', path, json=json, timeout=timeout)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
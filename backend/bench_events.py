@@ -0,0 +1,288 @@
+"""Load test for the dashboard event streams.
+
+Runs server.app under a real uvicorn server (event streams need a socket;
+httpx's ASGITransport buffers whole responses), opens thousands of SSE and
+WebSocket clients, dispatches broadcasts and measures:
+
+- connect time for every client
+- delivery latency of each `broadcast` and `completed` event, measured from
+  the dispatch request to arrival at each client
+- gaps: every client must see every event ID exactly once, in order,
+  including the clients that disconnect mid-run and resume with Last-Event-ID
+- slow consumers: clients that never read must be dropped (lagged) while
+  publish() stays fast
+
+Prints JSON so runs can be compared release to release.
+
+    python bench_events.py [--sse 2000] [--ws 1000] [--slow 20] [--broadcasts 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from bench_load import fake_llm, percentiles
+
+
+class Client:
+    """One stream client: what it received and when"""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.connect_ms: Optional[float] = None
+        self.ids: List[int] = []
+        self.arrivals: Dict[tuple, float] = {}  # (type, broadcastId) -> perf_counter
+        self.last_id: Optional[int] = None
+        self.resumed = 0
+        self.error: Optional[str] = None
+
+    def received(self, event_id: int, event_type: str, data: Dict):
+        if event_id:  # 0 is the synthetic `reset` event
+            self.ids.append(event_id)
+            self.last_id = event_id
+        if event_type in ('broadcast', 'completed'):
+            key = data.get('id') if event_type == 'broadcast' else data.get('broadcastId')
+            self.arrivals[(event_type, key)] = time.perf_counter()
+
+
+async def read_sse(session, url: str, client: Client, stop: asyncio.Event, drop_after: int = 0):
+    """Read an SSE stream; with drop_after, disconnect after that many events and resume"""
+    while not stop.is_set():
+        headers = {'Last-Event-ID': str(client.last_id)} if client.last_id else {}
+        start = time.perf_counter()
+        try:
+            async with session.get(url, headers=headers) as response:
+                if client.connect_ms is None:
+                    client.connect_ms = (time.perf_counter() - start) * 1000
+                event_id, event_type, seen = 0, None, 0
+                async for line in response.content:
+                    line = line.decode().rstrip('\n')
+                    if line.startswith('id: '):
+                        event_id = int(line[4:])
+                    elif line.startswith('event: '):
+                        event_type = line[7:]
+                    elif line.startswith('data: '):
+                        client.received(event_id, event_type, json.loads(line[6:]))
+                        seen += 1
+                        if drop_after and seen >= drop_after and not client.resumed:
+                            client.resumed += 1
+                            break
+                    if stop.is_set():
+                        return
+        except Exception as e:
+            client.error = repr(e)
+            return
+
+
+async def read_ws(session, url: str, client: Client, stop: asyncio.Event, drop_after: int = 0):
+    while not stop.is_set():
+        query = f"?lastEventId={client.last_id}" if client.last_id else ""
+        start = time.perf_counter()
+        try:
+            async with session.ws_connect(url + query, heartbeat=None) as ws:
+                if client.connect_ms is None:
+                    client.connect_ms = (time.perf_counter() - start) * 1000
+                seen = 0
+                async for message in ws:
+                    frame = json.loads(message.data)
+                    client.received(frame['id'], frame['type'], frame['data'])
+                    seen += 1
+                    if drop_after and seen >= drop_after and not client.resumed:
+                        client.resumed += 1
+                        break
+                    if stop.is_set():
+                        return
+        except Exception as e:
+            client.error = repr(e)
+            return
+
+
+async def open_slow(host: str, port: int) -> asyncio.StreamWriter:
+    """An SSE client that connects and then never reads"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # A small receive window, so the stall backs up into the server within a few events
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, (host, port))
+    reader, writer = await asyncio.open_connection(sock=sock)
+    writer.write(f"GET /api/events HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    await writer.drain()
+    return writer
+
+
+async def flood_slow_clients(server, count: int, event_bytes: int) -> Dict:
+    """With only the non-reading clients left, publish until the hub drops them all.
+
+    Done after the main run so the other clients aren't made to download the
+    flood; publish() must stay fast while the stalled clients back up.
+    """
+    lagged = server.metrics.REGISTRY._metrics['event_stream_lagged_total']
+    before = lagged.value()
+    padding = "x" * event_bytes
+    publish_ms: List[float] = []
+    start = time.perf_counter()
+    while lagged.value() - before < count and time.perf_counter() - start < 30:
+        t = time.perf_counter()
+        server.event_hub.publish('bench', {'padding': padding})
+        publish_ms.append((time.perf_counter() - t) * 1000)
+        # Let the stream tasks run and fill the sockets
+        await asyncio.sleep(0.001)
+    return {
+        'clients': count,
+        'dropped': int(lagged.value() - before),
+        'eventsUntilAllDropped': len(publish_ms),
+        'publishMs': percentiles(publish_ms),
+        'stillConnected': len(server.event_hub),
+    }
+
+
+def gaps(client: Client, expected: List[int]) -> bool:
+    """True unless the client saw exactly the expected IDs in order"""
+    return client.ids != expected
+
+
+async def main_async(args) -> Dict:
+    import aiohttp
+    import uvicorn
+
+    workdir = tempfile.mkdtemp(prefix="bench_events_")
+    os.environ.update({
+        'DATABASE_PATH': os.path.join(workdir, "bench.db"),
+        'LLM_BACKEND': 'fake',
+        'SMS_GATEWAY_STUB': 'true',
+        'EVENT_QUEUE_SIZE': str(args.queue_size),
+        'EVENT_HISTORY': str(max(1000, args.broadcasts * 4)),
+    })
+    import server
+
+    config = uvicorn.Config(server.app, host="127.0.0.1", port=0, log_config=None, log_level="warning",
+                            backlog=max(2048, args.sse + args.ws + args.slow))
+    uvicorn_server = uvicorn.Server(config)
+    serving = asyncio.create_task(uvicorn_server.serve())
+    while not uvicorn_server.started:
+        await asyncio.sleep(0.01)
+    server.llm.backend.responder = fake_llm
+    port = uvicorn_server.servers[0].sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+
+    stop = asyncio.Event()
+    clients = [Client('sse') for _ in range(args.sse)] + [Client('ws') for _ in range(args.ws)]
+    # Every tenth client disconnects partway through and resumes from its last event ID
+    drop_after = max(1, args.broadcasts)
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=None)) as session:
+        start = time.perf_counter()
+        readers = [
+            asyncio.create_task(
+                (read_sse if c.kind == 'sse' else read_ws)(
+                    session, base + ("/api/events" if c.kind == 'sse' else "/api/events/ws"), c, stop,
+                    drop_after if i % 10 == 0 else 0)
+            )
+            for i, c in enumerate(clients)
+        ]
+        slow = [await open_slow("127.0.0.1", port) for _ in range(args.slow)]
+        while len(server.event_hub) < len(clients) + len(slow):
+            if time.perf_counter() - start > 60:
+                break
+            await asyncio.sleep(0.05)
+        connected_s = time.perf_counter() - start
+
+        padding = "x" * args.message_bytes
+        dispatched: Dict[int, float] = {}
+        run_start = time.perf_counter()
+        for i in range(args.broadcasts):
+            sent_at = time.perf_counter()
+            async with session.post(base + "/api/broadcasts/dispatch", json={
+                'message': f"Load test alert {i} {padding}",
+                'sourceLanguage': 'en',
+                'channels': ['sms_gateway']
+            }) as response:
+                dispatched[(await response.json())['broadcastId']] = sent_at
+            await asyncio.sleep(args.interval)
+
+        # Let the last events drain before measuring
+        expected = [event.id for event in server.event_hub._history]
+        deadline = time.perf_counter() + 30
+        while any(c.ids[-1:] != expected[-1:] for c in clients if not c.error) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        run_s = time.perf_counter() - run_start
+
+        stop.set()
+        for task in readers:
+            task.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+        slow_result = await flood_slow_clients(server, len(slow), args.slow_event_bytes)
+        for writer in slow:
+            writer.close()
+
+    uvicorn_server.should_exit = True
+    await serving
+
+    latencies = {'broadcast': [], 'completed': []}
+    for client in clients:
+        for (event_type, broadcast_id), arrived in client.arrivals.items():
+            if broadcast_id in dispatched:
+                latencies[event_type].append((arrived - dispatched[broadcast_id]) * 1000)
+
+    return {
+        'config': {
+            'python': sys.version.split()[0],
+            'sseClients': args.sse,
+            'wsClients': args.ws,
+            'slowClients': args.slow,
+            'slowEventBytes': args.slow_event_bytes,
+            'broadcasts': args.broadcasts,
+            'messageBytes': args.message_bytes,
+            'queueSize': args.queue_size,
+        },
+        'connect': {
+            'allConnectedS': round(connected_s, 2),
+            'connectMs': percentiles([c.connect_ms for c in clients if c.connect_ms is not None]),
+        },
+        'events': {
+            'published': len(expected),
+            'delivered': sum(len(c.ids) for c in clients),
+            'perSecond': round(sum(len(c.ids) for c in clients) / run_s, 1),
+            'broadcastLatencyMs': percentiles(latencies['broadcast']),
+            'completedLatencyMs': percentiles(latencies['completed']),
+        },
+        'correctness': {
+            'clientsWithGaps': sum(gaps(c, expected) for c in clients),
+            'resumedClients': sum(c.resumed for c in clients),
+            'clientErrors': sum(1 for c in clients if c.error),
+        },
+        'slowConsumers': slow_result,
+        'maxRssMb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sse", type=int, default=2000, help="SSE clients")
+    parser.add_argument("--ws", type=int, default=1000, help="WebSocket clients")
+    parser.add_argument("--slow", type=int, default=20, help="SSE clients that never read")
+    parser.add_argument("--broadcasts", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.2, help="seconds between broadcasts")
+    parser.add_argument("--message-bytes", type=int, default=200, help="padding per broadcast message")
+    parser.add_argument("--slow-event-bytes", type=int, default=64 * 1024,
+                        help="event size for the slow-consumer phase (must outrun the socket buffers)")
+    parser.add_argument("--queue-size", type=int, default=32, help="EVENT_QUEUE_SIZE")
+    parser.add_argument("--output", help="also write the JSON here")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""End-to-end load benchmark.
+
+Runs server.app in-process (httpx ASGITransport) with the fake LLM backend
+and fake_services standing in for the Telegram Bot API and Agora RTM, then
+measures:
+
+- broadcast latency (translate, save, RTM publish, Telegram fan-out) for
+  each simulated subscriber count
+- AI chat throughput through the LLM gateway
+- token endpoint requests/sec
+- startup: module import time, lifespan startup and time until /api/health/ready
+
+Prints JSON so runs can be compared release to release.
+
+    python bench_load.py [--subscribers 10000,100000] [--telegram-latency 0.02]
+                         [--telegram-error-rate 0.01] [--llm-latency 0.5] ...
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from fake_services import FakeServices
+
+APP_ID = "0" * 32
+APP_CERTIFICATE = "1" * 32
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    values = sorted(values)
+    pick = lambda p: round(values[min(len(values) - 1, int(len(values) * p / 100))], 1)
+    return {'p50': pick(50), 'p95': pick(95), 'p99': pick(99), 'max': round(values[-1], 1)}
+
+
+def fake_llm(model_name: str, prompt: str) -> str:
+    """Valid-looking Gemini output: a JSON object for translation prompts, short text for chat"""
+    if "Required Translations" in prompt:
+        message = prompt.split("**Original Message (English):**", 1)[1].split("**Required", 1)[0].strip()
+        codes = re.findall(r'^\s*"([a-z]+)": "[A-Za-z]+",?$', prompt, re.MULTILINE)
+        return json.dumps({code: f"[{code}] {message}" for code in codes}, ensure_ascii=False)
+    return "Please follow the stewards to the nearest marked exit and stay calm."
+
+
+def seed_subscribers(db_path: str, count: int):
+    conn = sqlite3.connect(db_path)
+    conn.execute('DELETE FROM telegram_subscribers')
+    languages = ['en', 'hi', 'ta', 'te', 'bn', 'mr']
+    conn.executemany(
+        'INSERT INTO telegram_subscribers (user_id, username, first_name, language, subscribed_at, last_seen) '
+        'VALUES (?, ?, ?, ?, ?, ?)',
+        [(i, f"user{i}", "Bench", languages[i % len(languages)], "", "") for i in range(1, count + 1)]
+    )
+    conn.commit()
+    conn.close()
+
+
+async def run_concurrently(total: int, concurrency: int, request) -> Dict:
+    """Call request(i) total times from `concurrency` workers; returns rps and latency percentiles"""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await request(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'errors': errors,
+        'rps': round(total / elapsed, 1),
+        'latencyMs': percentiles(latencies)
+    }
+
+
+async def bench_broadcasts(client, fakes: FakeServices, db_path: str, counts: List[int]) -> List[Dict]:
+    results = []
+    for count in counts:
+        seed_subscribers(db_path, count)
+        sent_before = fakes.telegram_sent + fakes.telegram_errors
+        response = await client.post("/api/broadcasts/dispatch", json={
+            'message': f"Benchmark alert for {count} subscribers",
+            'sourceLanguage': 'en',
+            'emergency': True,
+            'channels': ['agora_rtm', 'telegram'],
+            'wait': True
+        })
+        data = response.json()
+        timeline = data.get('timeline', {})
+        channels = {c['channel']: c for c in data.get('channels', [])}
+        telegram = channels.get('telegram', {})
+        fan_out_ms = timeline.get('last_delivery', 0) - timeline.get('saved', 0)
+        results.append({
+            'subscribers': count,
+            'status': response.status_code,
+            'totalMs': data.get('totalMs'),
+            'timeline': timeline,
+            'telegramDelivered': telegram.get('deliveredCount'),
+            'telegramFailed': telegram.get('failedCount'),
+            'telegramRequests': fakes.telegram_sent + fakes.telegram_errors - sent_before,
+            'telegramSendsPerSec': round(telegram.get('deliveredCount', 0) / (fan_out_ms / 1000), 1) if fan_out_ms > 0 else None,
+        })
+    return results
+
+
+async def bench_chat(client, total: int, concurrency: int) -> Dict:
+    # Avoid venue keywords so every request goes through the LLM gateway
+    return await run_concurrently(total, concurrency, lambda i: client.post("/api/ai-chat", json={
+        'message': f"Benchmark question {i}: when does the next show start?",
+        'language': 'en',
+        'userId': f"bench-{i % 500}"
+    }))
+
+
+async def bench_tokens(client, total: int, concurrency: int, users: int) -> Dict:
+    return await run_concurrently(total, concurrency, lambda i: client.get(f"/api/token/rtm/web-listener-{i % users}"))
+
+
+async def main_async(args) -> Dict:
+    import httpx
+
+    fakes = await FakeServices(
+        telegram_latency=args.telegram_latency,
+        telegram_error_rate=args.telegram_error_rate,
+        agora_latency=args.agora_latency,
+        agora_error_rate=args.agora_error_rate,
+    ).start()
+
+    workdir = tempfile.mkdtemp(prefix="bench_load_")
+    db_path = os.path.join(workdir, "bench.db")
+    os.environ.update({
+        'DATABASE_PATH': db_path,
+        'LLM_BACKEND': 'fake',
+        'FAKE_LLM_LATENCY': str(args.llm_latency),
+        'FAKE_LLM_ERROR_RATE': str(args.llm_error_rate),
+        'AGORA_APP_ID': APP_ID,
+        'AGORA_APP_CERTIFICATE': APP_CERTIFICATE,
+        'AGORA_API_BASE_URL': fakes.base_url,
+        'TELEGRAM_BOT_TOKEN': '123456:bench',
+        'TELEGRAM_API_BASE_URL': fakes.telegram_base_url,
+        'TELEGRAM_SEND_RATE': str(args.telegram_rate),
+    })
+
+    start = time.perf_counter()
+    import server
+    import_ms = (time.perf_counter() - start) * 1000
+
+    results = {
+        'config': {
+            'python': sys.version.split()[0],
+            'subscribers': args.subscribers,
+            'telegramLatency': args.telegram_latency,
+            'telegramErrorRate': args.telegram_error_rate,
+            'telegramRate': args.telegram_rate,
+            'agoraLatency': args.agora_latency,
+            'agoraErrorRate': args.agora_error_rate,
+            'llmLatency': args.llm_latency,
+            'llmErrorRate': args.llm_error_rate,
+        }
+    }
+    try:
+        start = time.perf_counter()
+        async with server.lifespan(server.app):
+            lifespan_ms = (time.perf_counter() - start) * 1000
+            server.llm.backend.responder = fake_llm
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                while (await client.get("/api/health/ready")).status_code != 200:
+                    await asyncio.sleep(0.005)
+                results['startup'] = {
+                    'importMs': round(import_ms, 1),
+                    'lifespanMs': round(lifespan_ms, 1),
+                    'readyMs': round((time.perf_counter() - start) * 1000, 1),
+                }
+                if args.subscribers:
+                    results['broadcast'] = await bench_broadcasts(client, fakes, db_path, args.subscribers)
+                if args.chat_requests:
+                    results['chat'] = await bench_chat(client, args.chat_requests, args.concurrency)
+                if args.token_requests:
+                    results['tokens'] = await bench_tokens(client, args.token_requests, args.concurrency, args.token_users)
+    finally:
+        await fakes.stop()
+    results['fakes'] = fakes.stats()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", default="10000,100000",
+                        help="comma-separated subscriber counts to broadcast to ('' to skip)")
+    parser.add_argument("--chat-requests", type=int, default=2000)
+    parser.add_argument("--token-requests", type=int, default=20000)
+    parser.add_argument("--token-users", type=int, default=2000, help="distinct token users (the rest are cache hits)")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent clients for chat and token runs")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="seconds per fake sendMessage")
+    parser.add_argument("--telegram-error-rate", type=float, default=0.0)
+    parser.add_argument("--telegram-rate", type=float, default=0.0, help="TELEGRAM_SEND_RATE (0 = unthrottled)")
+    parser.add_argument("--agora-latency", type=float, default=0.0)
+    parser.add_argument("--agora-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per fake Gemini call")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="also write the JSON here")
+    args = parser.parse_args()
+    args.subscribers = [int(n) for n in args.subscribers.split(",") if n.strip()]
+
+    results = asyncio.run(main_async(args))
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
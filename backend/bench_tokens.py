@@ -0,0 +1,95 @@
+"""Micro-benchmark for Agora token issuance.
+
+Measures tokens/sec for raw HMAC signing, the TokenCache under a reconnect
+storm (same users again), and the HTTP endpoints in-process. Prints JSON.
+
+    python bench_tokens.py [--users 2000] [--rounds 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from agora_token_builder import RtmTokenBuilder
+
+from token_cache import TokenCache
+
+APP_ID = "0" * 32
+APP_CERTIFICATE = "1" * 32
+
+
+def build(user_id: str, expires_at: int) -> str:
+    return RtmTokenBuilder.buildToken(APP_ID, APP_CERTIFICATE, user_id, 1, expires_at)
+
+
+def bench_raw(users):
+    start = time.perf_counter()
+    expires_at = int(time.time()) + 3600
+    for user_id in users:
+        build(user_id, expires_at)
+    return len(users) / (time.perf_counter() - start)
+
+
+async def bench_cache(users, rounds):
+    cache = TokenCache()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for user_id in users:
+            await cache.get_or_issue(('rtm', user_id, None, 1), lambda ts, u=user_id: build(u, ts))
+    elapsed = time.perf_counter() - start
+    return len(users) * rounds / elapsed, cache.hits, cache.misses
+
+
+async def bench_http(users, batch_size=100):
+    import httpx
+
+    os.environ.setdefault("AGORA_APP_ID", APP_ID)
+    os.environ.setdefault("AGORA_APP_CERTIFICATE", APP_CERTIFICATE)
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    import server
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for user_id in users:
+            await client.get(f"/api/token/rtm/{user_id}")
+        single = len(users) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i in range(0, len(users), batch_size):
+            chunk = users[i:i + batch_size]
+            await client.post("/api/token/batch", json={
+                'requests': [{'type': 'rtm', 'userId': u} for u in chunk]
+            })
+        batched = len(users) / (time.perf_counter() - start)
+    return single, batched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--no-http", action="store_true", help="skip the in-process endpoint benchmark")
+    args = parser.parse_args()
+
+    users = [f"web-listener-{i}" for i in range(args.users)]
+    cached_rate, hits, misses = asyncio.run(bench_cache(users, args.rounds))
+    results = {
+        'users': args.users,
+        'rounds': args.rounds,
+        'rawTokensPerSec': round(bench_raw(users)),
+        'cachedTokensPerSec': round(cached_rate),
+        'cacheHits': hits,
+        'cacheMisses': misses,
+    }
+    if not args.no_http:
+        single, batched = asyncio.run(bench_http(users))
+        results['httpSingleTokensPerSec'] = round(single)
+        results['httpBatchTokensPerSec'] = round(batched)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from log_pipeline import SampledLog
+from metrics import Gauge, Histogram
+from rtm_payload import build_payloads as build_rtm_payloads
+
+if TYPE_CHECKING:
+    from agora_publisher import AgoraPublisher
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_SEND_SECONDS = Histogram('telegram_send_seconds', 'Telegram sendMessage latency', ['outcome'])
+TELEGRAM_SENDS_IN_FLIGHT = Gauge('telegram_sends_in_flight', 'Telegram sendMessage calls in progress')
+CHANNEL_DELIVERY_SECONDS = Histogram('channel_delivery_seconds', 'Time for a channel to deliver one broadcast',
+                                     ['channel', 'outcome'])
+
+
+class BroadcastTimeline:
+    """Wall-clock time (epoch seconds) at which a broadcast reached each stage.
+
+    Stages: received, translated, saved, published (handed to Agora RTM),
+    first_delivery, last_delivery, completed, plus first_<channel>_delivery and
+    last_<channel>_delivery for each channel that reached a recipient.
+    first_delivery/last_delivery span those channels only; an RTM publish is
+    not a delivery. Persisted once the broadcast finishes.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {'received': time.time()}
+
+    def mark(self, stage: str):
+        """Record stage, keeping the first time it was reached"""
+        self.stages.setdefault(stage, time.time())
+
+    def delivered(self, channel: str):
+        """A recipient got the alert over channel"""
+        now = time.time()
+        self.merge_deliveries(channel, now, now)
+
+    def merge_deliveries(self, channel: str, first: float, last: float):
+        """Fold in deliveries over channel made between first and last (e.g. by another worker)"""
+        for prefix in ('', f'{channel}_'):
+            first_stage, last_stage = f'first_{prefix}delivery', f'last_{prefix}delivery'
+            self.stages[first_stage] = min(first, self.stages.get(first_stage, first))
+            self.stages[last_stage] = max(last, self.stages.get(last_stage, last))
+
+    def offsets_ms(self) -> Dict[str, float]:
+        """Milliseconds from 'received' to each stage"""
+        start = self.stages['received']
+        return {stage: round((at - start) * 1000, 1) for stage, at in self.stages.items()}
+
+
+@dataclass
+class BroadcastJob:
+    """One translated, saved broadcast handed to every channel adapter"""
+    id: int
+    message: str
+    source_language: str
+    translations: Dict[str, str]
+    location: str = ""
+    radius: int = 5000
+    emergency: bool = False
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    timeline: BroadcastTimeline = field(default_factory=BroadcastTimeline)
+    # Multi-worker fan-out: this job covers subscribers with abs(user_id) % partitions == partition
+    partition: int = 0
+    partitions: int = 1
+
+    @property
+    def targeted(self) -> bool:
+        """True when delivery is limited to subscribers within radius of (latitude, longitude)"""
+        return self.latitude is not None and self.longitude is not None
+
+    def text_for(self, language: str) -> str:
+        return self.translations.get(language) or self.message
+
+    def includes(self, user_id: int) -> bool:
+        """True when user_id falls in this job's partition"""
+        return self.partitions == 1 or abs(user_id) % self.partitions == self.partition
+
+    def event(self) -> Dict:
+        """Payload of the `broadcast` event pushed to dashboard streams"""
+        return {
+            'id': self.id,
+            'message': self.message,
+            'sourceLanguage': self.source_language,
+            'location': self.location,
+            'radius': self.radius,
+            'emergency': self.emergency,
+            'targeted': self.targeted,
+            'timestamp': self.timestamp,
+            'translations': self.translations
+        }
+
+
+@dataclass
+class ChannelResult:
+    channel: str
+    success: bool
+    delivered: int = 0
+    failed: int = 0
+    duration_ms: float = 0.0
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'channel': self.channel,
+            'success': self.success,
+            'deliveredCount': self.delivered,
+            'failedCount': self.failed,
+            'durationMs': round(self.duration_ms, 1),
+            'error': self.error
+        }
+
+
+class ChannelAdapter:
+    """Base class for a delivery channel; deliver() returns (delivered, failed)"""
+    name = "channel"
+
+    def enabled(self) -> bool:
+        return True
+
+    async def deliver(self, job: BroadcastJob) -> Tuple[int, int]:
+        raise NotImplementedError
+
+
+class RateLimiter:
+    """Spaces calls at most `rate` per second across concurrent senders"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AgoraRTMChannel(ChannelAdapter):
+    name = "agora_rtm"
+
+    def __init__(self, publisher: Optional["AgoraPublisher"], base_channel: str = "EMERGENCY_ALERTS",
+                 shard: bool = False):
+        self.publisher = publisher
+        self.base_channel = base_channel
+        self.shard = shard
+
+    def enabled(self) -> bool:
+        return self.publisher is not None
+
+    async def deliver(self, job: BroadcastJob) -> Tuple[int, int]:
+        messages = build_rtm_payloads(
+            self.base_channel,
+            {
+                'id': job.id,
+                'message': job.message,
+                'location': job.location,
+                'emergency': job.emergency,
+                'timestamp': job.timestamp
+            },
+            job.translations,
+            shard=self.shard
+        )
+        await self.publisher.publish_many(messages, key_prefix=f"broadcast-{job.id}")
+        # Agora fans out from here; when listeners receive it isn't known server-side
+        job.timeline.mark('published')
+        # RTM is one channel fan-out handled by Agora, counted as a single delivery
+        return 1, 0
+
+
+def format_alert(job: BroadcastJob, language: str) -> str:
+    emoji = "🚨" if job.emergency else "📢"
+    title = "EMERGENCY ALERT" if job.emergency else "Broadcast Message"
+    message = f"{emoji} **{title}**\n\n{job.text_for(language)}"
+    if job.location:
+        message += f"\n\n📍 {job.location}"
+    message += f"\n\n⏰ {datetime.now().strftime('%I:%M %p, %d %b %Y')}"
+    return message
+
+
+class TelegramChannel(ChannelAdapter):
+    """Sends each subscriber the translation for their saved language.
+
+    With a `fanout` (multi-worker mode) the job is split into partitions that
+    every worker process sends a share of; each partition comes back to send()
+    in whichever worker claims it. With `events` (an event_hub.EventHub), running
+    counts are published as `progress` events every `progress_interval` seconds.
+    """
+    name = "telegram"
+
+    def __init__(self, bot, recipients: Callable[[BroadcastJob], Iterable[Tuple[int, str]]],
+                 concurrency: int = 20, rate: float = 25.0, log_every: int = 100,
+                 limiter=None, fanout=None, events=None, progress_interval: float = 1.0):
+        self.bot = bot
+        self.recipients = recipients
+        self.concurrency = concurrency
+        self.log_every = log_every
+        # Anything with `async wait()`; shared_state.SharedRateLimiter spans worker processes
+        self.limiter = limiter or RateLimiter(rate)
+        self.fanout = fanout
+        self.events = events
+        self.progress_interval = progress_interval
+
+    def enabled(self) -> bool:
+        return self.bot is not None
+
+    async def deliver(self, job: BroadcastJob) -> Tuple[int, int]:
+        if self.fanout is not None:
+            return await self.fanout.submit(job, channel=self.name)
+        return await self.send(job)
+
+    async def send(self, job: BroadcastJob) -> Tuple[int, int]:
+        """Send to every recipient of job (or of its partition) from this process.
+
+        A failed send is counted and the senders move on; anything else (the
+        recipient query, the rate limiter) stops every sender and is raised.
+        """
+        # Recipients are streamed (e.g. straight out of a geo query) to a fixed pool of senders
+        recipients = iter(self.recipients(job))
+        # Format once per language, not once per subscriber
+        texts: Dict[str, str] = {}
+        counts = [0, 0]
+        failures = SampledLog(logger, self.log_every)
+        next_progress = time.monotonic() + self.progress_interval
+
+        def progress():
+            nonlocal next_progress
+            if self.events is None or time.monotonic() < next_progress:
+                return
+            next_progress = time.monotonic() + self.progress_interval
+            self.events.publish('progress', {
+                'broadcastId': job.id,
+                'channel': self.name,
+                'deliveredCount': counts[0],
+                'failedCount': counts[1],
+                'partition': job.partition,
+                'partitions': job.partitions,
+                'done': False
+            })
+
+        async def sender():
+            for user_id, language in recipients:
+                text = texts.get(language)
+                if text is None:
+                    text = texts[language] = format_alert(job, language)
+                await self.limiter.wait()
+                TELEGRAM_SENDS_IN_FLIGHT.inc()
+                start = time.perf_counter()
+                try:
+                    await self.bot.send_message(chat_id=user_id, text=text, parse_mode='Markdown')
+                    TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - start, outcome='ok')
+                    job.timeline.delivered(self.name)
+                    counts[0] += 1
+                except Exception as e:
+                    TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - start, outcome='error')
+                    counts[1] += 1
+                    failures.warning("Failed to send to %s: %s", user_id, e)
+                finally:
+                    TELEGRAM_SENDS_IN_FLIGHT.dec()
+                progress()
+
+        senders = [asyncio.ensure_future(sender()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*senders)
+        except BaseException:
+            # Don't leave the other senders running with no one waiting on them
+            for task in senders:
+                task.cancel()
+            await asyncio.gather(*senders, return_exceptions=True)
+            raise
+        return counts[0], counts[1]
+
+
+class OutboxChannel(ChannelAdapter):
+    """Local stand-in for a channel (SMS gateway, local push) that records what it would send"""
+
+    def __init__(self, name: str, latency: float = 0.0, max_outbox: int = 1000):
+        self.name = name
+        self.latency = latency
+        self.max_outbox = max_outbox
+        self.outbox: List[Dict] = []
+
+    async def deliver(self, job: BroadcastJob) -> Tuple[int, int]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.outbox.append({'broadcastId': job.id, 'text': job.message, 'emergency': job.emergency})
+        del self.outbox[:-self.max_outbox]
+        job.timeline.delivered(self.name)
+        return 1, 0
+
+
+class BroadcastOrchestrator:
+    """Translate once, save once, then fan out to every channel concurrently.
+
+    broadcast() returns once every channel has finished; dispatch() returns as
+    soon as the broadcast is saved and delivers in the background, so callers
+    follow it on the timeline (or the event stream) instead of holding a
+    request open for a long rate-limited fan-out.
+
+    With `events` (an event_hub.EventHub), dashboards get a `broadcast` event
+    once it is saved, a `progress` event as each channel finishes and a
+    `completed` event at the end.
+    """
+
+    def __init__(self, translate: Callable[[str], Awaitable[Dict[str, str]]], db,
+                 adapters: Optional[List[ChannelAdapter]] = None, events=None):
+        self.translate = translate
+        self.db = db
+        self.events = events
+        self.adapters: Dict[str, ChannelAdapter] = {}
+        # Broadcasts being delivered in the background by dispatch(), by ID
+        self.running: Dict[int, BroadcastJob] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        for adapter in adapters or []:
+            self.register(adapter)
+
+    def register(self, adapter: ChannelAdapter):
+        self.adapters[adapter.name] = adapter
+
+    def available(self) -> List[str]:
+        return [name for name, adapter in self.adapters.items() if adapter.enabled()]
+
+    async def _deliver(self, adapter: ChannelAdapter, job: BroadcastJob) -> ChannelResult:
+        start = time.perf_counter()
+        try:
+            delivered, failed = await adapter.deliver(job)
+            result = ChannelResult(adapter.name, True, delivered, failed)
+        except Exception as e:
+            result = ChannelResult(adapter.name, False, error=str(e))
+        result.duration_ms = (time.perf_counter() - start) * 1000
+        CHANNEL_DELIVERY_SECONDS.observe(result.duration_ms / 1000, channel=adapter.name,
+                                         outcome='ok' if result.success else 'error')
+        # Stored as each channel finishes, so a slow channel doesn't hide the others' outcomes
+        self.db.add_broadcast_channel(job.id, result.to_dict())
+        if self.events is not None:
+            self.events.publish('progress', {'broadcastId': job.id, **result.to_dict(), 'done': True})
+        return result
+
+    async def prepare(self, message: str, source_language: str = 'en', location: str = "",
+                      radius: int = 5000, emergency: bool = False,
+                      channels: Optional[List[str]] = None,
+                      coordinates: Optional[Tuple[float, float]] = None) -> Tuple[BroadcastJob, List[ChannelAdapter]]:
+        """Translate and save a broadcast; returns the job and the adapters to deliver it on"""
+        timeline = BroadcastTimeline()
+        selected = [
+            self.adapters[name] for name in (channels or self.available())
+            if name in self.adapters and self.adapters[name].enabled()
+        ]
+        if not selected:
+            raise ValueError("No enabled delivery channels selected")
+
+        translations = await self.translate(message)
+        timeline.mark('translated')
+
+        broadcast_id = self.db.add_broadcast({
+            'message': message,
+            'sourceLanguage': source_language,
+            'location': location,
+            'radius': radius,
+            'emergency': emergency,
+            'translations': translations
+        })
+        timeline.mark('saved')
+        # Stored now as well as at the end, so the timeline shows broadcasts still being delivered
+        self.db.add_broadcast_timeline(broadcast_id, timeline.stages)
+        latitude, longitude = coordinates or (None, None)
+        job = BroadcastJob(broadcast_id, message, source_language, translations,
+                           location or "", radius or 5000, bool(emergency), latitude, longitude,
+                           timeline=timeline)
+        if self.events is not None:
+            self.events.publish('broadcast', job.event())
+        return job, selected
+
+    async def deliver(self, job: BroadcastJob, adapters: List[ChannelAdapter]) -> Dict:
+        """Deliver a prepared job over every adapter and record the outcome"""
+        timeline = job.timeline
+        results = await asyncio.gather(*(self._deliver(adapter, job) for adapter in adapters))
+        delivered = sum(r.delivered for r in results)
+        timeline.mark('completed')
+        self.db.update_broadcast_delivery(job.id, delivered)
+        self.db.add_broadcast_timeline(job.id, timeline.stages)
+        if self.events is not None:
+            self.events.publish('completed', {
+                'broadcastId': job.id,
+                'success': any(r.success for r in results),
+                'deliveredCount': delivered,
+                'timeline': timeline.offsets_ms()
+            })
+
+        summary = ", ".join(
+            f"{r.channel}={r.delivered}" + (f"/{r.failed} failed" if r.failed else "") + f" ({r.duration_ms:.1f}ms)"
+            for r in results
+        )
+        logger.info(f"📢 Broadcast {job.id} delivered: {summary}")
+        offsets = timeline.offsets_ms()
+        return {
+            'success': any(r.success for r in results),
+            'broadcastId': job.id,
+            'deliveredCount': delivered,
+            'targeted': job.targeted,
+            'translations': job.translations,
+            'translateMs': offsets['translated'],
+            'totalMs': offsets['completed'],
+            'timeline': offsets,
+            'channels': [r.to_dict() for r in results]
+        }
+
+    async def broadcast(self, message: str, source_language: str = 'en', location: str = "",
+                        radius: int = 5000, emergency: bool = False,
+                        channels: Optional[List[str]] = None,
+                        coordinates: Optional[Tuple[float, float]] = None) -> Dict:
+        """Translate, save and deliver; returns once every channel has finished"""
+        job, adapters = await self.prepare(message, source_language, location, radius, emergency,
+                                           channels, coordinates)
+        return await self.deliver(job, adapters)
+
+    async def dispatch(self, message: str, source_language: str = 'en', location: str = "",
+                       radius: int = 5000, emergency: bool = False,
+                       channels: Optional[List[str]] = None,
+                       coordinates: Optional[Tuple[float, float]] = None) -> Tuple[BroadcastJob, List[str]]:
+        """Translate and save, then deliver in the background.
+
+        Returns the job and the names of the channels it is going out on as
+        soon as it has an ID.
+        """
+        job, adapters = await self.prepare(message, source_language, location, radius, emergency,
+                                           channels, coordinates)
+        task = asyncio.create_task(self.deliver(job, adapters))
+        self.running[job.id] = job
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda t: self._finished(job.id, t))
+        return job, [adapter.name for adapter in adapters]
+
+    def _finished(self, broadcast_id: int, task: asyncio.Task):
+        self.running.pop(broadcast_id, None)
+        self._tasks.pop(broadcast_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"❌ Broadcast {broadcast_id} delivery failed: {task.exception()}")
+
+    async def stop(self, timeout: float = 10.0):
+        """Give background deliveries up to timeout to finish, then cancel them"""
+        tasks = list(self._tasks.values())
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"⚠️  Cancelled {len(pending)} broadcast deliveries still running at shutdown")
+            await asyncio.gather(*pending, return_exceptions=True)
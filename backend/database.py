@@ -1,17 +1,60 @@
 import sqlite3
 import json
+import logging
+import time
 from datetime import datetime
-from typing import List, Dict, Optional
+from functools import wraps
+from typing import Callable, List, Dict, Optional, Tuple
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+SQLITE_SECONDS = Histogram('sqlite_operation_seconds', 'Latency of Database methods', ['operation'])
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """Nearest-rank p50/p95/p99 (None when there are no samples)"""
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None}
+    values = sorted(values)
+    def rank(p):
+        return round(values[max(0, -(-len(values) * p // 100) - 1)], 1)
+    return {'p50': rank(50), 'p95': rank(95), 'p99': rank(99)}
+
+def _timed(method):
+    """Record the wrapped method's latency under its name"""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        with SQLITE_SECONDS.time(operation=method.__name__):
+            return method(*args, **kwargs)
+    return wrapper
 
 class Database:
-    def __init__(self, db_path: str = "emergency.db"):
+    def __init__(self, db_path: str = "emergency.db", busy_timeout: float = 10.0):
         self.db_path = db_path
+        # Seconds a connection waits for another worker's write lock before failing
+        self.busy_timeout = busy_timeout
+        # Called after every write to broadcasts or their timelines (e.g. to drop cached responses)
+        self.change_listeners: List[Callable[[], None]] = []
         self.init_db()
     
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+        # Durable at each WAL checkpoint rather than on every commit
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+    
+    def _broadcasts_changed(self):
+        for listener in self.change_listeners:
+            listener()
+    
     def init_db(self):
         """Initialize database tables"""
-        conn = sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+        # WAL lets readers run alongside a writer, so several worker processes can share the file
+        conn.execute('PRAGMA journal_mode=WAL')
         cursor = conn.cursor()
+        # Workers starting together run the schema checks and migrations one at a time
+        cursor.execute('BEGIN IMMEDIATE')
         
         # Broadcasts table
         cursor.execute('''
@@ -52,15 +95,48 @@ class Database:
             )
         ''')
         
+        # Per-broadcast stage timestamps (epoch seconds): received, translated, saved, ...
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS broadcast_timeline (
+                broadcast_id INTEGER NOT NULL,
+                stage TEXT NOT NULL,
+                at REAL NOT NULL,
+                PRIMARY KEY (broadcast_id, stage)
+            )
+        ''')
+        
+        # Outcome of each delivery channel of a broadcast, written as each channel finishes
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS broadcast_channels (
+                broadcast_id INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                success INTEGER NOT NULL,
+                delivered INTEGER NOT NULL,
+                failed INTEGER NOT NULL,
+                duration_ms REAL NOT NULL,
+                error TEXT,
+                finished_at REAL NOT NULL,
+                PRIMARY KEY (broadcast_id, channel)
+            )
+        ''')
+        
+        # Last known subscriber position (from Telegram location sharing)
+        cursor.execute('PRAGMA table_info(telegram_subscribers)')
+        columns = {row[1] for row in cursor.fetchall()}
+        for column, column_type in (('latitude', 'REAL'), ('longitude', 'REAL'), ('location_updated_at', 'TEXT')):
+            if column not in columns:
+                cursor.execute(f'ALTER TABLE telegram_subscribers ADD COLUMN {column} {column_type}')
+        
         # --- The 'listeners' table has been removed ---
         
-        conn.commit()
+        cursor.execute('COMMIT')
         conn.close()
-        print("✅ Database initialized")
+        logger.info("✅ Database initialized")
     
+    @_timed
     def add_broadcast(self, broadcast_data: Dict) -> int:
         """Add new broadcast"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -80,11 +156,13 @@ class Database:
         broadcast_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        self._broadcasts_changed()
         return broadcast_id
     
+    @_timed
     def update_broadcast_delivery(self, broadcast_id: int, count: int):
         """Update delivery count for broadcast"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -93,10 +171,95 @@ class Database:
         
         conn.commit()
         conn.close()
+        self._broadcasts_changed()
+    
+    @_timed
+    def add_broadcast_timeline(self, broadcast_id: int, stages: Dict[str, float]):
+        """Store the time each stage of a broadcast was reached"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT OR REPLACE INTO broadcast_timeline (broadcast_id, stage, at)
+            VALUES (?, ?, ?)
+        ''', [(broadcast_id, stage, at) for stage, at in stages.items()])
+        
+        conn.commit()
+        conn.close()
+        self._broadcasts_changed()
+    
+    @_timed
+    def get_broadcast_timeline(self, broadcast_id: int) -> Dict[str, float]:
+        """Stage -> epoch seconds for one broadcast, in the order reached"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT stage, at FROM broadcast_timeline
+            WHERE broadcast_id = ?
+            ORDER BY at
+        ''', (broadcast_id,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return {row[0]: row[1] for row in rows}
+    
+    @_timed
+    def add_broadcast_channel(self, broadcast_id: int, result: Dict):
+        """Store how one channel's delivery went (a ChannelResult.to_dict())"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO broadcast_channels
+            (broadcast_id, channel, success, delivered, failed, duration_ms, error, finished_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            broadcast_id,
+            result['channel'],
+            bool(result['success']),
+            result['deliveredCount'],
+            result['failedCount'],
+            result['durationMs'],
+            result.get('error'),
+            time.time()
+        ))
+        
+        conn.commit()
+        conn.close()
+        self._broadcasts_changed()
+    
+    @_timed
+    def get_broadcast_channels(self, broadcast_id: int) -> List[Dict]:
+        """Per-channel outcomes of one broadcast, in the order they finished"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT channel, success, delivered, failed, duration_ms, error
+            FROM broadcast_channels
+            WHERE broadcast_id = ?
+            ORDER BY finished_at
+        ''', (broadcast_id,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [
+            {
+                'channel': row[0],
+                'success': bool(row[1]),
+                'deliveredCount': row[2],
+                'failedCount': row[3],
+                'durationMs': row[4],
+                'error': row[5]
+            }
+            for row in rows
+        ]
     
+    @_timed
     def get_broadcasts(self, limit: int = 50) -> List[Dict]:
         """Get recent broadcasts"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -126,9 +289,10 @@ class Database:
         
         return broadcasts
     
+    @_timed
     def add_message(self, user_id: str, message: str, response: str, language: str):
         """Add chat message"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -141,29 +305,60 @@ class Database:
 
     # --- add_listener() and remove_listener() are removed ---
 
+    @_timed
     def add_telegram_subscriber(self, user_id: int, username: str, first_name: str, language: str = 'en'):
         """Add or update Telegram subscriber"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
+        # Upsert so columns not set here (subscribed_at, last known location) survive updates
         cursor.execute('''
-            INSERT OR REPLACE INTO telegram_subscribers 
+            INSERT INTO telegram_subscribers 
             (user_id, username, first_name, language, subscribed_at, last_seen)
-            VALUES (?, ?, ?, ?, 
-                COALESCE((SELECT subscribed_at FROM telegram_subscribers WHERE user_id = ?), ?),
-                ?)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                username = excluded.username,
+                first_name = excluded.first_name,
+                language = excluded.language,
+                last_seen = excluded.last_seen
         ''', (
             user_id, username, first_name, language, 
-            user_id, datetime.now().isoformat(),
+            datetime.now().isoformat(),
             datetime.now().isoformat()
         ))
         
         conn.commit()
         conn.close()
     
+    @_timed
+    def add_telegram_subscribers(self, subscribers: List[Dict]) -> int:
+        """Add or update many Telegram subscribers in one transaction"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        now = datetime.now().isoformat()
+        
+        cursor.executemany('''
+            INSERT INTO telegram_subscribers
+            (user_id, username, first_name, language, subscribed_at, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                username = excluded.username,
+                first_name = excluded.first_name,
+                language = excluded.language,
+                last_seen = excluded.last_seen
+        ''', [
+            (s['userId'], s.get('username', ''), s.get('firstName', ''), s.get('language', 'en'), now, now)
+            for s in subscribers
+        ])
+        
+        conn.commit()
+        conn.close()
+        return len(subscribers)
+    
+    @_timed
     def get_telegram_subscribers(self) -> List[int]:
         """Get all Telegram subscriber IDs"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT user_id FROM telegram_subscribers')
@@ -172,9 +367,95 @@ class Database:
         
         return [row[0] for row in rows]
     
+    @_timed
+    def get_telegram_recipients(self, partition: int = 0, partitions: int = 1,
+                                located: Optional[bool] = None) -> List[Tuple[int, str]]:
+        """Get Telegram subscribers as (user_id, language) pairs, optionally only
+        those with abs(user_id) % partitions == partition, and only those with
+        (located=True) or without (located=False) a stored position"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        conditions, params = [], []
+        if partitions > 1:
+            conditions.append('abs(user_id) % ? = ?')
+            params += [partitions, partition]
+        if located is not None:
+            conditions.append('latitude IS NOT NULL' if located else 'latitude IS NULL')
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor.execute(f'SELECT user_id, language FROM telegram_subscribers{where}', params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [(row[0], row[1] or 'en') for row in rows]
+    
+    @_timed
+    def get_subscriber_language(self, user_id: int) -> Optional[str]:
+        """Get a single subscriber's language, or None if not subscribed"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT language FROM telegram_subscribers WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        return row[0] if row else None
+    
+    @_timed
+    def get_subscriber_languages(self, limit: int = 5000, offset: int = 0) -> Dict[int, str]:
+        """Get language preferences, most recently seen subscribers first"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT user_id, language FROM telegram_subscribers
+            ORDER BY last_seen DESC
+            LIMIT ? OFFSET ?
+        ''', (limit, offset))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return {row[0]: row[1] or 'en' for row in rows}
+    
+    @_timed
+    def update_subscriber_location(self, user_id: int, latitude: float, longitude: float) -> Optional[str]:
+        """Store a subscriber's last known position; returns their language, or None if not subscribed"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE telegram_subscribers
+            SET latitude = ?, longitude = ?, location_updated_at = ?
+            WHERE user_id = ?
+        ''', (latitude, longitude, datetime.now().isoformat(), user_id))
+        cursor.execute('SELECT language FROM telegram_subscribers WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+        
+        conn.commit()
+        conn.close()
+        return (row[0] or 'en') if row else None
+    
+    @_timed
+    def get_subscriber_locations(self, since: Optional[str] = None) -> List[Tuple[int, str, float, float]]:
+        """Get (user_id, language, latitude, longitude) for subscribers with a known position,
+        optionally only those whose position or language changed after `since` (ISO time)"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT user_id, language, latitude, longitude FROM telegram_subscribers
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+              AND (? IS NULL OR location_updated_at > ? OR last_seen > ?)
+        ''', (since, since, since))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [(row[0], row[1] or 'en', row[2], row[3]) for row in rows]
+    
+    @_timed
     def get_subscriber_count(self) -> int:
         """Get total subscriber count"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT COUNT(*) FROM telegram_subscribers')
@@ -183,9 +464,10 @@ class Database:
         
         return count
     
-    def get_analytics(self) -> Dict:
-        """Get analytics data"""
-        conn = sqlite3.connect(self.db_path)
+    @_timed
+    def get_analytics(self, window: int = 1000) -> Dict:
+        """Get analytics data; delivery-time percentiles cover the last `window` timed broadcasts"""
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Total broadcasts
@@ -202,12 +484,34 @@ class Database:
         cursor.execute('SELECT COUNT(*) FROM telegram_subscribers')
         telegram_subscribers = cursor.fetchone()[0]
         
+        # Delivery times (ms from received) over the most recent timed broadcasts. First delivery is
+        # the first Telegram message a subscriber got; the Agora RTM publish is timed separately
+        cursor.execute('''
+            SELECT (MAX(CASE WHEN stage = 'first_telegram_delivery' THEN at END) - MAX(CASE WHEN stage = 'received' THEN at END)) * 1000,
+                   (MAX(CASE WHEN stage = 'completed' THEN at END) - MAX(CASE WHEN stage = 'received' THEN at END)) * 1000,
+                   (MAX(CASE WHEN stage = 'published' THEN at END) - MAX(CASE WHEN stage = 'received' THEN at END)) * 1000
+            FROM broadcast_timeline
+            WHERE broadcast_id IN (
+                SELECT DISTINCT broadcast_id FROM broadcast_timeline ORDER BY broadcast_id DESC LIMIT ?
+            )
+            GROUP BY broadcast_id
+        ''', (window,))
+        rows = cursor.fetchall()
+        
         conn.close()
         
+        first_delivery = [row[0] for row in rows if row[0] is not None]
+        complete = [row[1] for row in rows if row[1] is not None]
+        published = [row[2] for row in rows if row[2] is not None]
+        
         return {
             'totalBroadcasts': total_broadcasts,
             'totalDelivered': total_delivered,
             # 'activeListeners': active_listeners, # This key is now removed
             'telegramSubscribers': telegram_subscribers,
-            'averageDeliveryTime': 450  # Mock for now
+            'averageDeliveryTime': round(sum(first_delivery) / len(first_delivery)) if first_delivery else 0,
+            'timeToFirstDelivery': _percentiles(first_delivery),
+            'timeToComplete': _percentiles(complete),
+            'timeToPublish': _percentiles(published),
+            'timedBroadcasts': len(rows)
         }
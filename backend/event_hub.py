@@ -0,0 +1,221 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PUBLISHED = Counter('events_published_total', 'Events published to stream clients', ['type'])
+STREAM_LAGGED = Counter('event_stream_lagged_total', 'Stream clients dropped for falling too far behind')
+
+
+class Event:
+    """One published event; its wire formats are encoded once and shared by every client"""
+
+    __slots__ = ('id', 'type', 'payload', '_sse', '_frame')
+
+    def __init__(self, event_id: int, event_type: str, payload: str):
+        self.id = event_id
+        self.type = event_type
+        self.payload = payload  # JSON text of the event data
+        self._sse: Optional[bytes] = None
+        self._frame: Optional[str] = None
+
+    def sse(self) -> bytes:
+        """Server-Sent Events block (id/event/data)"""
+        if self._sse is None:
+            self._sse = f"id: {self.id}\nevent: {self.type}\ndata: {self.payload}\n\n".encode('utf-8')
+        return self._sse
+
+    def frame(self) -> str:
+        """WebSocket text frame: {"id": ..., "type": ..., "data": {...}}"""
+        if self._frame is None:
+            self._frame = f'{{"id":{self.id},"type":{json.dumps(self.type)},"data":{self.payload}}}'
+        return self._frame
+
+
+class Subscription:
+    """A client's bounded queue of events.
+
+    A client that falls `queue_size` events behind is dropped rather than
+    buffered without limit or allowed to hold up publish(); it reconnects
+    with its last event ID and replays what it missed from the hub's history.
+    """
+
+    def __init__(self, hub: "EventHub", queue_size: int):
+        self.hub = hub
+        # Unbounded queue; `capacity` is enforced for live events only, so a resume
+        # backlog larger than queue_size can still be replayed
+        self.queue: "asyncio.Queue[Optional[Event]]" = asyncio.Queue()
+        self.capacity = queue_size
+        self.closed = False
+        self.lagged = False
+
+    def offer(self, event: Event):
+        if self.queue.qsize() >= self.capacity:
+            self.lagged = True
+            STREAM_LAGGED.inc()
+            self.close()
+            return
+        self.queue.put_nowait(event)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.hub._subscribers.discard(self)
+        # Replace anything still queued with the end-of-stream marker
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """Next event; None once the subscription is closed. Raises TimeoutError after timeout."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventHub:
+    """In-process publish/subscribe for dashboard streams (SSE and WebSocket).
+
+    Events get increasing integer IDs and the last `history` are kept so a
+    client reconnecting with Last-Event-ID resumes where it stopped. Without a
+    store, IDs start at the current epoch milliseconds, so IDs from an earlier
+    process always look older than this one's history and the client is told
+    to reset instead of silently missing events.
+
+    With a shared_state.SharedStore (multi-worker mode) publish() appends to
+    an events table and every worker's relay loop fans the rows out to its own
+    clients, so all workers emit the same events under the same IDs. Store
+    reads and writes run on the store's threads, in publish order.
+    """
+
+    def __init__(self, history: int = 1000, queue_size: int = 256, store=None, poll_interval: float = 0.05):
+        self.queue_size = queue_size
+        self.store = store
+        self.poll_interval = poll_interval
+        self._history: Deque[Event] = deque(maxlen=history)
+        self._subscribers = set()
+        self._next_id = int(time.time() * 1000)
+        self._last_relayed = 0
+        self._task: Optional[asyncio.Task] = None
+        # Store mode: events waiting to be written, and the task writing them
+        self._outbox: List[Tuple[str, str, float]] = []
+        self._writer: Optional[asyncio.Task] = None
+        if store is not None:
+            store.conn.execute('''
+                CREATE TABLE IF NOT EXISTS events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    type TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            rows = store.conn.execute('SELECT id, type, payload FROM events ORDER BY id DESC LIMIT ?',
+                                      (history,)).fetchall()
+            for row in reversed(rows):
+                self._history.append(Event(*row))
+            self._last_relayed = rows[0][0] if rows else 0
+            self._next_id = self._last_relayed + 1
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event_type: str, data) -> None:
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str)
+        EVENTS_PUBLISHED.inc(type=event_type)
+        if self.store is not None:
+            # Delivered (here and in every other worker) by the relay loop, in ID order
+            self._outbox.append((event_type, payload, time.time()))
+            if self._writer is None:
+                self._writer = asyncio.ensure_future(self._write_outbox())
+            return
+        event = Event(self._next_id, event_type, payload)
+        self._next_id += 1
+        self._dispatch(event)
+
+    def _dispatch(self, event: Event):
+        self._history.append(event)
+        for subscription in list(self._subscribers):
+            subscription.offer(event)
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscription:
+        """New subscription, first replaying history after last_event_id when given.
+
+        If events after last_event_id have already left the history, a `reset`
+        event (id 0) is queued first: the client should refetch /api/broadcasts.
+        """
+        subscription = Subscription(self, self.queue_size)
+        if last_event_id is not None:
+            oldest = self._history[0].id if self._history else self._next_id
+            backlog = [event for event in self._history if event.id > last_event_id]
+            if last_event_id < oldest - 1:
+                backlog.insert(0, Event(0, 'reset', '{"reason":"history_gap"}'))
+            for event in backlog:
+                subscription.queue.put_nowait(event)
+            subscription.capacity += len(backlog)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def close(self):
+        """Disconnect every client (shutdown)"""
+        for subscription in list(self._subscribers):
+            subscription.close()
+
+    def _insert(self, rows: List[Tuple[str, str, float]]):
+        self.store.conn.executemany('INSERT INTO events (type, payload, created_at) VALUES (?, ?, ?)', rows)
+
+    async def _write_outbox(self):
+        # One writer at a time, so events reach the table in publish order
+        try:
+            while self._outbox:
+                rows, self._outbox = self._outbox, []
+                try:
+                    await self.store.run(self._insert, rows)
+                except sqlite3.Error as e:
+                    logger.warning(f"Event publish failed, {len(rows)} events dropped: {e}")
+        finally:
+            self._writer = None
+
+    def _read(self, after: int, prune: bool) -> List[Tuple[int, str, str]]:
+        conn = self.store.conn
+        rows = conn.execute('SELECT id, type, payload FROM events WHERE id > ? ORDER BY id', (after,)).fetchall()
+        if prune:
+            conn.execute('DELETE FROM events WHERE id <= ?', (after - self._history.maxlen,))
+        return rows
+
+    async def _relay(self):
+        last_prune = time.time()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            prune = time.time() - last_prune > 60
+            if prune:
+                last_prune = time.time()
+            try:
+                rows = await self.store.run(self._read, self._last_relayed, prune)
+            except sqlite3.Error as e:
+                logger.warning(f"Event relay failed: {e}")
+                continue
+            for row in rows:
+                self._dispatch(Event(*row))
+                self._last_relayed = row[0]
+
+    def start(self):
+        if self.store is not None and self._task is None:
+            self._task = asyncio.create_task(self._relay())
+
+    async def stop(self):
+        if self._writer is not None:
+            await self._writer
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.close()
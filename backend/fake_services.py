@@ -0,0 +1,120 @@
+"""Local stand-ins for the Telegram Bot API and Agora RTM REST API.
+
+Used by the benchmarks to run the real server code against HTTP endpoints
+with configurable latency and error rates. Gemini is faked in-process via
+LLM_BACKEND=fake (see llm_gateway.FakeBackend).
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Iterable, List, Optional, Tuple
+
+from aiohttp import web
+
+
+class FakeServices:
+    """One aiohttp server answering both Telegram and Agora RTM calls"""
+
+    def __init__(self, telegram_latency: float = 0.0, telegram_error_rate: float = 0.0,
+                 agora_latency: float = 0.0, agora_error_rate: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.telegram_latency = telegram_latency
+        self.telegram_error_rate = telegram_error_rate
+        self.agora_latency = agora_latency
+        self.agora_error_rate = agora_error_rate
+        self.host = host
+        self.port = port
+        self.telegram_sent = 0
+        self.telegram_errors = 0
+        self.agora_published = 0
+        self.agora_errors = 0
+        # Statuses to answer the next Agora publishes with, ahead of the random error rate
+        self.agora_script: deque = deque()
+        # (x-agora-token, X-Request-ID) of every Agora publish received
+        self.agora_requests: List[Tuple[str, str]] = []
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def telegram_base_url(self) -> str:
+        """Value for TELEGRAM_API_BASE_URL"""
+        return f"{self.base_url}/bot"
+
+    async def _telegram(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        if request.content_type == 'application/json':
+            data = await request.json()
+        else:
+            data = dict(await request.post())
+
+        if method == 'getMe':
+            return web.json_response({'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'
+            }})
+        if method != 'sendMessage':
+            return web.json_response({'ok': True, 'result': True})
+
+        if self.telegram_latency:
+            await asyncio.sleep(self.telegram_latency)
+        if self.telegram_error_rate and random.random() < self.telegram_error_rate:
+            self.telegram_errors += 1
+            return web.json_response(
+                {'ok': False, 'error_code': 403, 'description': 'Forbidden: bot was blocked by the user'},
+                status=403
+            )
+        self.telegram_sent += 1
+        return web.json_response({'ok': True, 'result': {
+            'message_id': self.telegram_sent,
+            'date': int(time.time()),
+            'chat': {'id': int(data.get('chat_id', 0)), 'type': 'private'},
+            'text': data.get('text', '')
+        }})
+
+    def fail_agora(self, statuses: Iterable[int]):
+        """Answer the next Agora publishes with these HTTP statuses, in order"""
+        self.agora_script.extend(statuses)
+
+    async def _agora(self, request: web.Request) -> web.Response:
+        await request.read()
+        self.agora_requests.append((request.headers.get('x-agora-token', ''),
+                                    request.headers.get('X-Request-ID', '')))
+        if self.agora_latency:
+            await asyncio.sleep(self.agora_latency)
+        if self.agora_script:
+            self.agora_errors += 1
+            return web.json_response({'result': 'failed', 'reason': 'injected error'},
+                                     status=self.agora_script.popleft())
+        if self.agora_error_rate and random.random() < self.agora_error_rate:
+            self.agora_errors += 1
+            return web.json_response({'result': 'failed', 'reason': 'injected error'}, status=503)
+        self.agora_published += 1
+        return web.json_response({'result': 'success', 'request_id': request.headers.get('X-Request-ID', '')})
+
+    async def start(self) -> "FakeServices":
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self._telegram)
+        app.router.add_post('/dev/v2/project/{app_id}/rtm/users/{user_id}/channel_messages', self._agora)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Pick up the ephemeral port when port=0
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def stats(self):
+        return {
+            'telegramSent': self.telegram_sent,
+            'telegramErrors': self.telegram_errors,
+            'agoraPublished': self.agora_published,
+            'agoraErrors': self.agora_errors,
+        }
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import fields
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from broadcast_orchestrator import BroadcastJob
+from metrics import Counter
+from shared_state import SharedStore
+
+logger = logging.getLogger(__name__)
+
+PARTITIONS_TOTAL = Counter('fanout_partitions_total', 'Broadcast partitions sent by this worker', ['outcome'])
+
+
+def job_to_payload(job: BroadcastJob) -> str:
+    return json.dumps({
+        f.name: getattr(job, f.name) for f in fields(job)
+        if f.name not in ('timeline', 'partition', 'partitions')
+    })
+
+
+def job_from_payload(payload: str, partition: int, partitions: int) -> BroadcastJob:
+    return BroadcastJob(**json.loads(payload), partition=partition, partitions=partitions)
+
+
+class PartitionedFanout:
+    """Spreads one broadcast's fan-out over every worker process on the host.
+
+    submit() writes one row per partition to the shared store; each worker's
+    background loop claims rows one at a time with an atomic UPDATE and sends
+    to the subscribers in that partition (user_id modulo the partition count),
+    so every subscriber is sent to by exactly one worker. The worker that got
+    the request waits for all partitions and returns the combined counts.
+
+    A claim whose worker stops heartbeating for `lease` seconds (crashed or
+    killed mid-send) is taken over by another worker; recipients it had
+    already reached may then get the alert twice.
+    """
+
+    def __init__(self, store: SharedStore, deliver: Callable[[BroadcastJob], Awaitable[Tuple[int, int]]],
+                 partitions: int, lease: float = 60.0, poll_interval: float = 0.05,
+                 retention: float = 3600.0):
+        self.store = store
+        self.deliver = deliver
+        self.partitions = max(1, partitions)
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.worker_id = f"pid-{os.getpid()}"
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.store.conn.execute('''
+            CREATE TABLE IF NOT EXISTS fanout_partitions (
+                broadcast_id INTEGER NOT NULL,
+                partition_no INTEGER NOT NULL,
+                partition_count INTEGER NOT NULL,
+                job TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                claimed_by TEXT,
+                heartbeat_at REAL,
+                done_at REAL,
+                delivered INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                first_delivery REAL,
+                last_delivery REAL,
+                error TEXT,
+                PRIMARY KEY (broadcast_id, partition_no)
+            )
+        ''')
+
+    def _queue(self, job_id: int, payload: str):
+        with self.store.transaction() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO fanout_partitions (broadcast_id, partition_no, partition_count, job, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(job_id, i, self.partitions, payload, time.time()) for i in range(self.partitions)])
+
+    def _progress(self, job_id: int) -> Tuple:
+        return self.store.conn.execute('''
+            SELECT COUNT(*), COUNT(*) - COUNT(done_at), SUM(delivered), SUM(failed),
+                   MIN(first_delivery), MAX(last_delivery), COUNT(error)
+            FROM fanout_partitions WHERE broadcast_id = ?
+        ''', (job_id,)).fetchone()
+
+    def _collect(self, job_id: int) -> Optional[str]:
+        """First partition error (if any), removing the job's rows"""
+        conn = self.store.conn
+        error = conn.execute('SELECT error FROM fanout_partitions WHERE broadcast_id = ? AND error IS NOT NULL',
+                             (job_id,)).fetchone()
+        conn.execute('DELETE FROM fanout_partitions WHERE broadcast_id = ?', (job_id,))
+        return error[0] if error else None
+
+    async def submit(self, job: BroadcastJob, channel: str = "telegram") -> Tuple[int, int]:
+        """Queue job's partitions and wait until every one is sent; returns (delivered, failed).
+
+        Deliveries the partitions made are recorded on job's timeline under channel.
+        """
+        # Store calls run on the store's threads: a busy write lock must not stall the event loop
+        await self.store.run(self._queue, job.id, job_to_payload(job))
+        self._wakeup.set()
+
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            rows, pending, delivered, failed, first, last, errors = await self.store.run(self._progress, job.id)
+            if not rows:
+                # Purged or collected by someone else: the counts are gone, so don't report a clean send
+                raise RuntimeError(f"Fan-out partitions of broadcast {job.id} disappeared before finishing")
+            if not pending:
+                break
+        error = await self.store.run(self._collect, job.id)
+
+        if first is not None:
+            job.timeline.merge_deliveries(channel, first, last)
+        if errors == self.partitions:
+            raise RuntimeError(error)
+        if errors:
+            logger.error(f"Broadcast {job.id}: {errors}/{self.partitions} partitions failed: {error}")
+        return delivered or 0, failed or 0
+
+    def _claim(self) -> Optional[Tuple[int, int, int, str]]:
+        now = time.time()
+        # fetchall: the implicit transaction (and write lock) ends only once the statement is exhausted
+        rows = self.store.conn.execute('''
+            UPDATE fanout_partitions SET claimed_by = ?, heartbeat_at = ?
+            WHERE rowid = (
+                SELECT rowid FROM fanout_partitions
+                WHERE done_at IS NULL AND (claimed_by IS NULL OR heartbeat_at < ?)
+                ORDER BY broadcast_id, partition_no LIMIT 1
+            )
+            RETURNING broadcast_id, partition_no, partition_count, job
+        ''', (self.worker_id, now, now - self.lease)).fetchall()
+        return rows[0] if rows else None
+
+    def _beat(self, broadcast_id: int, partition: int):
+        self.store.conn.execute('''
+            UPDATE fanout_partitions SET heartbeat_at = ?
+            WHERE broadcast_id = ? AND partition_no = ? AND claimed_by = ?
+        ''', (time.time(), broadcast_id, partition, self.worker_id))
+
+    async def _heartbeat(self, broadcast_id: int, partition: int):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self.store.run(self._beat, broadcast_id, partition)
+            except sqlite3.Error as e:
+                logger.warning(f"Fan-out heartbeat failed: {e}")
+
+    def _finish(self, broadcast_id: int, partition: int, delivered: int, failed: int,
+                first: Optional[float], last: Optional[float], error: Optional[str]) -> int:
+        return self.store.conn.execute('''
+            UPDATE fanout_partitions
+            SET done_at = ?, delivered = ?, failed = ?, first_delivery = ?, last_delivery = ?, error = ?
+            WHERE broadcast_id = ? AND partition_no = ? AND claimed_by = ?
+        ''', (time.time(), delivered, failed, first, last, error,
+              broadcast_id, partition, self.worker_id)).rowcount
+
+    async def _send_partition(self, broadcast_id: int, partition: int, partitions: int, payload: str):
+        job = job_from_payload(payload, partition, partitions)
+        heartbeat = asyncio.create_task(self._heartbeat(broadcast_id, partition))
+        delivered = failed = 0
+        error = None
+        try:
+            delivered, failed = await self.deliver(job)
+            PARTITIONS_TOTAL.inc(outcome='ok')
+        except Exception as e:
+            PARTITIONS_TOTAL.inc(outcome='error')
+            logger.exception(f"Broadcast {broadcast_id} partition {partition}/{partitions} failed")
+            error = str(e) or type(e).__name__
+        finally:
+            heartbeat.cancel()
+
+        stages = job.timeline.stages
+        updated = await self.store.run(self._finish, broadcast_id, partition, delivered, failed,
+                                       stages.get('first_delivery'), stages.get('last_delivery'), error)
+        if not updated:
+            logger.warning(f"Broadcast {broadcast_id} partition {partition} was taken over by another worker "
+                           f"after its lease expired")
+
+    def _purge(self, before: float):
+        # Finished rows whose submitter died before collecting them, and claims nobody has
+        # heartbeated since `before` (or for a lease, if that is longer). Queued and live rows stay
+        stale = min(before, time.time() - self.lease)
+        self.store.conn.execute('''
+            DELETE FROM fanout_partitions
+            WHERE done_at < ? OR (done_at IS NULL AND heartbeat_at < ?)
+        ''', (before, stale))
+
+    async def _run(self):
+        last_purge = 0.0
+        while True:
+            try:
+                claimed = await self.store.run(self._claim)
+            except sqlite3.Error as e:
+                logger.warning(f"Fan-out claim failed: {e}")
+                claimed = None
+            if time.time() - last_purge > self.retention / 10:
+                last_purge = time.time()
+                try:
+                    await self.store.run(self._purge, last_purge - self.retention)
+                except sqlite3.Error as e:
+                    logger.warning(f"Fan-out purge failed: {e}")
+
+            if claimed is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            await self._send_partition(*claimed)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        pending, claimed = self.store.conn.execute('''
+            SELECT SUM(claimed_by IS NULL), SUM(claimed_by IS NOT NULL)
+            FROM fanout_partitions WHERE done_at IS NULL
+        ''').fetchone()
+        return {'pending': pending or 0, 'inProgress': claimed or 0}
@@ -0,0 +1,173 @@
+import math
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_M = 6_371_000
+
+# Cell edge at each precision is roughly 156km, 39km, 4.9km, 1.2km
+PRECISIONS = (3, 4, 5, 6)
+MAX_QUERY_CELLS = 64
+
+
+def geohash(lat: float, lon: float, precision: int) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(height, width) of a geohash cell in degrees"""
+    total = 5 * precision
+    lon_bits = (total + 1) // 2
+    lat_bits = total // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Haversine distance in metres"""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parse_coordinates(text: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Parse 'lat,lon' (as operators may type into the location field)"""
+    if not text or ',' not in text:
+        return None
+    try:
+        lat, lon = (float(part) for part in text.split(',')[:2])
+    except ValueError:
+        return None
+    if -90 <= lat <= 90 and -180 <= lon <= 180:
+        return lat, lon
+    return None
+
+
+def _lon_spans(lon: float, dlon: float) -> List[Tuple[float, float]]:
+    """[west, east] longitude intervals covering lon ± dlon, split at the antimeridian"""
+    if dlon >= 180:
+        return [(-180.0, 180.0)]
+    west, east = lon - dlon, lon + dlon
+    if west < -180:
+        return [(west + 360, 180.0), (-180.0, east)]
+    if east > 180:
+        return [(west, 180.0), (-180.0, east - 360)]
+    return [(west, east)]
+
+
+def _cell_index(offset: float, size: float, extent: float) -> int:
+    """Row or column of the cell containing offset (degrees from the south / west edge)"""
+    return min(int(offset // size), int(extent / size) - 1)
+
+
+class GeoIndex:
+    """Geohash grid of subscriber positions at several precisions.
+
+    A radius query picks the finest precision whose covering cells stay under
+    MAX_QUERY_CELLS, so it touches only nearby buckets instead of every subscriber.
+    """
+
+    def __init__(self):
+        self._points: Dict[int, Tuple[float, float, str]] = {}
+        self._cells: Dict[int, Dict[str, Dict[int, None]]] = {p: {} for p in PRECISIONS}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def update(self, user_id: int, lat: float, lon: float, language: str = 'en'):
+        self.remove(user_id)
+        self._points[user_id] = (lat, lon, language)
+        # Coarser geohashes are prefixes of the finest one
+        full = geohash(lat, lon, PRECISIONS[-1])
+        for precision, cells in self._cells.items():
+            cells.setdefault(full[:precision], {})[user_id] = None
+
+    def set_language(self, user_id: int, language: str):
+        point = self._points.get(user_id)
+        if point is not None:
+            self._points[user_id] = (point[0], point[1], language)
+
+    def remove(self, user_id: int):
+        point = self._points.pop(user_id, None)
+        if point is None:
+            return
+        full = geohash(point[0], point[1], PRECISIONS[-1])
+        for precision, cells in self._cells.items():
+            key = full[:precision]
+            bucket = cells.get(key)
+            if bucket is not None:
+                bucket.pop(user_id, None)
+                if not bucket:
+                    del cells[key]
+
+    def bulk_load(self, rows: Iterable[Tuple[int, str, float, float]]):
+        """Load (user_id, language, lat, lon) rows"""
+        for user_id, language, lat, lon in rows:
+            self.update(user_id, lat, lon, language)
+
+    def _covering_cells(self, lat: float, lon: float, radius_m: float) -> Tuple[int, Optional[List[str]]]:
+        """Precision and geohash keys of the cells covering the circle; None means every cell"""
+        angle = radius_m / EARTH_RADIUS_M
+        dlat = math.degrees(angle)
+        south, north = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+        if north >= 90.0 or south <= -90.0:
+            # The circle contains a pole, so it spans every longitude
+            spans = [(-180.0, 180.0)]
+        else:
+            # Exact half-width in longitude of a spherical cap (not dlat / cos(lat))
+            dlon = math.degrees(math.asin(min(1.0, math.sin(angle) / math.cos(math.radians(lat)))))
+            spans = _lon_spans(lon, dlon)
+
+        coarsest = PRECISIONS[0]
+        for precision in reversed(PRECISIONS):
+            height, width = cell_size(precision)
+            rows = range(_cell_index(south + 90, height, 180), _cell_index(north + 90, height, 180) + 1)
+            cols = list(dict.fromkeys(
+                col for west, east in spans
+                for col in range(_cell_index(west + 180, width, 360), _cell_index(east + 180, width, 360) + 1)
+            ))
+            count = len(rows) * len(cols)
+            if count <= MAX_QUERY_CELLS:
+                break
+            if precision == coarsest:
+                if count > len(self._cells[coarsest]):
+                    # Fewer cells are occupied than cover the circle: check them all
+                    return coarsest, None
+                break
+
+        keys = [
+            geohash(-90 + (row + 0.5) * height, -180 + (col + 0.5) * width, precision)
+            for row in rows for col in cols
+        ]
+        return precision, keys
+
+    def within(self, lat: float, lon: float, radius_m: float) -> Iterator[Tuple[int, str]]:
+        """Yield (user_id, language) for every subscriber within radius_m of (lat, lon)"""
+        precision, keys = self._covering_cells(lat, lon, radius_m)
+        cells = self._cells[precision]
+        for key in (list(cells) if keys is None else keys):
+            for user_id in list(cells.get(key, ())):
+                point = self._points.get(user_id)
+                if point and distance_m(lat, lon, point[0], point[1]) <= radius_m:
+                    yield user_id, point[2]
@@ -0,0 +1,82 @@
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+from backend_client import BackendClient, BackendError
+
+logger = logging.getLogger(__name__)
+
+
+class LanguageCache:
+    """Size-bounded LRU of user language preferences backed by the backend DB"""
+
+    def __init__(self, backend: BackendClient, maxsize: int = 100_000, default: str = 'en'):
+        self.backend = backend
+        self.maxsize = maxsize
+        self.default = default
+        self._entries: "OrderedDict[int, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, user_id: int, language: str):
+        self._entries[user_id] = language
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def peek(self, user_id: int) -> Optional[str]:
+        """Cached language without touching the backend"""
+        return self._entries.get(user_id)
+
+    async def get(self, user_id: int) -> str:
+        """Language for user_id, fetched from the backend on a miss"""
+        language = self._entries.get(user_id)
+        if language is not None:
+            self.hits += 1
+            self._entries.move_to_end(user_id)
+            return language
+
+        self.misses += 1
+        language = self.default
+        try:
+            data = await self.backend.get(f"/api/telegram/subscribers/{user_id}", timeout=3)
+            language = data.get('language') or self.default
+        except BackendError as e:
+            if e.status != 404:
+                logger.warning(f"Language lookup failed for {user_id}: {e}")
+                return language
+        except Exception as e:
+            # Don't cache on transient errors; the next message retries
+            logger.warning(f"Language lookup failed for {user_id}: {e}")
+            return language
+
+        self._store(user_id, language)
+        return language
+
+    def set(self, user_id: int, language: str):
+        """Record a changed preference; callers persist it via subscribe_user"""
+        self._store(user_id, language)
+
+    async def load(self, page_size: int = 5000):
+        """Bulk-load the most recently active users' preferences at startup"""
+        offset = 0
+        try:
+            while len(self._entries) < self.maxsize:
+                limit = min(page_size, self.maxsize - len(self._entries))
+                data = await self.backend.get(f"/api/telegram/languages?limit={limit}&offset={offset}", timeout=10)
+                languages = data.get('languages', {})
+                # Pages come most recent first; keep them at the cold end so live traffic wins
+                for user_id, language in languages.items():
+                    user_id = int(user_id)
+                    if user_id not in self._entries:
+                        self._entries[user_id] = language
+                        self._entries.move_to_end(user_id, last=False)
+                if len(languages) < limit:
+                    break
+                offset += limit
+            logger.info(f"Loaded {len(self._entries)} language preferences")
+        except Exception as e:
+            logger.warning(f"Could not preload language preferences: {e}")
@@ -0,0 +1,184 @@
+import asyncio
+import os
+import random
+import time
+from typing import Callable, Dict, Optional
+
+
+class LLMUnavailable(Exception):
+    """Raised when the gateway cannot produce a completion"""
+
+
+class CircuitBreaker:
+    """Fails fast after repeated errors so callers drop straight to fallbacks"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self.state = self.CLOSED
+
+    def allow(self) -> bool:
+        """Return True if a call may go through"""
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self.opened_at >= self.reset_timeout:
+                # Let a single probe through; its result decides the next state
+                self.state = self.HALF_OPEN
+                self.probe_started = now
+                return True
+            return False
+        if self.state == self.HALF_OPEN:
+            # Everyone else keeps failing fast until the probe resolves. A probe that
+            # never reported back (cancelled) is replaced after reset_timeout.
+            if now - self.probe_started >= self.reset_timeout:
+                self.probe_started = now
+                return True
+            return False
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        """Count one failed call (not one per retry attempt)"""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class GeminiBackend:
+    """Gemini backend holding one GenerativeModel per model name.
+
+    The SDK is imported on first use (or by LLMGateway.warm), not at startup.
+    """
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self._genai = None
+        self._models: Dict[str, object] = {}
+
+    def _sdk(self):
+        if self._genai is None:
+            import google.generativeai as genai
+
+            genai.configure(api_key=self.api_key)
+            self._genai = genai
+        return self._genai
+
+    def model(self, model_name: str):
+        model = self._models.get(model_name)
+        if model is None:
+            model = self._sdk().GenerativeModel(model_name)
+            self._models[model_name] = model
+        return model
+
+    async def generate(self, model_name: str, prompt: str) -> str:
+        response = await self.model(model_name).generate_content_async(prompt)
+        return response.text
+
+
+class FakeBackend:
+    """Offline backend with configurable latency and error rate"""
+
+    def __init__(self, responder: Optional[Callable[[str, str], str]] = None,
+                 latency: float = 0.0, error_rate: float = 0.0):
+        self.responder = responder or (lambda model_name, prompt: "OK")
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+
+    def model(self, model_name: str):
+        return model_name
+
+    async def generate(self, model_name: str, prompt: str) -> str:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise RuntimeError("fake LLM error")
+        return self.responder(model_name, prompt)
+
+
+class LLMGateway:
+    """Single entry point for LLM calls: deadlines, jittered retries and a circuit breaker"""
+
+    def __init__(self, backend, timeout: float = 10.0, retries: int = 2,
+                 backoff: float = 0.25, breaker: Optional[CircuitBreaker] = None):
+        self.backend = backend
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+
+    def warm(self, *model_names: str):
+        """Create model instances up front so the first request doesn't pay for it"""
+        for name in model_names:
+            self.backend.model(name)
+
+    async def generate(self, model_name: str, prompt: str, timeout: Optional[float] = None) -> str:
+        """Return the model's text for prompt, or raise LLMUnavailable.
+
+        timeout bounds the whole call, retries and backoff included; each
+        attempt only gets the time that is left.
+        """
+        budget = timeout or self.timeout
+        deadline = time.monotonic() + budget
+        if not self.breaker.allow():
+            raise LLMUnavailable("circuit open (recent failures)")
+
+        last_error: Optional[Exception] = None
+        for attempt in range(self.retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                text = await asyncio.wait_for(self.backend.generate(model_name, prompt), remaining)
+                self.breaker.record_success()
+                return text
+            except Exception as e:
+                last_error = e if not isinstance(e, asyncio.TimeoutError) else TimeoutError(f"timed out after {budget}s")
+            if attempt < self.retries:
+                # Full jitter keeps retries from many requests from lining up
+                delay = random.uniform(0, self.backoff * (2 ** attempt))
+                if time.monotonic() + delay >= deadline:
+                    break
+                await asyncio.sleep(delay)
+
+        self.breaker.record_failure()
+        raise LLMUnavailable(str(last_error or TimeoutError(f"timed out after {budget}s")))
+
+
+def create_gateway() -> LLMGateway:
+    """Build the gateway from environment settings (LLM_BACKEND=gemini|fake)"""
+    backend_name = os.getenv("LLM_BACKEND", "gemini").lower()
+    breaker = CircuitBreaker(
+        failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", 5)),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET", 30)),
+    )
+
+    if backend_name == "fake":
+        backend = FakeBackend(
+            latency=float(os.getenv("FAKE_LLM_LATENCY", 0)),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", 0)),
+        )
+    else:
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in .env file")
+        backend = GeminiBackend(api_key)
+
+    return LLMGateway(
+        backend,
+        timeout=float(os.getenv("LLM_TIMEOUT", 10)),
+        retries=int(os.getenv("LLM_RETRIES", 2)),
+        breaker=breaker,
+    )
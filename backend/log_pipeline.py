@@ -0,0 +1,154 @@
+"""Queue-backed logging shared by server.py and telegram_bot.py.
+
+Log calls only format the record and put it on a bounded in-memory queue; a
+background thread writes to stderr. When the queue is full, records are
+dropped and counted instead of stalling the event loop.
+
+    LOG_LEVEL=INFO|DEBUG|...   initial root level
+    LOG_FORMAT=text|json       json emits one object per line
+    LOG_QUEUE_SIZE=10000       records buffered before dropping
+    LOG_QUIET=httpx,...        loggers held at WARNING (httpx logs every Telegram call)
+
+Levels can be changed while running with set_level(), SIGUSR1 (DEBUG) and
+SIGUSR2 (back to LOG_LEVEL).
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import signal
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from metrics import Counter
+
+DROPPED = Counter('log_records_dropped_total', 'Log records dropped because the log queue was full')
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[QueueListener] = None
+_base_level = logging.INFO
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: a full queue drops the record"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED.inc()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including any `extra=` fields"""
+
+    _reserved = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._reserved:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None,
+                      queue_size: Optional[int] = None) -> QueueListener:
+    """Route the root logger through a queue; safe to call more than once"""
+    global _listener, _base_level
+    if _listener is not None:
+        return _listener
+
+    _base_level = logging.getLevelName((level or os.getenv('LOG_LEVEL', 'INFO')).upper())
+    if not isinstance(_base_level, int):
+        _base_level = logging.INFO
+
+    output = logging.StreamHandler(sys.stderr)
+    if (fmt or os.getenv('LOG_FORMAT', 'text')).lower() == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(queue_size or int(os.getenv('LOG_QUEUE_SIZE', 10000)))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_DroppingQueueHandler(log_queue))
+    root.setLevel(_base_level)
+    for name in os.getenv('LOG_QUIET', 'httpx,httpcore').split(','):
+        if name.strip():
+            logging.getLogger(name.strip()).setLevel(logging.WARNING)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    _install_signal_handlers()
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def set_level(level: str, logger_name: Optional[str] = None) -> str:
+    """Change a logger's level at runtime (root by default); returns the new level name"""
+    numeric = logging.getLevelName(level.upper())
+    if not isinstance(numeric, int):
+        raise ValueError(f"Unknown log level: {level}")
+    logging.getLogger(logger_name).setLevel(numeric)
+    return logging.getLevelName(numeric)
+
+
+def get_levels() -> Dict[str, str]:
+    """Root level plus every logger with an explicit level"""
+    levels = {'root': logging.getLevelName(logging.getLogger().level)}
+    for name, logger in sorted(logging.Logger.manager.loggerDict.items()):
+        if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET:
+            levels[name] = logging.getLevelName(logger.level)
+    return levels
+
+
+def _install_signal_handlers():
+    if not hasattr(signal, 'SIGUSR1') or threading.current_thread() is not threading.main_thread():
+        return
+    signal.signal(signal.SIGUSR1, lambda *_: logging.getLogger().setLevel(logging.DEBUG))
+    signal.signal(signal.SIGUSR2, lambda *_: logging.getLogger().setLevel(_base_level))
+
+
+class SampledLog:
+    """Logs the first event and then one in every `every`, noting how many were skipped.
+
+    For per-recipient events (one failed send per subscriber) that would
+    otherwise flood the log during a large broadcast.
+    """
+
+    def __init__(self, logger: logging.Logger, every: int = 100):
+        self.logger = logger
+        self.every = max(1, every)
+        self.seen = 0
+
+    def log(self, level: int, msg: str, *args):
+        self.seen += 1
+        if (self.seen - 1) % self.every:
+            return
+        if self.seen > 1 and self.logger.isEnabledFor(level):
+            msg += f" ({self.every - 1} similar suppressed)"
+        self.logger.log(level, msg, *args)
+
+    def warning(self, msg: str, *args):
+        self.log(logging.WARNING, msg, *args)
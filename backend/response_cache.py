@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+
+from metrics import Counter
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_REQUESTS = Counter('response_cache_requests_total', 'Cached GET responses by outcome',
+                                  ['endpoint', 'result'])
+
+GENERATION_KEY = "response_cache_generation"
+
+
+def dumps(data) -> bytes:
+    """Compact UTF-8 JSON, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class ResponseCache:
+    """Serialised JSON bodies (with their ETags) keyed by (endpoint, params).
+
+    Entries are built from the data they were computed from and dropped
+    together by invalidate(), which the Database calls whenever broadcasts
+    change. With a shared_state.SharedStore an invalidation counter in the
+    store carries writes between workers: invalidate() drops this worker's
+    entries at once and bumps the counter in the background, and start()
+    runs a loop that picks up other workers' bumps every poll_interval.
+    Nothing touches the store on the request path.
+    """
+
+    def __init__(self, maxsize: int = 256, store=None, poll_interval: float = 0.5):
+        self.maxsize = maxsize
+        self.store = store
+        self.poll_interval = poll_interval
+        # Local invalidations, and the store's counter as of the last poll
+        self._generation = 0
+        self._shared_generation = 0
+        self._pending = 0
+        self._writer: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        # key -> (generation, built_at, body, etag)
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple[int, int], float, bytes, str]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def generation(self) -> Tuple[int, int]:
+        return self._shared_generation, self._generation
+
+    def invalidate(self):
+        """Drop every entry (in every worker, with a store)"""
+        self._generation += 1
+        if self.store is None:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Called off the event loop (a thread, a script): nothing to stall
+            self._seen(self.store.incr(GENERATION_KEY))
+            return
+        self._pending += 1
+        if self._writer is None:
+            self._writer = asyncio.ensure_future(self._write_pending())
+
+    async def _write_pending(self):
+        try:
+            while self._pending:
+                count, self._pending = self._pending, 0
+                try:
+                    self._seen(await self.store.run(self.store.incr, GENERATION_KEY, count))
+                except sqlite3.Error as e:
+                    logger.warning(f"Response cache invalidation not shared with other workers: {e}")
+        finally:
+            self._writer = None
+
+    def _seen(self, shared_generation: int):
+        # A poll can return after our own increment has landed; the counter only goes up
+        self._shared_generation = max(self._shared_generation, shared_generation)
+
+    async def _poll(self):
+        while True:
+            try:
+                self._seen(await self.store.run(self.store.get, GENERATION_KEY) or 0)
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache generation poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if self.store is not None and self._task is None:
+            self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._writer is not None:
+            await self._writer
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_or_build(self, endpoint: str, key: Hashable, build: Callable[[], object],
+                     max_age: Optional[float] = None) -> Tuple[bytes, str]:
+        """Return (body, etag) for key, calling build() only when the cached body is stale.
+
+        max_age bounds how long an entry lives for data that changes without an
+        invalidation (e.g. subscriber counts in analytics).
+        """
+        generation = self.generation()
+        now = time.monotonic()
+        entry = self._entries.get((endpoint, key))
+        if entry is not None and entry[0] == generation and (max_age is None or now - entry[1] < max_age):
+            self._entries.move_to_end((endpoint, key))
+            RESPONSE_CACHE_REQUESTS.inc(endpoint=endpoint, result='hit')
+            return entry[2], entry[3]
+
+        RESPONSE_CACHE_REQUESTS.inc(endpoint=endpoint, result='miss')
+        body = dumps(build())
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self._entries[(endpoint, key)] = (generation, now, body, etag)
+        self._entries.move_to_end((endpoint, key))
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return body, etag
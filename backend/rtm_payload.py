@@ -0,0 +1,59 @@
+import json
+from typing import Dict, List, Sequence, Tuple
+
+# Agora RTM rejects channel messages over 32 KB; keep headroom for the envelope
+MAX_PAYLOAD_BYTES = 32 * 1024
+SAFE_PAYLOAD_BYTES = 30 * 1024
+
+# Translations the web feed reads from the base channel (BroadcastFeed shows
+# translations.hi); kept there when sharding so existing listeners still get them
+BASE_LANGUAGES = ('hi',)
+
+
+class PayloadTooLarge(ValueError):
+    """A single-language payload still exceeds the RTM message limit"""
+
+
+def channel_for(base_channel: str, language: str) -> str:
+    """Per-language channel name, e.g. EMERGENCY_ALERTS_hi"""
+    return f"{base_channel}_{language}"
+
+
+def encode(message: Dict) -> str:
+    """Compact JSON: no whitespace, and native scripts as UTF-8 instead of \\u escapes"""
+    return json.dumps(message, ensure_ascii=False, separators=(',', ':'))
+
+
+def payload_size(payload: str) -> int:
+    return len(payload.encode('utf-8'))
+
+
+def _broadcast(data: Dict, translations: Dict[str, str]) -> Dict:
+    return {'type': 'broadcast', 'data': {**data, 'translations': translations}}
+
+
+def build_payloads(base_channel: str, data: Dict, translations: Dict[str, str],
+                   shard: bool = False, base_languages: Sequence[str] = BASE_LANGUAGES) -> List[Tuple[str, str]]:
+    """(channel, payload) pairs to publish for one broadcast.
+
+    Unsharded, everything goes to base_channel in one message. Sharded (or when
+    the combined message would exceed the size limit) each language gets its own
+    channel, and base_channel keeps the original message plus the
+    base_languages translations so existing listeners keep working; those are
+    dropped from it only if they alone would push it over the size limit.
+    """
+    if not shard:
+        full = encode(_broadcast(data, translations))
+        if payload_size(full) <= SAFE_PAYLOAD_BYTES:
+            return [(base_channel, full)]
+
+    base = encode(_broadcast(data, {lang: translations[lang] for lang in base_languages if lang in translations}))
+    if payload_size(base) > SAFE_PAYLOAD_BYTES:
+        base = encode(_broadcast(data, {}))
+    payloads = [(base_channel, base)]
+    for language, text in translations.items():
+        payload = encode(_broadcast({**data, 'language': language}, {language: text}))
+        if payload_size(payload) > SAFE_PAYLOAD_BYTES:
+            raise PayloadTooLarge(f"{language} message is {payload_size(payload)} bytes, over the RTM limit")
+        payloads.append((channel_for(base_channel, language), payload))
+    return payloads
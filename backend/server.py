@@ -1,36 +1,74 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from websockets.exceptions import ConnectionClosed
+from typing import List, Dict, Optional, Tuple
 import asyncio
+import itertools
+import logging
 import os
 import json
 from dotenv import load_dotenv
-from datetime import datetime
-import aiohttp
+from datetime import datetime, timedelta
 from database import Database
-from telegram import Bot
-from telegram.error import TelegramError
+from llm_gateway import create_gateway, LLMUnavailable
+from venue import VenueStore
 import time
+from log_pipeline import configure_logging, get_levels, set_level, SampledLog
 
-# --- API Imports ---
-import google.generativeai as genai
-import base64
-from agora_token_builder import RtmTokenBuilder, RtcTokenBuilder
+# --- API Imports (SDKs for Telegram, Agora and Gemini are imported lazily) ---
+from token_cache import TokenCache
+from geo_index import GeoIndex, parse_coordinates
+from shared_state import SharedStore, SharedRateLimiter
+from fanout import PartitionedFanout
+from response_cache import ResponseCache, RESPONSE_CACHE_REQUESTS
+from event_hub import EventHub
+import metrics
+from metrics import Counter, Gauge, Histogram
+from rtm_payload import build_payloads as build_rtm_payloads
+from broadcast_orchestrator import (
+    BroadcastJob, BroadcastOrchestrator, BroadcastTimeline, ChannelResult, AgoraRTMChannel, TelegramChannel,
+    OutboxChannel, TELEGRAM_SEND_SECONDS
+)
 
 load_dotenv()
 
-app = FastAPI(title="Emergency Broadcast System")
+# Log records are queued and written by a background thread, off the event loop
+configure_logging()
+logger = logging.getLogger("server")
+# Per-recipient events (failed sends) are logged one in LOG_SAMPLE_EVERY
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", 100))
+
+# --- Configuration (read at import; services are created in the lifespan) ---
+TRANSLATION_MODEL = os.getenv("GEMINI_TRANSLATION_MODEL", "gemini-2.5-flash")
+CHAT_MODEL = os.getenv("GEMINI_CHAT_MODEL", "gemini-2.5-flash")
+TRANSLATION_TIMEOUT = float(os.getenv("LLM_TRANSLATION_TIMEOUT", 20))
+CHAT_TIMEOUT = float(os.getenv("LLM_CHAT_TIMEOUT", 8))
+DATABASE_PATH = os.getenv("DATABASE_PATH", "emergency.db")
+TELEGRAM_SEND_CONCURRENCY = int(os.getenv("TELEGRAM_SEND_CONCURRENCY", 20))
+
+# --- Multi-worker mode (python server.py --workers N sets WEB_CONCURRENCY for every worker) ---
+WORKERS = int(os.getenv("WEB_CONCURRENCY", 1))
+# Rate limits, tokens and fan-out partitions shared by the workers on this host
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "shared_state.db")
+# How often each worker picks up locations and languages saved by the others
+GEO_SYNC_INTERVAL = float(os.getenv("GEO_SYNC_INTERVAL", 2))
+# Subscriber counts in /api/analytics change without a broadcast; cap how stale they get
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", 5))
 
-# --- Configure Gemini API ---
-try:
-    gemini_api_key = os.getenv("GEMINI_API_KEY")
-    if not gemini_api_key:
-        raise ValueError("GEMINI_API_KEY not found in .env file")
-    genai.configure(api_key=gemini_api_key)
-    print("✅ Gemini AI initialized (for AI chat and Translation)")
-except Exception as e:
-    print(f"⚠️  Gemini AI not initialized: {e}")
+# --- Dashboard event streams (SSE at /api/events, WebSocket at /api/events/ws) ---
+EVENT_HISTORY = int(os.getenv("EVENT_HISTORY", 1000))  # events kept for Last-Event-ID resume
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 256))  # a client further behind is dropped
+EVENT_HEARTBEAT = float(os.getenv("EVENT_HEARTBEAT", 15))  # SSE keep-alive comment interval
+
+# --- AGORA CREDENTIALS & TOKEN SERVER ---
+AGORA_APP_ID = os.getenv("AGORA_APP_ID")
+AGORA_APP_CERTIFICATE = os.getenv("AGORA_APP_CERTIFICATE")
+AGORA_SERVER_USER_ID = os.getenv("AGORA_SERVER_USER_ID", "emergency_server")
+# Publish each language on its own channel (EMERGENCY_ALERTS_<lang>) so listeners only get theirs
+AGORA_SHARD_BY_LANGUAGE = os.getenv("AGORA_SHARD_BY_LANGUAGE", "false").lower() == "true"
 
 # --- All Indian Languages (ISO 639-1 codes) ---
 ALL_INDIAN_LANGUAGES = [
@@ -38,6 +76,168 @@ ALL_INDIAN_LANGUAGES = [
     'ml', 'as', 'mai', 'sa', 'ne', 'ks', 'sd', 'kok', 'mni', 'brx', 'doi', 'sat'
 ]
 
+# Created by startup() in the lifespan, so importing this module stays cheap
+db: Optional[Database] = None
+llm = None
+telegram_bot = None
+agora_publisher = None
+webhook_ingress = None
+orchestrator: Optional[BroadcastOrchestrator] = None
+shared_store: Optional[SharedStore] = None  # only with WORKERS > 1
+fanout: Optional[PartitionedFanout] = None
+event_hub: Optional[EventHub] = None
+
+# Cheap in-memory state, safe to create at import
+geo_index = GeoIndex()  # last known subscriber positions, for radius-targeted delivery
+venue = VenueStore()  # venue knowledge (exits, safe zones, facilities) shared by prompts and fallbacks
+
+# Issued tokens are reused for the first part of their TTL (reconnect storms hit the cache)
+token_cache = TokenCache(
+    ttl=int(os.getenv("AGORA_TOKEN_TTL", 3600 * 24)),
+    reuse_fraction=float(os.getenv("TOKEN_REUSE_FRACTION", 0.5)),
+    maxsize=int(os.getenv("TOKEN_CACHE_SIZE", 100_000)),
+)
+
+# Serialised dashboard responses, dropped whenever a broadcast is written
+response_cache = ResponseCache()
+
+# Liveness is "the process answers"; readiness is "startup finished and the LLM is warm"
+startup_state = {'ready': False, 'llmWarm': False, 'startupMs': None}
+
+def init_llm():
+    try:
+        gateway = create_gateway()
+        logger.info("✅ LLM gateway initialized (for AI chat and Translation)")
+        return gateway
+    except Exception as e:
+        logger.warning(f"⚠️  LLM gateway not initialized: {e}")
+        return None
+
+async def warm_llm():
+    """Import the Gemini SDK and build the models off the event loop"""
+    if llm is not None:
+        try:
+            await asyncio.to_thread(llm.warm, TRANSLATION_MODEL, CHAT_MODEL)
+        except Exception as e:
+            logger.warning(f"⚠️  LLM warm-up failed, models load on first use: {e}")
+    startup_state['llmWarm'] = True
+    startup_state['ready'] = True
+
+def init_telegram_bot():
+    try:
+        from telegram import Bot
+        from telegram.request import HTTPXRequest
+        
+        bot = Bot(
+            token=os.getenv('TELEGRAM_BOT_TOKEN'),
+            base_url=os.getenv('TELEGRAM_API_BASE_URL', 'https://api.telegram.org/bot'),
+            # The default pool is a single connection, which serialises the concurrent senders
+            request=HTTPXRequest(connection_pool_size=TELEGRAM_SEND_CONCURRENCY)
+        )
+        logger.info("✅ Telegram bot initialized")
+        return bot
+    except Exception as e:
+        logger.warning(f"⚠️  Telegram bot not initialized: {e}")
+        return None
+
+def init_agora_publisher():
+    """Long-lived RTM publisher; its session is opened/closed in the app lifespan"""
+    if not (AGORA_APP_ID and AGORA_APP_CERTIFICATE):
+        return None
+    from agora_publisher import AgoraPublisher
+    
+    return AgoraPublisher(
+        AGORA_APP_ID,
+        AGORA_APP_CERTIFICATE,
+        AGORA_SERVER_USER_ID,
+        base_url=os.getenv("AGORA_API_BASE_URL", "https://api.agora.io"),
+        timeout=float(os.getenv("AGORA_PUBLISH_TIMEOUT", 5)),
+        retries=int(os.getenv("AGORA_PUBLISH_RETRIES", 3)),
+    )
+
+def mount_webhook(app: FastAPI):
+    """Optional Telegram webhook ingress, mounted next to the API"""
+    if os.getenv("TELEGRAM_WEBHOOK_MOUNT", "false").lower() != "true":
+        return None
+    try:
+        from telegram_bot import build_webhook_ingress
+        from telegram_webhook import create_webhook_app
+        ingress = build_webhook_ingress(os.getenv('TELEGRAM_BOT_TOKEN'))
+        app.mount("/telegram", create_webhook_app(ingress, manage_lifespan=False))
+        logger.info("✅ Telegram webhook mounted at /telegram/webhook")
+        return ingress
+    except Exception as e:
+        logger.warning(f"⚠️  Telegram webhook not mounted: {e}")
+        return None
+
+async def sync_geo_index():
+    """Multi-worker mode: apply location and language changes other workers saved"""
+    since = datetime.now()
+    while True:
+        await asyncio.sleep(GEO_SYNC_INTERVAL)
+        # Overlap the previous window so rows committed while it was read aren't missed
+        started = datetime.now() - timedelta(seconds=GEO_SYNC_INTERVAL)
+        try:
+            geo_index.bulk_load(db.get_subscriber_locations(since.isoformat()))
+            since = started
+        except Exception as e:
+            logger.warning(f"⚠️  Geo index sync failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global db, llm, telegram_bot, agora_publisher, webhook_ingress, orchestrator, shared_store, event_hub
+    started = time.perf_counter()
+    
+    db = Database(DATABASE_PATH)
+    db.change_listeners.append(response_cache.invalidate)
+    geo_index.bulk_load(db.get_subscriber_locations())
+    logger.info(f"📍 Geo index loaded: {len(geo_index)} located subscribers")
+    if WORKERS > 1:
+        shared_store = SharedStore(SHARED_STATE_PATH)
+        token_cache.store = shared_store
+        response_cache.store = shared_store
+        response_cache.start()
+    event_hub = EventHub(history=EVENT_HISTORY, queue_size=EVENT_QUEUE_SIZE, store=shared_store)
+    event_hub.start()
+    
+    llm = init_llm()
+    telegram_bot = init_telegram_bot()
+    agora_publisher = init_agora_publisher()
+    if agora_publisher:
+        await agora_publisher.start()
+    webhook_ingress = mount_webhook(app)
+    if webhook_ingress:
+        await webhook_ingress.start()
+    orchestrator = build_orchestrator()
+    background = []
+    if shared_store:
+        background.append(asyncio.create_task(sync_geo_index()))
+    if fanout:
+        fanout.start()
+    
+    startup_state['startupMs'] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"🚀 Worker {os.getpid()} started in {startup_state['startupMs']}ms ({WORKERS} worker(s))")
+    warm_task = asyncio.create_task(warm_llm())
+    yield
+    
+    startup_state['ready'] = False
+    warm_task.cancel()
+    for task in background:
+        task.cancel()
+    await orchestrator.stop(timeout=float(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", 10)))
+    if fanout:
+        await fanout.stop()
+    await event_hub.stop()
+    await response_cache.stop()
+    if webhook_ingress:
+        await webhook_ingress.stop()
+    if agora_publisher:
+        await agora_publisher.close()
+    if shared_store:
+        shared_store.close()
+
+app = FastAPI(title="Emergency Broadcast System", lifespan=lifespan)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -47,21 +247,62 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize database
-db = Database()
+# --- Metrics (scraped from /metrics) ---
+GEMINI_SECONDS = Histogram('gemini_request_seconds', 'Gemini call latency through the LLM gateway',
+                           ['operation', 'outcome'])
+FALLBACKS = Counter('fallbacks_total', 'Responses served without the LLM', ['operation', 'reason'])
+CHAT_RESPONSES = Counter('chat_responses_total', 'AI chat answers by source', ['source'])
+BROADCAST_FAILURES = Counter('broadcast_failures_total', 'Broadcast requests that failed', ['endpoint'])
+Counter('token_cache_requests_total', 'Agora token cache lookups', ['result'],
+        function=lambda: {('hit',): token_cache.hits, ('miss',): token_cache.misses})
+Gauge('token_cache_entries', 'Tokens held in the cache', function=lambda: len(token_cache))
+Gauge('response_cache_entries', 'Serialised responses held in the cache', function=lambda: len(response_cache))
+Gauge('llm_circuit_open', '1 while the LLM circuit breaker is failing fast',
+      function=lambda: int(llm is not None and llm.breaker.state == llm.breaker.OPEN))
+Gauge('geo_index_subscribers', 'Subscribers with a known location', function=lambda: len(geo_index))
+Gauge('telegram_webhook_queue_depth', 'Updates waiting in the mounted webhook queue',
+      function=lambda: webhook_ingress.application.update_queue.qsize() if webhook_ingress else 0)
+Gauge('event_stream_clients', 'Connected SSE and WebSocket dashboard clients',
+      function=lambda: len(event_hub) if event_hub else 0)
+Gauge('fanout_partitions_pending', 'Broadcast partitions waiting for a worker (multi-worker mode)',
+      function=lambda: fanout.stats()['pending'] if fanout else 0)
 
-# Telegram bot instance
-telegram_bot = None
-try:
-    telegram_bot = Bot(token=os.getenv('TELEGRAM_BOT_TOKEN'))
-    print("✅ Telegram bot initialized")
-except Exception as e:
-    print(f"⚠️  Telegram bot not initialized: {e}")
+def _token_builders():
+    from agora_token_builder import RtmTokenBuilder, RtcTokenBuilder
+    return RtmTokenBuilder, RtcTokenBuilder
 
-# --- AGORA CREDENTIALS & TOKEN SERVER ---
-AGORA_APP_ID = os.getenv("AGORA_APP_ID")
-AGORA_APP_CERTIFICATE = os.getenv("AGORA_APP_CERTIFICATE")
-AGORA_SERVER_USER_ID = os.getenv("AGORA_SERVER_USER_ID", "emergency_server")
+async def issue_rtm_token(user_id: str) -> Tuple[str, int]:
+    """RTM login token for user_id as (token, expires_at)"""
+    return await token_cache.get_or_issue(
+        ('rtm', user_id, None, 1),
+        lambda privilege_expired_ts: _token_builders()[0].buildToken(
+            AGORA_APP_ID,
+            AGORA_APP_CERTIFICATE,
+            user_id,
+            1,  # Role.Rtm_User
+            privilege_expired_ts
+        )
+    )
+
+async def issue_rtc_token(channel_name: str, user_id: str) -> Tuple[str, int]:
+    """RTC publisher token for user_id in channel_name as (token, expires_at)"""
+    # Convert uid to integer
+    try:
+        uid_int = int(user_id)
+    except ValueError:
+        uid_int = 0  # Use 0 for string UIDs
+    
+    return await token_cache.get_or_issue(
+        ('rtc', uid_int, channel_name, 1),
+        lambda privilege_expired_ts: _token_builders()[1].buildTokenWithUid(
+            AGORA_APP_ID,
+            AGORA_APP_CERTIFICATE,
+            channel_name,
+            uid_int,
+            1,  # Role.PUBLISHER
+            privilege_expired_ts
+        )
+    )
 
 @app.get("/api/token/rtm/{user_id}")
 async def get_rtm_token(user_id: str):
@@ -70,24 +311,10 @@ async def get_rtm_token(user_id: str):
         raise HTTPException(status_code=500, detail="Agora RTM credentials not configured")
     
     try:
-        expiration_time_in_seconds = 3600 * 24  # 24 hours
-        current_timestamp = int(time.time())
-        privilege_expired_ts = current_timestamp + expiration_time_in_seconds
-        
-        # Correct method signature for RTM token
-        token = RtmTokenBuilder.buildToken(
-            AGORA_APP_ID,
-            AGORA_APP_CERTIFICATE,
-            user_id,
-            1,  # Role.Rtm_User
-            privilege_expired_ts
-        )
-        
-        return {"token": token, "user_id": user_id, "appId": AGORA_APP_ID}
+        token, expires_at = await issue_rtm_token(user_id)
+        return {"token": token, "user_id": user_id, "appId": AGORA_APP_ID, "expiresAt": expires_at}
     except Exception as e:
-        print(f"❌ Error generating RTM token: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Error generating RTM token: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/token/rtc/{channel_name}/{user_id}")
@@ -97,28 +324,11 @@ async def get_rtc_token(channel_name: str, user_id: str):
         raise HTTPException(status_code=500, detail="Agora RTC credentials not configured")
     
     try:
-        expiration_time_in_seconds = 3600 * 24  # 24 hours
-        current_timestamp = int(time.time())
-        privilege_expired_ts = current_timestamp + expiration_time_in_seconds
-        
-        # Convert uid to integer
-        try:
-            uid_int = int(user_id)
-        except ValueError:
-            uid_int = 0  # Use 0 for string UIDs
-        
-        token = RtcTokenBuilder.buildTokenWithUid(
-            AGORA_APP_ID,
-            AGORA_APP_CERTIFICATE,
-            channel_name,
-            uid_int,
-            1,  # Role.PUBLISHER
-            privilege_expired_ts
-        )
-        
-        return {"token": token, "user_id": user_id, "channel": channel_name, "appId": AGORA_APP_ID}
+        token, expires_at = await issue_rtc_token(channel_name, user_id)
+        return {"token": token, "user_id": user_id, "channel": channel_name, "appId": AGORA_APP_ID,
+                "expiresAt": expires_at}
     except Exception as e:
-        print(f"❌ Error generating RTC token: {e}")
+        logger.error(f"❌ Error generating RTC token: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Pydantic models
@@ -128,6 +338,24 @@ class BroadcastMessage(BaseModel):
     location: Optional[str] = ""
     radius: Optional[int] = 5000
     emergency: Optional[bool] = False
+    # Opt-in geo-targeting: Telegram goes to subscribers within radius of (latitude, longitude),
+    # or of a "lat,lon" location, plus every subscriber who has never shared a location
+    geoTarget: Optional[bool] = False
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+    def coordinates(self) -> Optional[Tuple[float, float]]:
+        """Target centre, or None when not geo-targeted; ValueError if geoTarget has no usable position"""
+        if not self.geoTarget:
+            return None
+        if self.latitude is not None and self.longitude is not None:
+            if -90 <= self.latitude <= 90 and -180 <= self.longitude <= 180:
+                return self.latitude, self.longitude
+            raise ValueError("latitude/longitude out of range")
+        coordinates = parse_coordinates(self.location)
+        if coordinates is None:
+            raise ValueError("geoTarget needs latitude and longitude (or a 'lat,lon' location)")
+        return coordinates
 
 class ChatMessage(BaseModel):
     message: str
@@ -145,6 +373,30 @@ class TelegramSubscriber(BaseModel):
     firstName: Optional[str] = ""
     language: Optional[str] = "en"
 
+class TelegramSubscriberBatch(BaseModel):
+    subscribers: List[TelegramSubscriber]
+
+class SubscriberLocation(BaseModel):
+    userId: int
+    latitude: float
+    longitude: float
+
+class DispatchBroadcast(BroadcastMessage):
+    channels: Optional[List[str]] = None  # default: every enabled channel
+    wait: Optional[bool] = False  # respond after delivery with per-channel results (benchmarks, tests)
+
+class TokenRequest(BaseModel):
+    type: str  # 'rtm' or 'rtc'
+    userId: str
+    channel: Optional[str] = None
+
+class TokenBatch(BaseModel):
+    requests: List[TokenRequest]
+
+class LogLevel(BaseModel):
+    level: str
+    logger: Optional[str] = None  # default: root
+
 # --- Translation function using Gemini ---
 async def translate_message_gemini(text: str, target_languages: List[str]) -> Dict[str, str]:
     """Translates text into multiple languages using Gemini in a single call."""
@@ -160,8 +412,10 @@ async def translate_message_gemini(text: str, target_languages: List[str]) -> Di
         'brx': 'Bodo', 'doi': 'Dogri', 'sat': 'Santali'
     }
     
+    json_text = ""
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        if llm is None:
+            raise LLMUnavailable("LLM gateway not configured")
         
         # Create a clear list of language requests
         lang_requests = []
@@ -197,8 +451,14 @@ Translate the above message into the following languages. Provide ONLY valid JSO
 
 JSON Output:"""
         
-        response = await model.generate_content_async(prompt)
-        json_text = response.text.strip()
+        start = time.perf_counter()
+        try:
+            response_text = await llm.generate(TRANSLATION_MODEL, prompt, timeout=TRANSLATION_TIMEOUT)
+        except LLMUnavailable:
+            GEMINI_SECONDS.observe(time.perf_counter() - start, operation='translate', outcome='error')
+            raise
+        GEMINI_SECONDS.observe(time.perf_counter() - start, operation='translate', outcome='ok')
+        json_text = response_text.strip()
         
         # Clean up any markdown formatting
         json_text = json_text.replace("```json", "").replace("```", "").strip()
@@ -209,93 +469,134 @@ JSON Output:"""
             end = json_text.rindex("}") + 1
             json_text = json_text[start:end]
         
-        print(f"🔍 Gemini response: {json_text[:200]}...")  # Debug log
+        logger.debug("🔍 Gemini response: %.200s...", json_text)
         
         translations = json.loads(json_text)
-        print(f"✅ Parsed {len(translations)} translations")
+        logger.debug("✅ Parsed %d translations", len(translations))
         
         # Fill in any missing languages with original text
         for lang in target_languages:
             if lang not in translations:
-                print(f"⚠️  Missing translation for {lang}, using original")
+                logger.debug("⚠️  Missing translation for %s, using original", lang)
                 translations[lang] = text
                 
         return translations
         
     except json.JSONDecodeError as e:
-        print(f"❌ JSON parsing error: {e}")
-        print(f"📄 Raw response: {json_text[:500]}")
+        logger.error(f"❌ JSON parsing error: {e}")
+        logger.debug("📄 Raw response: %.500s", json_text)
+        FALLBACKS.inc(operation='translate', reason='parse_error')
         # Return original text for all languages as fallback
         return {lang: text for lang in target_languages}
+    except LLMUnavailable as e:
+        logger.warning(f"⚠️  Translation unavailable, using original text: {e}")
+        FALLBACKS.inc(operation='translate', reason='unavailable')
+        return {lang: text for lang in target_languages}
     except Exception as e:
-        print(f"❌ Gemini translation error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Gemini translation error: {e}")
+        FALLBACKS.inc(operation='translate', reason='error')
         return {lang: text for lang in target_languages}
 
 # --- AI Response function ---
 async def get_ai_response(message: str, language: str = 'en') -> str:
     """Get contextual AI response from Gemini"""
-    message_lower = message.lower()
-    
     # Check for fallback responses first
-    EMERGENCY_RESPONSES = {
-        'exit': {
-            'en': "🚪 Nearest exit: Gate 2 (50m to your right). Follow the GREEN emergency signs.",
-            'hi': "🚪 निकटतम निकास: गेट 2 (आपके दाईं ओर 50 मीटर)। हरे आपातकालीन संकेतों का पालन करें।"
-        },
-        'safe': {
-            'en': "🛡️ Safe zone: Main courtyard (100m north). Gather there and await instructions.",
-            'hi': "🛡️ सुरक्षित क्षेत्र: मुख्य प्रांगण (100 मीटर उत्तर)। वहां इकट्ठा हों और निर्देशों का इंतजार करें।"
-        },
-        'help': {
-            'en': "🆘 Emergency services notified. Stay calm. Share your location if you need immediate help.",
-            'hi': "🆘 आपातकालीन सेवाओं को सूचित कर दिया गया है। शांत रहें।"
-        },
-        'water': {
-            'en': "💧 Water stations: South entrance, Medical station (Gate 2), Main gate reception.",
-            'hi': "💧 जल केंद्र: दक्षिण प्रवेश द्वार, चिकित्सा केंद्र (गेट 2), मुख्य द्वार।"
-        },
-        'medical': {
-            'en': "🏥 First aid: Gate 2 medical station. For emergencies: Dial 112",
-            'hi': "🏥 प्राथमिक चिकित्सा: गेट 2। आपात स्थिति: 112 डायल करें।"
-        },
-        'fire': {
-            'en': "🔥 FIRE: Use North & South exits. Stay LOW, cover mouth, NO elevators!",
-            'hi': "🔥 आग: उत्तर और दक्षिण गेट से बाहर निकलें। नीचे रहें, मुंह ढकें!"
-        }
-    }
-    
-    for keyword, responses in EMERGENCY_RESPONSES.items():
-        if keyword in message_lower:
-            return responses.get(language, responses['en'])
+    quick = venue.quick_response(message, language)
+    if quick:
+        CHAT_RESPONSES.inc(source='quick')
+        return quick
 
     try:
-        model = genai.GenerativeModel('gemini-pro')
+        if llm is None:
+            raise LLMUnavailable("LLM gateway not configured")
         prompt = f"""You are an emergency response assistant for a large public event.
 A user, whose preferred language is {language}, has sent: "{message}"
 Provide a clear, concise response in {language}.
 Keep it short like a text message.
 
 Context:
-- Exits: Gate 1 (North), Gate 2 (Main, East), South Emergency Exit
-- Safe Zones: Main Courtyard (North), Sports Field (West)
-- Medical: Gate 2 Medical Station
-- Water: South Entrance, Main Gate
-- Emergency Number: 112
+{venue.prompt_context()}
 Response:"""
         
-        response = await model.generate_content_async(prompt)
-        ai_text = response.text.strip()
+        start = time.perf_counter()
+        try:
+            ai_text = (await llm.generate(CHAT_MODEL, prompt, timeout=CHAT_TIMEOUT)).strip()
+        except LLMUnavailable:
+            GEMINI_SECONDS.observe(time.perf_counter() - start, operation='chat', outcome='error')
+            raise
+        GEMINI_SECONDS.observe(time.perf_counter() - start, operation='chat', outcome='ok')
         
         if not ai_text or "I am not able" in ai_text:
-            return EMERGENCY_RESPONSES['help'].get(language, EMERGENCY_RESPONSES['help']['en'])
+            FALLBACKS.inc(operation='chat', reason='empty')
+            CHAT_RESPONSES.inc(source='fallback')
+            return venue.response('help', language)
             
+        CHAT_RESPONSES.inc(source='llm')
         return ai_text
 
     except Exception as e:
-        print(f"❌ Gemini AI error: {e}")
-        return EMERGENCY_RESPONSES['help'].get(language, EMERGENCY_RESPONSES['help']['en'])
+        logger.error(f"❌ Gemini AI error: {e}")
+        FALLBACKS.inc(operation='chat', reason='unavailable' if isinstance(e, LLMUnavailable) else 'error')
+        CHAT_RESPONSES.inc(source='fallback')
+        return venue.response('help', language)
+
+def telegram_recipients(job: BroadcastJob):
+    """Everyone, or for a geo-targeted broadcast the subscribers inside its radius plus those
+    with no known location, who can't be ruled out (limited to the job's partition in
+    multi-worker mode)"""
+    if job.targeted:
+        nearby = (r for r in geo_index.within(job.latitude, job.longitude, job.radius) if job.includes(r[0]))
+        return itertools.chain(nearby, db.get_telegram_recipients(job.partition, job.partitions, located=False))
+    return db.get_telegram_recipients(job.partition, job.partitions)
+
+# --- Multi-channel orchestrator: translate once, save once, fan out concurrently ---
+def build_orchestrator() -> BroadcastOrchestrator:
+    global fanout
+    rate = float(os.getenv("TELEGRAM_SEND_RATE", 25))
+    telegram = TelegramChannel(
+        telegram_bot,
+        telegram_recipients,
+        concurrency=TELEGRAM_SEND_CONCURRENCY,
+        log_every=LOG_SAMPLE_EVERY,
+        rate=rate,
+        # Telegram's limit is per bot, so the workers draw from one budget
+        limiter=SharedRateLimiter(shared_store, "telegram_send", rate) if shared_store else None,
+        events=event_hub
+    )
+    if shared_store and telegram_bot:
+        # Each worker sends one partition of every broadcast, whichever worker received it
+        fanout = telegram.fanout = PartitionedFanout(
+            shared_store, telegram.send, partitions=int(os.getenv("FANOUT_PARTITIONS", WORKERS)),
+            lease=float(os.getenv("FANOUT_LEASE", 60))
+        )
+    orchestrator = BroadcastOrchestrator(
+        lambda text: translate_message_gemini(text, ALL_INDIAN_LANGUAGES),
+        db,
+        [
+            AgoraRTMChannel(agora_publisher, shard=AGORA_SHARD_BY_LANGUAGE),
+            telegram,
+        ],
+        events=event_hub
+    )
+    # Local stand-ins for channels we don't have gateways for yet
+    if os.getenv("SMS_GATEWAY_STUB", "false").lower() == "true":
+        orchestrator.register(OutboxChannel("sms_gateway"))
+    if os.getenv("LOCAL_PUSH_STUB", "false").lower() == "true":
+        orchestrator.register(OutboxChannel("local_push"))
+    return orchestrator
+
+def cached_json(request: Request, endpoint: str, key, build, max_age: Optional[float] = None) -> Response:
+    """Serve build()'s JSON from response_cache, or a bare 304 when If-None-Match has the current ETag"""
+    body, etag = response_cache.get_or_build(endpoint, key, build, max_age)
+    # no-cache: clients may keep the body but must revalidate, which is what makes polling cheap
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        if etag in tags or '*' in tags:
+            RESPONSE_CACHE_REQUESTS.inc(endpoint=endpoint, result='not_modified')
+            return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 # API Routes
 @app.get("/")
@@ -311,110 +612,230 @@ async def root():
             "agora_rtm_token": "/api/token/rtm/{user_id}",
             "agora_rtc_token": "/api/token/rtc/{channel_name}/{user_id}",
             "broadcast": "POST /api/broadcasts",
-            "ai_chat": "POST /api/ai-chat"
+            "broadcast_all_channels": "POST /api/broadcasts/dispatch",
+            "ai_chat": "POST /api/ai-chat",
+            "events_sse": "/api/events",
+            "events_websocket": "/api/events/ws",
+            "metrics": "/metrics"
         }
     }
 
 @app.get("/api/health")
 async def health_check():
-    analytics = db.get_analytics()
+    if db is None:
+        raise HTTPException(status_code=503, detail="Starting up")
     return {
         "status": "healthy",
-        "telegram_subscribers": analytics.get('telegramSubscribers', 0),
+        "ready": startup_state['ready'],
+        "worker": os.getpid(),
+        "workers": WORKERS,
+        "telegram_subscribers": db.get_subscriber_count(),
         "agora_configured": bool(AGORA_APP_ID and AGORA_APP_CERTIFICATE)
     }
 
+@app.get("/api/health/live")
+async def liveness():
+    """The process is up and the event loop is responsive"""
+    return {"status": "alive"}
+
+@app.get("/api/health/ready")
+async def readiness():
+    """Startup finished and the LLM is warm; 503 until then (and while shutting down)"""
+    body = {"status": "ready" if startup_state['ready'] else "starting", **startup_state}
+    if not startup_state['ready']:
+        return JSONResponse(body, status_code=503)
+    return body
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text-format metrics"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/api/log-level")
+async def get_log_levels():
+    return {'success': True, 'levels': get_levels()}
+
+@app.put("/api/log-level")
+async def update_log_level(update: LogLevel):
+    """Change log verbosity without a restart (e.g. DEBUG during an incident)"""
+    try:
+        level = set_level(update.level, update.logger)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.warning(f"Log level for {update.logger or 'root'} set to {level}")
+    return {'success': True, 'levels': get_levels()}
+
+@app.post("/api/token/batch")
+async def get_token_batch(batch: TokenBatch):
+    """Issue many RTM/RTC tokens in one call (kiosks, gateways)"""
+    if not AGORA_APP_ID or not AGORA_APP_CERTIFICATE:
+        raise HTTPException(status_code=500, detail="Agora credentials not configured")
+    if len(batch.requests) > 1000:
+        raise HTTPException(status_code=400, detail="At most 1000 tokens per batch")
+    
+    async def issue(req: TokenRequest) -> Dict:
+        if req.type == 'rtm':
+            token, expires_at = await issue_rtm_token(req.userId)
+            return {"type": "rtm", "token": token, "user_id": req.userId, "expiresAt": expires_at}
+        if req.type == 'rtc' and req.channel:
+            token, expires_at = await issue_rtc_token(req.channel, req.userId)
+            return {"type": "rtc", "token": token, "user_id": req.userId, "channel": req.channel, "expiresAt": expires_at}
+        return {"type": req.type, "user_id": req.userId, "error": "type must be 'rtm' or 'rtc' (with a channel)"}
+    
+    # Shared-store misses run concurrently on the store's threads rather than one after another
+    tokens = await asyncio.gather(*(issue(req) for req in batch.requests))
+    return {"success": True, "appId": AGORA_APP_ID, "tokens": tokens}
+
 @app.post("/api/broadcasts")
 async def create_broadcast(broadcast: BroadcastMessage):
-    """Create and send a broadcast via Agora RTM REST API"""
-    if not AGORA_APP_ID or not AGORA_APP_CERTIFICATE or not AGORA_SERVER_USER_ID:
-        raise HTTPException(status_code=500, detail="Agora RTM credentials not configured")
-        
+    """Create and send a broadcast via Agora RTM REST API.
+
+    Stream clients (/api/events) get it as well, so when Agora is not
+    configured or the publish fails the broadcast still reaches dashboards.
+    If neither Agora nor any stream client of this worker received it, the
+    broadcast stays saved but the response is 503 (Agora not configured) or
+    502 (publish failed) with success false.
+    """
+    timeline = BroadcastTimeline()
+    try:
+        latitude, longitude = broadcast.coordinates() or (None, None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
         # 1. Translate message using Gemini
-        print(f"📝 Translating message: {broadcast.message}")
+        logger.debug("📝 Translating message: %s", broadcast.message)
         translations = await translate_message_gemini(broadcast.message, ALL_INDIAN_LANGUAGES)
-        print(f"✅ Translated to {len(translations)} languages")
+        timeline.mark('translated')
+        logger.debug("✅ Translated to %d languages", len(translations))
         
         # 2. Save to database
         broadcast_data = {**broadcast.dict(), 'translations': translations}
         broadcast_id = db.add_broadcast(broadcast_data)
-        print(f"💾 Saved to database with ID: {broadcast_id}")
+        timeline.mark('saved')
+        logger.debug("💾 Saved to database with ID: %s", broadcast_id)
+        job = BroadcastJob(broadcast_id, broadcast.message, broadcast.sourceLanguage, translations,
+                           broadcast.location or "", broadcast.radius or 5000, bool(broadcast.emergency),
+                           latitude, longitude, timeline=timeline)
+        event_hub.publish('broadcast', job.event())
         
-        # 3. Generate RTM token for server - FIXED VERSION
-        current_timestamp = int(time.time())
-        expiration_time_in_seconds = 3600
-        privilege_expired_ts = current_timestamp + expiration_time_in_seconds
-        
-        # Use the correct method signature with all required parameters
-        rtm_token = RtmTokenBuilder.buildToken(
-            AGORA_APP_ID,
-            AGORA_APP_CERTIFICATE,
-            AGORA_SERVER_USER_ID,
-            1,  # Role.Rtm_User
-            privilege_expired_ts
-        )
-        print(f"🔑 Generated RTM token for server")
-
-        # 4. Prepare broadcast
+        # 3. Prepare broadcast (one channel, or one per language when sharded)
         broadcast_channel = "EMERGENCY_ALERTS"
-        url = f"https://api.agora.io/dev/v2/project/{AGORA_APP_ID}/rtm/users/{AGORA_SERVER_USER_ID}/channel_messages"
-        
-        headers = {
-            "Content-Type": "application/json",
-            "x-agora-token": rtm_token,
-            "x-agora-uid": AGORA_SERVER_USER_ID
-        }
-        
-        payload = {
-            "channel_name": broadcast_channel,
-            "payload": json.dumps({ 
-                'type': 'broadcast',
-                'data': {
-                    'id': broadcast_id,
-                    'message': broadcast.message,
-                    'translations': translations,
-                    'location': broadcast.location,
-                    'emergency': broadcast.emergency,
-                    'timestamp': datetime.now().isoformat()
-                }
-            }),
-            "enable_historical_messaging": True
-        }
-
-        print(f"📡 Sending to Agora RTM channel: {broadcast_channel}")
+        messages = build_rtm_payloads(
+            broadcast_channel,
+            {
+                'id': broadcast_id,
+                'message': broadcast.message,
+                'location': broadcast.location,
+                'emergency': broadcast.emergency,
+                'timestamp': job.timestamp
+            },
+            translations,
+            shard=AGORA_SHARD_BY_LANGUAGE
+        )
 
-        # 5. Send to Agora
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=payload) as response:
-                if response.status != 200:
-                    response_text = await response.text()
-                    print(f"❌ Agora RTM broadcast failed: {response.status} {response_text}")
-                    raise HTTPException(status_code=500, detail=f"Agora RTM failed: {response_text}")
+        # 4. Send to Agora (warm pooled session + cached server token)
+        agora_error = None
+        publish_start = time.perf_counter()
+        if agora_publisher and AGORA_SERVER_USER_ID:
+            from agora_publisher import AgoraPublishError
+            logger.debug("📡 Sending to Agora RTM: %d channel(s) starting with %s", len(messages), broadcast_channel)
+            try:
+                await agora_publisher.publish_many(messages, key_prefix=f"broadcast-{broadcast_id}")
+                timeline.mark('published')
+                logger.info(f"📢 Broadcast {broadcast_id} sent to Agora RTM")
+            except AgoraPublishError as e:
+                agora_error = str(e)
+                logger.error(f"❌ Agora RTM broadcast failed, event stream only: {e}")
+        else:
+            agora_error = "Agora RTM credentials not configured"
+            logger.warning(f"⚠️  Broadcast {broadcast_id} sent to event stream only: {agora_error}")
         
-        print(f"📢 Broadcast sent successfully to Agora RTM!")
-        db.update_broadcast_delivery(broadcast_id, 1)
+        # Without Agora it only counts as delivered if a dashboard was connected to receive it
+        stream_clients = len(event_hub)
+        delivered = 0 if agora_error else 1
+        success = not agora_error or stream_clients > 0
+        timeline.mark('completed')
+        db.update_broadcast_delivery(broadcast_id, delivered)
+        db.add_broadcast_channel(broadcast_id, ChannelResult(
+            'agora_rtm', not agora_error, delivered, 0,
+            (time.perf_counter() - publish_start) * 1000, agora_error
+        ).to_dict())
+        db.add_broadcast_timeline(broadcast_id, timeline.stages)
+        event_hub.publish('completed', {
+            'broadcastId': broadcast_id,
+            'success': success,
+            'deliveredCount': delivered,
+            'timeline': timeline.offsets_ms()
+        })
 
-        return {
-            'success': True,
+        result = {
+            'success': success,
             'broadcastId': broadcast_id,
-            'deliveredCount': 1, 
+            'deliveredCount': delivered, 
             'translations': translations,
-            'platform': 'agora_rtm'
+            'channels': [] if agora_error else [channel for channel, _ in messages],
+            'timeline': timeline.offsets_ms(),
+            'platform': 'event_stream' if agora_error else 'agora_rtm',
+            'agoraError': agora_error,
+            'streamClients': stream_clients
         }
+        if not success:
+            # Saved, but nothing received it: tell the caller rather than report a delivery
+            BROADCAST_FAILURES.inc(endpoint='agora_rtm')
+            status = 503 if not (agora_publisher and AGORA_SERVER_USER_ID) else 502
+            return JSONResponse(status_code=status, content={**result, 'error': f"Not delivered: {agora_error}"})
+        return result
     
     except Exception as e:
-        print(f"❌ Broadcast error: {e}")
-        import traceback
-        traceback.print_exc()
+        BROADCAST_FAILURES.inc(endpoint='agora_rtm')
+        logger.exception(f"❌ Broadcast error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/broadcasts/dispatch", status_code=202)
+async def dispatch_broadcast(broadcast: DispatchBroadcast, response: Response):
+    """Translate once, write one record and deliver over every channel concurrently.
+
+    Responds 202 with the broadcast ID as soon as it is saved; delivery runs in
+    the background and is followed on /api/broadcasts/{id}/timeline or the
+    event stream. A rate-limited fan-out to many subscribers can take minutes,
+    and a client that timed out and retried would alert everyone twice.
+    """
+    try:
+        kwargs = dict(
+            source_language=broadcast.sourceLanguage,
+            location=broadcast.location,
+            radius=broadcast.radius,
+            emergency=broadcast.emergency,
+            channels=broadcast.channels,
+            coordinates=broadcast.coordinates()
+        )
+        if broadcast.wait:
+            response.status_code = 200
+            return await orchestrator.broadcast(broadcast.message, **kwargs)
+        job, channels = await orchestrator.dispatch(broadcast.message, **kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    logger.info(f"📢 Broadcast {job.id} accepted for {', '.join(channels)}")
+    return {
+        'success': True,
+        'status': 'accepted',
+        'broadcastId': job.id,
+        'targeted': job.targeted,
+        'translations': job.translations,
+        'channels': channels,
+        'timeline': job.timeline.offsets_ms(),
+        'timelineUrl': f"/api/broadcasts/{job.id}/timeline"
+    }
+
 @app.post("/api/telegram/broadcast")
 async def telegram_broadcast(broadcast: TelegramBroadcast):
     """Send broadcast via Telegram"""
     if not telegram_bot:
         raise HTTPException(status_code=503, detail="Telegram bot not configured")
+    from telegram.error import TelegramError
     
+    timeline = BroadcastTimeline()
     try:
         subscribers = db.get_telegram_subscribers()
         if not subscribers:
@@ -429,15 +850,20 @@ async def telegram_broadcast(broadcast: TelegramBroadcast):
         
         success_count = 0
         failed_count = 0
+        send_failures = SampledLog(logger, LOG_SAMPLE_EVERY)
         
         for user_id in subscribers:
+            start = time.perf_counter()
             try:
                 await telegram_bot.send_message(chat_id=user_id, text=message, parse_mode='Markdown')
+                TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - start, outcome='ok')
+                timeline.delivered('telegram')
                 success_count += 1
                 await asyncio.sleep(0.05)
             except TelegramError as e:
+                TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - start, outcome='error')
                 failed_count += 1
-                print(f"Failed to send to {user_id}: {e}")
+                send_failures.warning("Failed to send to %s: %s", user_id, e)
         
         broadcast_data = {
             'message': broadcast.message,
@@ -446,9 +872,21 @@ async def telegram_broadcast(broadcast: TelegramBroadcast):
             'emergency': broadcast.emergency
         }
         broadcast_id = db.add_broadcast(broadcast_data)
+        timeline.mark('saved')
+        timeline.mark('completed')
         db.update_broadcast_delivery(broadcast_id, success_count)
+        db.add_broadcast_timeline(broadcast_id, timeline.stages)
+        job = BroadcastJob(broadcast_id, broadcast.message, 'en', {}, broadcast.location or "",
+                           emergency=bool(broadcast.emergency), timeline=timeline)
+        event_hub.publish('broadcast', job.event())
+        event_hub.publish('completed', {
+            'broadcastId': broadcast_id,
+            'success': True,
+            'deliveredCount': success_count,
+            'timeline': timeline.offsets_ms()
+        })
         
-        print(f"📱 Telegram: {success_count} sent, {failed_count} failed")
+        logger.info(f"📱 Telegram: {success_count} sent, {failed_count} failed")
         
         return {
             'success': True,
@@ -458,7 +896,8 @@ async def telegram_broadcast(broadcast: TelegramBroadcast):
             'platform': 'telegram'
         }
     except Exception as e:
-        print(f"❌ Telegram broadcast error: {e}")
+        BROADCAST_FAILURES.inc(endpoint='telegram')
+        logger.error(f"❌ Telegram broadcast error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/telegram/subscribe")
@@ -471,11 +910,50 @@ async def subscribe_telegram_user(subscriber: TelegramSubscriber):
             first_name=subscriber.firstName,
             language=subscriber.language
         )
-        print(f"✅ Subscribed: {subscriber.userId}")
+        geo_index.set_language(subscriber.userId, subscriber.language)
+        logger.debug("✅ Subscribed: %s", subscriber.userId)
         return {'success': True, 'userId': subscriber.userId}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/telegram/subscribe/batch")
+async def subscribe_telegram_users(batch: TelegramSubscriberBatch):
+    """Add or update many Telegram subscribers (used by the bot's write-behind queue)"""
+    try:
+        count = db.add_telegram_subscribers([s.dict() for s in batch.subscribers])
+        for s in batch.subscribers:
+            geo_index.set_language(s.userId, s.language)
+        logger.debug("✅ Subscribed batch of %d", count)
+        return {'success': True, 'count': count}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/telegram/location")
+async def update_telegram_location(location: SubscriberLocation):
+    """Store a subscriber's shared location for geo-targeted alerts"""
+    if not (-90 <= location.latitude <= 90 and -180 <= location.longitude <= 180):
+        raise HTTPException(status_code=400, detail="Invalid coordinates")
+    language = db.update_subscriber_location(location.userId, location.latitude, location.longitude)
+    if language is None:
+        raise HTTPException(status_code=404, detail="Subscriber not found")
+    geo_index.update(location.userId, location.latitude, location.longitude, language)
+    return {'success': True, 'userId': location.userId}
+
+@app.get("/api/telegram/languages")
+async def get_telegram_languages(limit: int = 5000, offset: int = 0):
+    """Bulk language preferences for the bot's cache (most recently seen first)"""
+    limit = max(1, min(limit, 50000))
+    languages = db.get_subscriber_languages(limit, offset)
+    return {'success': True, 'languages': languages, 'count': len(languages)}
+
+@app.get("/api/telegram/subscribers/{user_id}")
+async def get_telegram_subscriber(user_id: int):
+    """Language preference of a single subscriber"""
+    language = db.get_subscriber_language(user_id)
+    if language is None:
+        raise HTTPException(status_code=404, detail="Subscriber not found")
+    return {'success': True, 'userId': user_id, 'language': language}
+
 @app.post("/api/ai-chat")
 async def ai_chat(chat: ChatMessage):
     """AI-powered chat endpoint"""
@@ -487,22 +965,133 @@ async def ai_chat(chat: ChatMessage):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/broadcasts")
-async def get_broadcasts(limit: int = 50):
-    broadcasts = db.get_broadcasts(limit)
-    return {'success': True, 'broadcasts': broadcasts}
+async def get_broadcasts(request: Request, limit: int = 50):
+    return cached_json(request, 'broadcasts', limit,
+                       lambda: {'success': True, 'broadcasts': db.get_broadcasts(limit)})
+
+@app.get("/api/broadcasts/{broadcast_id}/timeline")
+async def get_broadcast_timeline(broadcast_id: int):
+    """When a broadcast reached each stage, for debugging slow alerts and following dispatches"""
+    stages = db.get_broadcast_timeline(broadcast_id)
+    job = orchestrator.running.get(broadcast_id) if orchestrator else None
+    if job is not None:
+        # Still being delivered by this worker: include deliveries so far
+        stages = {**stages, **job.timeline.stages}
+    if not stages:
+        raise HTTPException(status_code=404, detail="No timeline recorded for this broadcast")
+    
+    received = stages.get('received', min(stages.values()))
+    return {
+        'success': True,
+        'broadcastId': broadcast_id,
+        'completed': 'completed' in stages,
+        # Outcome of every channel that has finished so far
+        'channels': db.get_broadcast_channels(broadcast_id),
+        'stages': [
+            {
+                'stage': stage,
+                'timestamp': datetime.fromtimestamp(at).isoformat(),
+                'offsetMs': round((at - received) * 1000, 1)
+            }
+            for stage, at in sorted(stages.items(), key=lambda item: item[1])
+        ]
+    }
+
+def _event_id(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+@app.get("/api/events")
+async def event_stream(request: Request, lastEventId: Optional[str] = None):
+    """Server-Sent Events: `broadcast`, `progress` and `completed` events as they happen.
+
+    EventSource reconnects with a Last-Event-ID header and gets what it missed;
+    `lastEventId` does the same for a first connection. A client that falls too
+    far behind is disconnected and resumes the same way.
+    """
+    subscription = event_hub.subscribe(_event_id(request.headers.get('last-event-id') or lastEventId))
+    
+    async def stream():
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    event = await subscription.get(EVENT_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Comment line: keeps proxies from closing an idle stream
+                    yield b": ping\n\n"
+                    continue
+                if event is None:
+                    return
+                yield event.sse()
+        finally:
+            subscription.close()
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.websocket("/api/events/ws")
+async def event_socket(websocket: WebSocket, lastEventId: Optional[str] = None):
+    """The same events as /api/events as JSON frames {"id", "type", "data"}; resume with ?lastEventId="""
+    await websocket.accept()
+    subscription = event_hub.subscribe(_event_id(lastEventId))
+    
+    async def watch_disconnect():
+        try:
+            while (await websocket.receive())['type'] != 'websocket.disconnect':
+                pass
+        finally:
+            subscription.close()
+    
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        while (event := await subscription.get()) is not None:
+            await websocket.send_text(event.frame())
+        if not watcher.done():
+            # Lagged (1013: try again later) or the server is shutting down (1001)
+            await websocket.close(code=1013 if subscription.lagged else 1001)
+    except (WebSocketDisconnect, ConnectionClosed):
+        pass  # the client went away mid-send
+    except Exception:
+        logger.exception("❌ Event socket failed")
+    finally:
+        watcher.cancel()
+        subscription.close()
 
 @app.get("/api/analytics")
-async def get_analytics():
-    analytics = db.get_analytics()
-    return {'success': True, 'data': analytics}
+async def get_analytics(request: Request):
+    return cached_json(request, 'analytics', None,
+                       lambda: {'success': True, 'data': db.get_analytics()},
+                       max_age=ANALYTICS_CACHE_TTL)
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    port = int(os.getenv("PORT", 3001))
-    print(f"\n🚀 Starting Emergency Broadcast System on port {port}")
-    print(f"📊 API Docs: http://localhost:{port}/docs")
-    print(f"💬 Telegram subscribers: {db.get_subscriber_count()}")
+    
+    parser = argparse.ArgumentParser(description="Emergency Broadcast System API")
+    parser.add_argument("--reload", action="store_true", help="development mode: restart on code changes")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 3001)))
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="worker processes sharing the port (production mode only)")
+    args = parser.parse_args()
+    if args.reload and args.workers > 1:
+        parser.error("--reload runs a single worker")
+    # Spawned workers re-import this module and read it back as WORKERS
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    
+    mode = 'reload' if args.reload else f"production, {args.workers} worker(s)"
+    print(f"\n🚀 Starting Emergency Broadcast System on port {args.port} ({mode} mode)")
+    print(f"📊 API Docs: http://localhost:{args.port}/docs")
     print(f"📡 Agora RTM: {'✅ Enabled' if AGORA_APP_ID else '⚠️  Not configured'}")
     print("\n⏹️  Press Ctrl+C to stop\n")
     
-    uvicorn.run("server:app", host="0.0.0.0", port=port, reload=True)
+    # log_config=None: uvicorn's loggers go through the same queue instead of their own stream handlers
+    # Reload and multiple workers need the import string so uvicorn can (re)import the app
+    multiprocess = args.reload or args.workers > 1
+    # Open event streams never finish on their own; cut them off this long after Ctrl+C
+    uvicorn.run("server:app" if multiprocess else app, host=args.host, port=args.port,
+                reload=args.reload, workers=args.workers, log_config=None,
+                timeout_graceful_shutdown=int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", 10)))
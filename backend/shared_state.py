@@ -0,0 +1,153 @@
+import asyncio
+import functools
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Deque, List, Optional
+
+
+class SharedStore:
+    """Key/value and rate-limit state shared by every worker on the host.
+
+    A local SQLite file in WAL mode stands in for Redis: each worker process
+    (and each thread in it) opens its own connection, and writes that must be
+    atomic across workers run inside BEGIN IMMEDIATE.
+
+    A write can wait up to busy_timeout for another worker's lock, so async
+    code calls the store through run(), which does the work on the store's
+    own threads instead of the event loop.
+    """
+
+    def __init__(self, path: str = "shared_state.db", busy_timeout: float = 10.0,
+                 purge_every: int = 1000, threads: int = 4):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.purge_every = purge_every
+        self._writes = 0
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="shared-state")
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS kv (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL
+            )
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                name TEXT PRIMARY KEY,
+                next_at REAL NOT NULL
+            )
+        ''')
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """This thread's connection (autocommit; transactions are opened explicitly where needed)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    async def run(self, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs) on one of the store's threads and return its result"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(fn, *args, **kwargs))
+
+    def get(self, key: str):
+        """JSON value stored under key, or None if missing or expired"""
+        row = self.conn.execute('SELECT value, expires_at FROM kv WHERE key = ?', (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        expires_at = time.time() + ttl if ttl else None
+        self.conn.execute('INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)',
+                          (key, json.dumps(value), expires_at))
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.conn.execute('DELETE FROM kv WHERE expires_at <= ?', (time.time(),))
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        """Atomically add amount to an integer value (missing counts as 0); returns the new value"""
+        rows = self.conn.execute('''
+            INSERT INTO kv (key, value, expires_at) VALUES (?, ?, NULL)
+            ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value
+            RETURNING value
+        ''', (key, amount)).fetchall()
+        return int(rows[0][0])
+
+    def delete(self, key: str):
+        self.conn.execute('DELETE FROM kv WHERE key = ?', (key,))
+
+    @contextmanager
+    def transaction(self):
+        """Hold the write lock for the block, so read-then-write is atomic across workers"""
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+
+    def reserve(self, name: str, interval: float, count: int = 1) -> float:
+        """Claim `count` consecutive slots `interval` apart on the host-wide schedule
+        for `name`; returns when the first slot starts (epoch seconds)"""
+        with self.transaction() as conn:
+            row = conn.execute('SELECT next_at FROM rate_limits WHERE name = ?', (name,)).fetchone()
+            start = max(time.time(), row[0] if row else 0.0)
+            conn.execute('INSERT OR REPLACE INTO rate_limits (name, next_at) VALUES (?, ?)',
+                         (name, start + interval * count))
+        return start
+
+    def close(self):
+        self._executor.shutdown()
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+class SharedRateLimiter:
+    """RateLimiter whose budget is shared by every worker using the same store.
+
+    Slots are reserved `batch` at a time so the store is written once per
+    batch rather than once per call.
+    """
+
+    def __init__(self, store: SharedStore, name: str, rate: float, batch: int = 5):
+        self.store = store
+        self.name = name
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.batch = max(1, batch)
+        self._slots: Deque[float] = deque()
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.time()
+            # Slots left over from an earlier burst have passed; using them would send in a burst
+            while self._slots and self._slots[0] < now - self.interval:
+                self._slots.popleft()
+            if not self._slots:
+                start = await self.store.run(self.store.reserve, self.name, self.interval, self.batch)
+                self._slots.extend(start + i * self.interval for i in range(self.batch))
+            slot = self._slots.popleft()
+        delay = slot - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
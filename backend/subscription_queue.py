@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from backend_client import BackendClient
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionQueue:
+    """Durable write-behind queue for subscription updates.
+
+    Updates are coalesced per user in a local SQLite file and flushed to the
+    backend in batches; if the backend is down they stay on disk and are
+    replayed once it comes back.
+
+    SQLite work runs on a dedicated thread, never on the event loop, and
+    enqueues that arrive while a write is in progress share the next commit.
+    """
+
+    def __init__(self, backend: BackendClient, path: str = "bot_queue.db",
+                 batch_size: int = 500, flush_interval: float = 1.0, max_backoff: float = 30.0):
+        self.backend = backend
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.flushed = 0
+        self.failures = 0
+        self._wakeup = asyncio.Event()
+        self._since_wakeup = 0
+        self._task: Optional[asyncio.Task] = None
+        # user_id -> row waiting for the next commit, and the task committing it
+        self._buffer: Dict[int, Tuple] = {}
+        self._write: Optional[asyncio.Future] = None
+        # One thread owns the connection, so statements never interleave
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="subscription-queue")
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS pending_subscriptions (
+                user_id INTEGER PRIMARY KEY,
+                username TEXT,
+                first_name TEXT,
+                language TEXT,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+        self._stored = self._count()
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _count(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) FROM pending_subscriptions').fetchone()[0]
+
+    async def enqueue(self, user_id: int, username: str, first_name: str, language: str = 'en'):
+        """Record the latest state for a user; replaces any update not yet flushed.
+
+        Returns once the update is committed to disk.
+        """
+        self._buffer[user_id] = (user_id, username or "", first_name or "", language, time.time())
+        self._since_wakeup += 1
+        if self._since_wakeup >= self.batch_size:
+            self._wakeup.set()
+        if self._write is None:
+            self._write = asyncio.ensure_future(self._write_buffer())
+        # Shielded so one cancelled caller doesn't abort the commit everyone else waits on
+        await asyncio.shield(self._write)
+
+    async def _write_buffer(self):
+        # Yield once so updates handled in the same loop iteration join this batch
+        await asyncio.sleep(0)
+        rows, self._buffer = list(self._buffer.values()), {}
+        # Later enqueues start the next batch; the single writer thread keeps batches in order
+        self._write = None
+        await self._call(self._store, rows)
+
+    def _store(self, rows: List[Tuple]):
+        self._conn.executemany('''
+            INSERT OR REPLACE INTO pending_subscriptions (user_id, username, first_name, language, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        self._conn.commit()
+        self._stored = self._count()
+
+    def pending(self) -> int:
+        """Updates not yet delivered to the backend; never touches SQLite"""
+        return self._stored + len(self._buffer)
+
+    async def pending_languages(self) -> Dict[int, str]:
+        """Language of every update not yet delivered to the backend"""
+        rows = await self._call(
+            lambda: self._conn.execute('SELECT user_id, language FROM pending_subscriptions').fetchall())
+        languages = dict(rows)
+        languages.update((row[0], row[3]) for row in self._buffer.values())
+        return languages
+
+    def _next_batch(self) -> List[Dict]:
+        rows = self._conn.execute('''
+            SELECT user_id, username, first_name, language, updated_at
+            FROM pending_subscriptions ORDER BY updated_at LIMIT ?
+        ''', (self.batch_size,)).fetchall()
+        return [
+            {'userId': r[0], 'username': r[1], 'firstName': r[2], 'language': r[3], 'updatedAt': r[4]}
+            for r in rows
+        ]
+
+    def _ack(self, batch: List[Dict]):
+        # Only drop rows that weren't updated again while the batch was in flight
+        self._conn.executemany(
+            'DELETE FROM pending_subscriptions WHERE user_id = ? AND updated_at = ?',
+            [(item['userId'], item['updatedAt']) for item in batch]
+        )
+        self._conn.commit()
+        self._stored = self._count()
+
+    async def flush(self) -> int:
+        """Send everything pending; returns the number of updates delivered"""
+        sent = 0
+        while True:
+            batch = await self._call(self._next_batch)
+            if not batch:
+                return sent
+            await self.backend.post(
+                "/api/telegram/subscribe/batch",
+                {'subscribers': [{k: v for k, v in item.items() if k != 'updatedAt'} for item in batch]},
+                timeout=10
+            )
+            await self._call(self._ack, batch)
+            sent += len(batch)
+            self.flushed += len(batch)
+
+    async def _run(self):
+        backoff = self.flush_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._since_wakeup = 0
+
+            try:
+                sent = await self.flush()
+                if sent:
+                    logger.info(f"Flushed {sent} subscription updates")
+                backoff = self.flush_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                backoff = min(backoff * 2, self.max_backoff)
+                logger.warning(f"Subscription flush failed ({self.pending()} pending), retrying in {backoff:.0f}s: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._write is not None:
+            await self._write
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Final subscription flush failed, {self.pending()} updates kept on disk: {e}")
+        await self._call(self._conn.close)
+        self._executor.shutdown()
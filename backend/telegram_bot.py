@@ -2,24 +2,53 @@ import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
 import os
+import sys
 from dotenv import load_dotenv
-import requests
 import asyncio
+from typing import Optional
+from backend_client import BackendClient, BackendError
+from language_cache import LanguageCache
+from log_pipeline import configure_logging
+from metrics import Counter, Gauge
+from subscription_queue import SubscriptionQueue
+from update_processor import PerChatUpdateProcessor
+from venue import VenueStore
 
 load_dotenv()
 
-# Enable logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+# Enable logging (queued, written off the event loop; LOG_LEVEL / SIGUSR1 to change verbosity)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Backend API URL
 BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:3001')
 
-# Store user languages (as a local cache)
-user_languages = {}
+# Shared pooled HTTP session to the backend (never block the bot's event loop)
+backend = BackendClient(BACKEND_URL, pool_size=int(os.getenv('BACKEND_POOL_SIZE', 100)))
+
+# Subscription updates are written behind to the backend from a durable local queue
+subscriptions = SubscriptionQueue(
+    backend,
+    path=os.getenv('SUBSCRIPTION_QUEUE_PATH', 'bot_queue.db'),
+    batch_size=int(os.getenv('SUBSCRIPTION_BATCH_SIZE', 500)),
+)
+
+# User languages: bounded LRU, preloaded from the backend and filled lazily on misses
+user_languages = LanguageCache(backend, maxsize=int(os.getenv('LANGUAGE_CACHE_SIZE', 100_000)))
+
+# Venue knowledge (exits, safe zones, facilities) shared with the server
+venue = VenueStore()
+
+# Set by build_application; read at scrape time by the gauges below
+update_processor: Optional[PerChatUpdateProcessor] = None
+
+Gauge('bot_updates', 'Updates being handled or parked behind their chat', ['state'],
+      function=lambda: {('in_flight',): update_processor.in_flight, ('queued',): update_processor.queued}
+      if update_processor else {})
+Gauge('bot_subscription_queue_depth', 'Subscription updates waiting to be written to the backend',
+      function=lambda: subscriptions.pending())
+Counter('bot_language_cache_requests_total', 'Language cache lookups', ['result'],
+        function=lambda: {('hit',): user_languages.hits, ('miss',): user_languages.misses})
 
 # Emergency context responses
 EMERGENCY_RESPONSES = {
@@ -52,7 +81,9 @@ You can also just type in your own language (like Bengali, Marathi, etc.) and I
 🚨 You'll automatically receive all emergency broadcasts!""",
         'subscribed': "✅ You're subscribed! You'll receive emergency alerts instantly.",
         'status_checking': "Checking system status...",
-        'language_prompt': "🌍 Select your preferred language:"
+        'language_prompt': "🌍 Select your preferred language:",
+        'location_saved': "📍 Location saved. You'll get alerts for incidents near you.",
+        'location_not_subscribed': "Please send /start to subscribe before sharing your location."
     },
     'hi': {
         'welcome': """👋 आपातकालीन अलर्ट सिस्टम में आपका स्वागत है!
@@ -83,109 +114,62 @@ You can also just type in your own language (like Bengali, Marathi, etc.) and I
 🚨 आपको सभी आपातकालीन प्रसारण स्वचालित रूप से मिलेंगे!""",
         'subscribed': "✅ आप सब्सक्राइब हो गए हैं! आपको आपातकालीन अलर्ट तुरंत मिलेंगे।",
         'status_checking': "सिस्टम स्थिति जांच रहे हैं...",
-        'language_prompt': "🌍 अपनी पसंदीदा भाषा चुनें:"
+        'language_prompt': "🌍 अपनी पसंदीदा भाषा चुनें:",
+        'location_saved': "📍 स्थान सहेजा गया। आपके पास की घटनाओं के अलर्ट आपको मिलेंगे।",
+        'location_not_subscribed': "स्थान साझा करने से पहले सदस्यता लेने के लिए /start भेजें।"
     }
 }
 
-def get_text(user_id: int, key: str) -> str:
+def get_text(lang: str, key: str) -> str:
     """Get text in user's preferred language"""
-    lang = user_languages.get(user_id, 'en')
     return EMERGENCY_RESPONSES.get(lang, EMERGENCY_RESPONSES['en']).get(key, '')
 
 # --- UPDATED FUNCTION (from previous fix) ---
 async def subscribe_user(user_id: int, username: str, first_name: str, language: str = 'en'):
-    """Subscribe user to backend by calling the API"""
+    """Queue a subscription update; it is flushed to the backend in batches"""
     try:
-        response = requests.post(
-            f"{BACKEND_URL}/api/telegram/subscribe",
-            json={
-                "userId": user_id,
-                "username": username or "",
-                "firstName": first_name or "",
-                "language": language
-            },
-            timeout=5
-        )
-        
-        if response.status_code == 200:
-            logger.info(f"User subscribed/updated: {user_id} - {first_name} ({language})")
-            return True
-        else:
-            logger.error(f"Failed to subscribe user {user_id}. Status: {response.status_code}, Body: {response.text}")
-            return False
-            
+        await subscriptions.enqueue(user_id, username, first_name, language)
+        logger.debug("User subscribed/updated: %s - %s (%s)", user_id, first_name, language)
+        return True
     except Exception as e:
-        logger.error(f"Failed to subscribe user {user_id}: {e}")
+        logger.error(f"Failed to queue subscription for {user_id}: {e}")
         return False
 
 async def get_ai_response(message: str, user_id: int) -> str:
     """Get AI response from backend"""
+    lang = await user_languages.get(user_id)
     try:
-        lang = user_languages.get(user_id, 'en')
-        response = requests.post(
-            f"{BACKEND_URL}/api/ai-chat",
-            json={
+        data = await backend.post(
+            "/api/ai-chat",
+            {
                 "message": message,
                 "language": lang,
                 "userId": str(user_id)
             },
             timeout=10 # Increased timeout for Gemini
         )
-        
-        if response.status_code == 200:
-            return response.json().get('response', 'Sorry, I could not process that.')
-        else:
-            logger.error(f"AI response error, status {response.status_code}: {response.text}")
-            return get_fallback_response(message, lang)
+        return data.get('response', 'Sorry, I could not process that.')
     
+    except BackendError as e:
+        logger.error(f"AI response error, status {e.status}: {e.body}")
+        return get_fallback_response(message, lang)
     except Exception as e:
         logger.error(f"AI response error: {e}")
-        return get_fallback_response(message, user_languages.get(user_id, 'en'))
+        return get_fallback_response(message, lang)
 
 def get_fallback_response(message: str, language: str = 'en') -> str:
     """Fallback responses when backend is unavailable"""
-    message_lower = message.lower()
-    
-    fallbacks = {
-        'en': {
-            'exit': "🚪 Nearest exit: Gate 2 (50m to your right). Follow GREEN emergency signs.",
-            'safe': "🛡️ Safe zone: Main courtyard (100m north). Gather there for instructions.",
-            'water': "💧 Water stations: South entrance, Medical station, Main gate.",
-            'medical': "🏥 First aid at Gate 2. Emergency: Dial 112",
-            'help': "🆘 Emergency services notified. Stay calm. Share your location if urgent.",
-            'default': "I'm here to help! Ask about: exits, safe zones, water, medical help."
-        },
-        'hi': {
-            'exit': "🚪 निकटतम निकास: गेट 2 (आपके दाईं ओर 50 मीटर)। हरे आपातकालीन संकेतों का पालन करें।",
-            'safe': "🛡️ सुरक्षित क्षेत्र: मुख्य प्रांगण (100 मीटर उत्तर)। निर्देशों के लिए वहां इकट्ठा हों।",
-            'water': "💧 जल केंद्र: दक्षिण प्रवेश द्वार, चिकित्सा केंद्र, मुख्य द्वार।",
-            'medical': "🏥 गेट 2 पर प्राथमिक चिकित्सा। आपातकाल: 112 डायल करें",
-            'help': "🆘 आपातकालीन सेवाओं को सूचित किया गया। शांत रहें। यदि जरूरी हो तो अपना स्थान साझा करें।",
-            'default': "मैं मदद के लिए हूं! पूछें: निकास, सुरक्षित क्षेत्र, पानी, चिकित्सा सहायता।"
-        }
-    }
-    
-    lang_fallbacks = fallbacks.get(language, fallbacks['en'])
-    
-    for keyword in ['exit', 'safe', 'water', 'medical', 'help']:
-        if keyword in message_lower:
-            return lang_fallbacks.get(keyword, lang_fallbacks['default'])
-    
-    return lang_fallbacks['default']
+    return venue.quick_response(message, language, default=True)
 
 # Command Handlers
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command"""
     user = update.effective_user
     user_id = user.id
-    lang = user_languages.get(user_id, 'en')
-    
-    if user_id not in user_languages:
-        user_languages[user_id] = 'en'
-        lang = 'en'
+    lang = await user_languages.get(user_id)
     
     await subscribe_user(user_id, user.username, user.first_name, lang)
-    await update.message.reply_text(get_text(user_id, 'welcome'))
+    await update.message.reply_text(get_text(lang, 'welcome'))
     
     keyboard = [
         [
@@ -202,12 +186,12 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         ]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text(get_text(user_id, 'language_prompt'), reply_markup=reply_markup)
+    await update.message.reply_text(get_text(lang, 'language_prompt'), reply_markup=reply_markup)
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /help command"""
-    user_id = update.effective_user.id
-    await update.message.reply_text(get_text(user_id, 'help'))
+    lang = await user_languages.get(update.effective_user.id)
+    await update.message.reply_text(get_text(lang, 'help'))
 
 async def language_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /language command"""
@@ -231,13 +215,12 @@ async def language_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # --- UPDATED: /status command ---
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Check system status"""
-    user_id = update.effective_user.id
-    status_msg = await update.message.reply_text(get_text(user_id, 'status_checking'))
+    lang = await user_languages.get(update.effective_user.id)
+    status_msg = await update.message.reply_text(get_text(lang, 'status_checking'))
     
     try:
-        response = requests.get(f"{BACKEND_URL}/api/health", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
+        data = await backend.get("/api/health", timeout=5)
+        if data:
             # Updated status text to remove listener/operator counts
             status_text = f"""✅ **System Status: Online**
 
@@ -248,52 +231,17 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await status_msg.edit_text(status_text, parse_mode='Markdown')
         else:
             await status_msg.edit_text("⚠️ System status unknown")
-    except:
+    except BackendError:
+        await status_msg.edit_text("⚠️ System status unknown")
+    except Exception:
         await status_msg.edit_text("❌ Cannot reach backend server. Emergency protocols active.")
 
 async def location_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show location info"""
     user_id = update.effective_user.id
-    lang = user_languages.get(user_id, 'en')
+    lang = await user_languages.get(user_id)
     
-    if lang == 'hi':
-        location_info = """📍 **स्थान की जानकारी**
-
-🚪 **निकास:**
-• गेट 2 - मुख्य निकास (पूर्व)
-• गेट 1 - उत्तरी निकास
-• दक्षिणी आपातकालीन निकास
-
-🛡️ **सुरक्षित क्षेत्र:**
-• मुख्य प्रांगण (100 मीटर उत्तर)
-• खेल का मैदान (पश्चिम)
-
-🏥 **चिकित्सा सहायता:**
-• गेट 2 चिकित्सा केंद्र
-• आपातकाल: 112 या 102
-
-💧 **पानी/सुविधाएं:**
-• दक्षिण प्रवेश द्वार
-• मुख्य द्वार रिसेप्शन"""
-    else:
-        location_info = """📍 **Location Information**
-
-🚪 **Exits:**
-• Gate 2 - Main exit (East side)
-• Gate 1 - North exit
-• South emergency exit
-
-🛡️ **Safe Zones:**
-• Main courtyard (100m north)
-• Sports field (West side)
-
-🏥 **Medical Help:**
-• Gate 2 Medical Station
-• Emergency: 112 or 102
-
-💧 **Water/Facilities:**
-• South entrance
-• Main gate reception"""
+    location_info = venue.location_info(lang)
     
     await update.message.reply_text(location_info, parse_mode='Markdown')
 
@@ -308,7 +256,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if query.data.startswith('lang_'):
         lang_code = query.data.split('_')[1]
-        user_languages[user_id] = lang_code
+        user_languages.set(user_id, lang_code)
         
         # --- ADDED: Save language preference to DB ---
         await subscribe_user(
@@ -337,12 +285,103 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_message = update.message.text
     user_id = update.effective_user.id
     
-    logger.info(f"Message from {user_id}: {user_message}")
+    logger.debug("Message from %s: %s", user_id, user_message)
     
     await update.message.chat.send_action("typing")
     ai_response = await get_ai_response(user_message, user_id)
     await update.message.reply_text(ai_response)
 
+async def handle_location(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Store a shared (or live-updating) location for geo-targeted alerts"""
+    message = update.effective_message
+    user_id = update.effective_user.id
+    payload = {
+        'userId': user_id,
+        'latitude': message.location.latitude,
+        'longitude': message.location.longitude
+    }
+    
+    try:
+        try:
+            await backend.post("/api/telegram/location", json=payload)
+        except BackendError as e:
+            if e.status != 404 or not subscriptions.pending():
+                raise
+            # The /start for this user may still be in the write-behind queue
+            await subscriptions.flush()
+            await backend.post("/api/telegram/location", json=payload)
+        key = 'location_saved'
+    except BackendError as e:
+        if e.status != 404:
+            logger.warning(f"Location update for {user_id} failed: {e}")
+            return
+        key = 'location_not_subscribed'
+    except Exception as e:
+        logger.warning(f"Location update for {user_id} failed: {e}")
+        return
+    
+    # Live locations arrive as a stream of edits; only answer the initial share
+    if update.message:
+        lang = await user_languages.get(user_id)
+        await update.message.reply_text(get_text(lang, key))
+
+async def startup_backend(application: Application):
+    """Start the subscription flusher and preload language preferences"""
+    subscriptions.start()
+    # Preload so a restart doesn't reset everyone to English
+    await user_languages.load()
+    # Changes still queued from before the restart are newer than what the backend returned
+    for user_id, language in (await subscriptions.pending_languages()).items():
+        user_languages.set(user_id, language)
+
+async def shutdown_backend(application: Application):
+    """Flush queued subscriptions and close the shared backend session"""
+    await subscriptions.stop()
+    await backend.close()
+
+def build_application(token: str, webhook: bool = False) -> Application:
+    """Build the bot Application with all handlers registered"""
+    global update_processor
+    # Updates from different chats run concurrently; each chat stays in order
+    update_processor = PerChatUpdateProcessor(int(os.getenv('BOT_CONCURRENT_UPDATES', 64)))
+    
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(update_processor)
+        .post_init(startup_backend)
+        .post_shutdown(shutdown_backend)
+    )
+    if os.getenv('TELEGRAM_API_BASE_URL'):
+        builder = builder.base_url(os.getenv('TELEGRAM_API_BASE_URL'))
+    if webhook:
+        # Updates arrive through telegram_webhook; bound the queue so overload pushes back on Telegram
+        builder = builder.updater(None).update_queue(asyncio.Queue(int(os.getenv('WEBHOOK_QUEUE_SIZE', 10000))))
+    application = builder.build()
+    
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("language", language_command))
+    application.add_handler(CommandHandler("status", status_command))
+    application.add_handler(CommandHandler("location", location_command))
+    application.add_handler(CallbackQueryHandler(handle_callback))
+    application.add_handler(MessageHandler(filters.LOCATION, handle_location))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    
+    return application
+
+def build_webhook_ingress(token: str):
+    """Webhook ingress for BOT_MODE=webhook or for mounting inside server.py"""
+    from telegram_webhook import WebhookIngress
+    
+    return WebhookIngress(
+        build_application(token, webhook=True),
+        secret_token=os.getenv('TELEGRAM_WEBHOOK_SECRET', ''),
+        webhook_url=os.getenv('TELEGRAM_WEBHOOK_URL'),
+        # With several processes behind a load balancer, let only one register the webhook
+        register=os.getenv('TELEGRAM_WEBHOOK_REGISTER', 'true').lower() == 'true',
+    )
+
 def main():
     """Start the bot"""
     token = os.getenv('TELEGRAM_BOT_TOKEN')
@@ -356,15 +395,7 @@ def main():
         print("   4. Copy the token to your .env file\n")
         return
     
-    application = Application.builder().token(token).build()
-    
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("language", language_command))
-    application.add_handler(CommandHandler("status", status_command))
-    application.add_handler(CommandHandler("location", location_command))
-    application.add_handler(CallbackQueryHandler(handle_callback))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    webhook_mode = os.getenv('BOT_MODE', 'polling').lower() == 'webhook' or '--webhook' in sys.argv
     
     print("\n" + "="*60)
     print("🤖 TELEGRAM BOT STARTED SUCCESSFULLY!")
@@ -376,10 +407,21 @@ def main():
     print(f"   ✅ Real AI-powered responses (via Gemini on server)")
     print(f"   ✅ Multi-language support")
     print(f"   ✅ Location information")
+    print(f"   ✅ Concurrent updates (limit {os.getenv('BOT_CONCURRENT_UPDATES', 64)}, ordered per chat)")
+    print(f"   ✅ Update mode: {'webhook' if webhook_mode else 'polling'}")
     print(f"\n⏹️  Press Ctrl+C to stop the bot")
     print("="*60 + "\n")
     
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if webhook_mode:
+        import uvicorn
+        from telegram_webhook import create_webhook_app
+        
+        ingress = build_webhook_ingress(token)
+        app = create_webhook_app(ingress, path=os.getenv('TELEGRAM_WEBHOOK_PATH', '/webhook'))
+        uvicorn.run(app, host="0.0.0.0", port=int(os.getenv('BOT_WEBHOOK_PORT', 8443)))
+    else:
+        application = build_application(token)
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,169 @@
+import asyncio
+import hmac
+import itertools
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+import aiohttp
+from fastapi import FastAPI, Request, Response
+from telegram import Update
+from telegram.ext import Application
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookIngress:
+    """Accepts Telegram webhook calls and hands updates to the Application's workers"""
+
+    def __init__(self, application: Application, secret_token: str,
+                 webhook_url: Optional[str] = None, register: bool = True):
+        if not secret_token:
+            raise ValueError("A webhook secret token is required")
+        self.application = application
+        self.secret_token = secret_token
+        self.webhook_url = webhook_url
+        self.register = register
+        self.received = 0
+        self.rejected = 0
+        self.dropped = 0
+
+    async def start(self):
+        application = self.application
+        await application.initialize()
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+
+        if self.register and self.webhook_url:
+            await application.bot.set_webhook(
+                url=self.webhook_url,
+                secret_token=self.secret_token,
+                allowed_updates=Update.ALL_TYPES,
+            )
+            logger.info(f"Webhook registered: {self.webhook_url}")
+
+    async def stop(self):
+        application = self.application
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+    async def handle(self, request: Request) -> Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token, self.secret_token):
+            self.rejected += 1
+            return Response(status_code=403)
+
+        try:
+            update = Update.de_json(await request.json(), self.application.bot)
+        except Exception as e:
+            logger.warning(f"Malformed webhook update: {e}")
+            return Response(status_code=400)
+        if update is None:
+            # A JSON null (or empty object) body; there is nothing to process
+            logger.warning("Empty webhook update")
+            return Response(status_code=400)
+
+        try:
+            self.application.update_queue.put_nowait(update)
+        except asyncio.QueueFull:
+            # Telegram retries non-2xx responses, so this is backpressure, not loss
+            self.dropped += 1
+            return Response(status_code=503)
+
+        self.received += 1
+        return Response(status_code=200)
+
+    def stats(self) -> Dict:
+        return {
+            'received': self.received,
+            'rejected': self.rejected,
+            'dropped': self.dropped,
+            'queueDepth': self.application.update_queue.qsize(),
+        }
+
+
+def create_webhook_app(ingress: WebhookIngress, path: str = "/webhook",
+                       manage_lifespan: bool = True) -> FastAPI:
+    """ASGI app serving the webhook.
+
+    Run it on its own (manage_lifespan=True) or mount it in server.py, in which
+    case the host app must call ingress.start()/stop() from its own lifespan.
+    """
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        if manage_lifespan:
+            await ingress.start()
+        try:
+            yield
+        finally:
+            if manage_lifespan:
+                await ingress.stop()
+
+    app = FastAPI(title="Emergency Bot Webhook", lifespan=lifespan)
+    app.add_api_route(path, ingress.handle, methods=["POST"])
+
+    @app.get("/health")
+    async def health():
+        return {'status': 'healthy', **ingress.stats()}
+
+    @app.get("/metrics")
+    async def get_metrics():
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    return app
+
+
+class LocalTelegramSender:
+    """Stand-in for Telegram's side of the webhook: posts fake updates for tests"""
+
+    def __init__(self, webhook_url: str, secret_token: str):
+        self.webhook_url = webhook_url
+        self.secret_token = secret_token
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def make_message_update(self, chat_id: int, text: str, first_name: str = "Test") -> Dict:
+        user = {'id': chat_id, 'is_bot': False, 'first_name': first_name}
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private', 'first_name': first_name},
+            'from': user,
+            'text': text,
+        }
+        if text.startswith('/'):
+            command = text.split()[0]
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        return {'update_id': next(self._update_ids), 'message': message}
+
+    async def send(self, update: Optional[Dict], secret_token: Optional[str] = None) -> int:
+        """POST an update (None posts a JSON null) to the webhook and return the HTTP status"""
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        headers = {
+            SECRET_HEADER: self.secret_token if secret_token is None else secret_token,
+            'Content-Type': 'application/json',
+        }
+        async with self._session.post(self.webhook_url, data=json.dumps(update), headers=headers) as response:
+            return response.status
+
+    async def send_text(self, chat_id: int, text: str) -> int:
+        return await self.send(self.make_message_update(chat_id, text))
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
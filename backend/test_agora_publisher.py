@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+import agora_publisher
+from agora_publisher import AgoraPublisher, AgoraPublishError
+from fake_services import FakeServices
+
+
+def run_with_fakes(test):
+    async def run():
+        fakes = await FakeServices().start()
+        publisher = AgoraPublisher("app", "0" * 32, "server", base_url=fakes.base_url, retries=3, backoff=0)
+        try:
+            await test(fakes, publisher)
+        finally:
+            await publisher.close()
+            await fakes.stop()
+
+    asyncio.run(run())
+
+
+def test_retries_server_errors_and_rate_limits():
+    async def test(fakes, publisher):
+        fakes.fail_agora([503, 429, 500])
+        assert await publisher.publish("alerts", "{}") is True
+        assert len(fakes.agora_requests) == 4
+        assert (fakes.agora_errors, fakes.agora_published) == (3, 1)
+
+    run_with_fakes(test)
+
+
+def test_gives_up_after_retries():
+    async def test(fakes, publisher):
+        fakes.fail_agora([503] * 4)
+        with pytest.raises(AgoraPublishError, match="503"):
+            await publisher.publish("alerts", "{}")
+        assert len(fakes.agora_requests) == 4
+
+    run_with_fakes(test)
+
+
+def test_client_error_is_not_retried():
+    async def test(fakes, publisher):
+        fakes.fail_agora([400, 400])
+        with pytest.raises(AgoraPublishError, match="400"):
+            await publisher.publish("alerts", "{}")
+        assert len(fakes.agora_requests) == 1
+
+    run_with_fakes(test)
+
+
+def test_idempotency_key_is_sent_once():
+    async def test(fakes, publisher):
+        fakes.fail_agora([503])
+        assert await publisher.publish("alerts", "{}", idempotency_key="b1") is True
+        assert await publisher.publish("alerts", "{}", idempotency_key="b1") is False
+        # The retry carried the same key; the duplicate never reached Agora
+        assert [key for _, key in fakes.agora_requests] == ["b1", "b1"]
+        assert fakes.agora_published == 1
+
+        sent = await publisher.publish_many([("a", "{}"), ("b", "{}")], key_prefix="b2")
+        assert sent == 2
+        assert await publisher.publish_many([("a", "{}"), ("b", "{}")], key_prefix="b2") == 0
+        assert fakes.agora_published == 3
+
+    run_with_fakes(test)
+
+
+def test_token_refreshed_before_expiry(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(agora_publisher.time, 'time', lambda: now[0])
+    publisher = AgoraPublisher("app", "0" * 32, "server", token_ttl=600, refresh_margin=100)
+
+    first = publisher.token()
+    assert publisher._token_expires == 1_000_600
+    now[0] += 499
+    assert publisher.token() == first
+    # Inside the refresh margin: a new token valid for another full ttl
+    now[0] += 1
+    assert publisher.token() != first
+    assert publisher._token_expires == 1_000_500 + 600
+
+
+def test_publish_sends_refreshed_token():
+    async def test(fakes, publisher):
+        await publisher.publish("alerts", "{}")
+        # Pretend the cached token is about to expire
+        publisher._token_expires = 0
+        await publisher.publish("alerts", "{}")
+        first, second = (token for token, _ in fakes.agora_requests)
+        assert first and second and first != second
+
+    run_with_fakes(test)
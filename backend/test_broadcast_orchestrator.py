@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+from broadcast_orchestrator import (
+    AgoraRTMChannel, BroadcastJob, BroadcastOrchestrator, OutboxChannel, TelegramChannel
+)
+
+
+class MemoryDb:
+    def __init__(self):
+        self.broadcasts = {}
+        self.timelines = {}
+        self.channels = {}
+
+    def add_broadcast(self, data):
+        broadcast_id = len(self.broadcasts) + 1
+        self.broadcasts[broadcast_id] = dict(data, delivered_count=0)
+        return broadcast_id
+
+    def update_broadcast_delivery(self, broadcast_id, count):
+        self.broadcasts[broadcast_id]['delivered_count'] = count
+
+    def add_broadcast_timeline(self, broadcast_id, stages):
+        self.timelines[broadcast_id] = dict(stages)
+
+    def add_broadcast_channel(self, broadcast_id, result):
+        self.channels.setdefault(broadcast_id, []).append(result)
+
+
+class FakeBot:
+    def __init__(self, fail_for=(), latency: float = 0.0):
+        self.fail_for = set(fail_for)
+        self.latency = latency
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if chat_id in self.fail_for:
+            raise ConnectionResetError("socket closed")
+        self.sent.append(chat_id)
+
+
+class FakePublisher:
+    async def publish_many(self, messages, key_prefix=None):
+        await asyncio.sleep(0.01)
+        return len(messages)
+
+
+class BrokenLimiter:
+    def __init__(self, fail_after: int):
+        self.calls = 0
+        self.fail_after = fail_after
+
+    async def wait(self):
+        self.calls += 1
+        if self.calls > self.fail_after:
+            raise RuntimeError("database is locked")
+        await asyncio.sleep(0.01)
+
+
+async def translate(text):
+    return {'hi': text}
+
+
+def recipients(count):
+    return lambda job: ((user_id, 'en') for user_id in range(1, count + 1))
+
+
+def test_failed_send_is_counted_not_raised():
+    bot = FakeBot(fail_for={3, 7})
+    channel = TelegramChannel(bot, recipients(10), concurrency=4, rate=0)
+    job = BroadcastJob(1, "m", 'en', {})
+    assert asyncio.run(channel.send(job)) == (8, 2)
+
+
+def test_limiter_error_stops_every_sender():
+    async def run():
+        bot = FakeBot(latency=0.01)
+        channel = TelegramChannel(bot, recipients(1000), concurrency=5, limiter=BrokenLimiter(fail_after=10))
+        with pytest.raises(RuntimeError):
+            await channel.send(BroadcastJob(1, "m", 'en', {}))
+        sent = len(bot.sent)
+        await asyncio.sleep(0.1)
+        # Nothing keeps sending once send() has raised
+        assert len(bot.sent) == sent
+        assert sent <= 10
+
+    asyncio.run(run())
+
+
+def test_dispatch_returns_before_delivery_finishes():
+    async def run():
+        db = MemoryDb()
+        slow = OutboxChannel("slow", latency=0.2)
+        orchestrator = BroadcastOrchestrator(translate, db, [slow])
+        job, channels = await orchestrator.dispatch("Evacuate")
+        assert channels == ["slow"]
+        assert job.id in orchestrator.running
+        assert 'saved' in db.timelines[job.id] and 'completed' not in db.timelines[job.id]
+
+        await asyncio.sleep(0.3)
+        assert job.id not in orchestrator.running
+        assert 'completed' in db.timelines[job.id]
+        assert db.broadcasts[job.id]['delivered_count'] == 1
+        assert [(c['channel'], c['deliveredCount']) for c in db.channels[job.id]] == [("slow", 1)]
+
+    asyncio.run(run())
+
+
+def test_stop_cancels_deliveries_past_timeout():
+    async def run():
+        orchestrator = BroadcastOrchestrator(translate, MemoryDb(), [OutboxChannel("stuck", latency=10)])
+        job, _ = await orchestrator.dispatch("Evacuate")
+        await orchestrator.stop(timeout=0.05)
+        assert not orchestrator.running
+
+    asyncio.run(run())
+
+
+def test_broadcast_reports_per_channel_results():
+    async def run():
+        orchestrator = BroadcastOrchestrator(translate, MemoryDb(), [OutboxChannel("sms"), OutboxChannel("push")])
+        result = await orchestrator.broadcast("Evacuate", channels=["sms"])
+        assert result['success'] and result['deliveredCount'] == 1
+        assert [c['channel'] for c in result['channels']] == ["sms"]
+        assert result['totalMs'] >= result['translateMs']
+
+    asyncio.run(run())
+
+
+def test_rtm_publish_is_not_a_delivery():
+    async def run():
+        db = MemoryDb()
+        telegram = TelegramChannel(FakeBot(latency=0.05), recipients(3), rate=0)
+        orchestrator = BroadcastOrchestrator(translate, db, [AgoraRTMChannel(FakePublisher()), telegram])
+        result = await orchestrator.broadcast("Evacuate")
+        stages = db.timelines[result['broadcastId']]
+        assert stages['published'] < stages['first_delivery']
+        assert stages['first_delivery'] == stages['first_telegram_delivery']
+        assert stages['last_delivery'] == stages['last_telegram_delivery']
+        assert 'first_agora_rtm_delivery' not in stages
+
+    asyncio.run(run())
@@ -0,0 +1,70 @@
+import asyncio
+
+from event_hub import EventHub
+from shared_state import SharedStore
+
+
+async def drain(subscription, count, timeout=2.0):
+    events = []
+    for _ in range(count):
+        events.append(await subscription.get(timeout))
+    return events
+
+
+def test_resume_replays_missed_events():
+    async def run():
+        hub = EventHub(history=10)
+        for i in range(5):
+            hub.publish('progress', {'n': i})
+        last_seen = hub._history[1].id
+        events = await drain(hub.subscribe(last_event_id=last_seen), 3)
+        assert [e.id for e in events] == [e.id for e in list(hub._history)[2:]]
+
+    asyncio.run(run())
+
+
+def test_resume_past_history_gets_reset_first():
+    async def run():
+        hub = EventHub(history=3)
+        for i in range(10):
+            hub.publish('progress', {'n': i})
+        events = await drain(hub.subscribe(last_event_id=1), 4)
+        assert events[0].type == 'reset' and events[0].id == 0
+        assert [e.id for e in events[1:]] == [e.id for e in hub._history]
+
+    asyncio.run(run())
+
+
+def test_lagging_client_is_dropped_without_blocking_publish():
+    async def run():
+        hub = EventHub(queue_size=4)
+        slow = hub.subscribe()
+        fast = hub.subscribe()
+        for i in range(10):
+            hub.publish('progress', {'n': i})
+            await fast.get(1)
+        assert slow.lagged and slow.closed
+        assert await slow.get(1) is None
+        assert len(hub) == 1
+
+    asyncio.run(run())
+
+
+def test_store_mode_relays_same_ids_in_order(tmp_path):
+    async def run():
+        store = SharedStore(str(tmp_path / "shared.db"))
+        first = EventHub(store=store, poll_interval=0.01)
+        second = EventHub(store=store, poll_interval=0.01)
+        first.start()
+        second.start()
+        a, b = first.subscribe(), second.subscribe()
+        for i in range(20):
+            (first if i % 2 else second).publish('progress', {'n': i})
+        got_a, got_b = await drain(a, 20), await drain(b, 20)
+        assert [e.id for e in got_a] == [e.id for e in got_b]
+        assert [e.id for e in got_a] == sorted(e.id for e in got_a)
+        await first.stop()
+        await second.stop()
+        store.close()
+
+    asyncio.run(run())
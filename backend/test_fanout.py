@@ -0,0 +1,117 @@
+import asyncio
+import collections
+
+import pytest
+
+from broadcast_orchestrator import BroadcastJob
+from fanout import PartitionedFanout, job_from_payload, job_to_payload
+from shared_state import SharedStore
+
+SUBSCRIBERS = range(1, 501)
+
+
+def recorder(sent: collections.Counter, fail_partition=None, latency: float = 0.01):
+    async def deliver(job: BroadcastJob):
+        if job.partition == fail_partition:
+            raise RuntimeError("partition failed")
+        count = 0
+        for user_id in SUBSCRIBERS:
+            if job.includes(user_id):
+                sent[user_id] += 1
+                count += 1
+        await asyncio.sleep(latency)
+        job.timeline.delivered('telegram')
+        return count, 0
+    return deliver
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SharedStore(str(tmp_path / "shared.db"))
+    yield store
+    store.close()
+
+
+def test_job_payload_round_trip():
+    job = BroadcastJob(7, "m", 'en', {'hi': 'x'}, latitude=1.5, longitude=2.5)
+    restored = job_from_payload(job_to_payload(job), 2, 4)
+    assert (restored.id, restored.translations, restored.latitude) == (7, {'hi': 'x'}, 1.5)
+    assert (restored.partition, restored.partitions) == (2, 4)
+
+
+def test_every_subscriber_sent_exactly_once_across_workers(store):
+    async def run():
+        sent = collections.Counter()
+        # Two "workers" sharing the store, each with its own fan-out loop
+        workers = [PartitionedFanout(store, recorder(sent), partitions=4, poll_interval=0.01) for _ in range(2)]
+        workers[1].worker_id = "other"
+        for worker in workers:
+            worker.start()
+        job = BroadcastJob(1, "m", 'en', {})
+        delivered, failed = await workers[0].submit(job)
+        for worker in workers:
+            await worker.stop()
+        assert (delivered, failed) == (len(SUBSCRIBERS), 0)
+        stages = job.timeline.stages
+        assert stages['first_delivery'] == stages['first_telegram_delivery'] <= stages['last_telegram_delivery']
+        assert set(sent) == set(SUBSCRIBERS) and max(sent.values()) == 1
+        assert workers[0].stats() == {'pending': 0, 'inProgress': 0}
+
+    asyncio.run(run())
+
+
+def test_partition_error_is_reported_without_losing_the_rest(store):
+    async def run():
+        sent = collections.Counter()
+        fanout = PartitionedFanout(store, recorder(sent, fail_partition=1), partitions=3, poll_interval=0.01)
+        fanout.start()
+        delivered, _ = await fanout.submit(BroadcastJob(1, "m", 'en', {}))
+        await fanout.stop()
+        assert delivered == sum(1 for u in SUBSCRIBERS if u % 3 != 1)
+
+    asyncio.run(run())
+
+
+def test_expired_lease_is_taken_over(store):
+    async def run():
+        fanout = PartitionedFanout(store, recorder(collections.Counter()), partitions=1, lease=0.05)
+        await store.run(fanout._queue, 1, job_to_payload(BroadcastJob(1, "m", 'en', {})))
+        first = await store.run(fanout._claim)
+        assert first is not None
+        # Still leased: nobody else may claim it
+        fanout.worker_id = "other"
+        assert await store.run(fanout._claim) is None
+        await asyncio.sleep(0.06)
+        assert (await store.run(fanout._claim))[:2] == first[:2]
+
+    asyncio.run(run())
+
+
+def test_purge_keeps_partitions_still_being_sent(store):
+    async def run():
+        sent = collections.Counter()
+        # Sends outlast the retention; the heartbeat keeps their rows alive
+        workers = [PartitionedFanout(store, recorder(sent, latency=0.3), partitions=2, lease=0.15,
+                                     poll_interval=0.01, retention=0.1) for _ in range(2)]
+        workers[1].worker_id = "other"
+        for worker in workers:
+            worker.start()
+        delivered, failed = await workers[0].submit(BroadcastJob(1, "m", 'en', {}))
+        for worker in workers:
+            await worker.stop()
+        assert (delivered, failed) == (len(SUBSCRIBERS), 0)
+        assert set(sent) == set(SUBSCRIBERS) and max(sent.values()) == 1
+
+    asyncio.run(run())
+
+
+def test_vanished_partitions_are_an_error(store):
+    async def run():
+        fanout = PartitionedFanout(store, recorder(collections.Counter()), partitions=2, poll_interval=0.01)
+        submit = asyncio.create_task(fanout.submit(BroadcastJob(1, "m", 'en', {})))
+        await asyncio.sleep(0.02)
+        store.conn.execute('DELETE FROM fanout_partitions')
+        with pytest.raises(RuntimeError, match="disappeared"):
+            await submit
+
+    asyncio.run(run())
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from geo_index import GeoIndex, distance_m, geohash, parse_coordinates
+
+
+def brute_force(points, lat, lon, radius_m):
+    return {user_id for user_id, (plat, plon) in points.items() if distance_m(lat, lon, plat, plon) <= radius_m}
+
+
+def build(points):
+    index = GeoIndex()
+    index.bulk_load((user_id, 'en', lat, lon) for user_id, (lat, lon) in points.items())
+    return index
+
+
+def random_point(rng):
+    # Bias towards the poles and the antimeridian, where the covering logic is hardest
+    kind = rng.random()
+    if kind < 0.25:
+        return rng.uniform(80, 90) * rng.choice((-1, 1)), rng.uniform(-180, 180)
+    if kind < 0.5:
+        return rng.uniform(-60, 60), rng.uniform(175, 180) * rng.choice((-1, 1))
+    return rng.uniform(-90, 90), rng.uniform(-180, 180)
+
+
+def test_matches_brute_force():
+    rng = random.Random(37)
+    points = {user_id: random_point(rng) for user_id in range(1, 5001)}
+    index = build(points)
+    for _ in range(300):
+        lat, lon = random_point(rng)
+        radius = rng.choice((500, 5_000, 50_000, 500_000, 3_000_000, 15_000_000))
+        found = [user_id for user_id, _ in index.within(lat, lon, radius)]
+        assert len(found) == len(set(found))
+        assert set(found) == brute_force(points, lat, lon, radius), (lat, lon, radius)
+
+
+@pytest.mark.parametrize("center, point, radius", [
+    ((0, 179.995), (0, -179.99), 5_000),        # across the antimeridian
+    ((0, -179.999), (0, 179.999), 1_000),
+    ((89.99, 0), (89.99, 180), 5_000),          # across the north pole
+    ((-89.9, 45), (-89.95, -135), 20_000),      # circle containing the south pole
+    ((70, 10), (70, 40), 1_200_000),            # large radius at high latitude
+    ((0, 0), (0, 180), 20_100_000),             # half the planet
+])
+def test_edge_cases(center, point, radius):
+    index = build({1: point})
+    assert distance_m(*center, *point) <= radius
+    assert [user_id for user_id, _ in index.within(*center, radius)] == [1]
+
+
+def test_update_and_remove_move_points():
+    index = build({1: (12.97, 77.59)})
+    assert [u for u, _ in index.within(12.97, 77.59, 1_000)] == [1]
+    index.update(1, 28.61, 77.21, 'hi')
+    assert list(index.within(12.97, 77.59, 1_000)) == []
+    assert list(index.within(28.61, 77.21, 1_000)) == [(1, 'hi')]
+    index.remove(1)
+    assert len(index) == 0
+    assert list(index.within(28.61, 77.21, 1_000)) == []
+
+
+def test_geohash_known_value():
+    assert geohash(57.64911, 10.40744, 6) == "u4pruy"
+
+
+def test_parse_coordinates():
+    assert parse_coordinates("12.97, 77.59") == (12.97, 77.59)
+    assert parse_coordinates("Hall A, Gate 3") is None
+    assert parse_coordinates("100, 10") is None
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+import pytest
+
+from llm_gateway import CircuitBreaker, FakeBackend, LLMGateway, LLMUnavailable
+
+
+class FlakyBackend(FakeBackend):
+    """Fails the first `failures` calls, then answers"""
+
+    def __init__(self, failures: int, latency: float = 0.0):
+        super().__init__(latency=latency)
+        self.failures = failures
+
+    async def generate(self, model_name: str, prompt: str) -> str:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.calls <= self.failures:
+            raise RuntimeError("flaky")
+        return "OK"
+
+
+def test_timeout_bounds_whole_call_including_retries():
+    gateway = LLMGateway(FakeBackend(latency=5), timeout=0.3, retries=3, backoff=0.05)
+    start = time.monotonic()
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(gateway.generate("m", "p"))
+    assert time.monotonic() - start < 0.5
+
+
+def test_retries_within_deadline_succeed():
+    backend = FlakyBackend(failures=2)
+    gateway = LLMGateway(backend, timeout=1, retries=2, backoff=0.01)
+    assert asyncio.run(gateway.generate("m", "p")) == "OK"
+    assert backend.calls == 3
+    assert gateway.breaker.failures == 0
+
+
+def test_one_breaker_failure_per_failed_call():
+    backend = FlakyBackend(failures=100)
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    gateway = LLMGateway(backend, timeout=1, retries=2, backoff=0.0, breaker=breaker)
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(gateway.generate("m", "p"))
+    assert backend.calls == 3
+    assert breaker.failures == 1
+    assert breaker.state == breaker.CLOSED
+
+
+def test_breaker_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == breaker.HALF_OPEN
+    assert not breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow()
+
+
+def test_abandoned_probe_is_replaced_after_reset_timeout():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+from response_cache import GENERATION_KEY, ResponseCache, dumps
+from shared_state import SharedStore
+
+
+def test_hit_until_invalidated():
+    cache = ResponseCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {'n': len(builds)}
+
+    body, etag = cache.get_or_build('broadcasts', 50, build)
+    assert cache.get_or_build('broadcasts', 50, build) == (body, etag)
+    assert len(builds) == 1
+
+    cache.invalidate()
+    new_body, new_etag = cache.get_or_build('broadcasts', 50, build)
+    assert json.loads(new_body) == {'n': 2}
+    assert new_etag != etag
+
+
+def test_same_content_keeps_etag():
+    cache = ResponseCache()
+    _, etag = cache.get_or_build('analytics', None, lambda: {'a': 1})
+    cache.invalidate()
+    assert cache.get_or_build('analytics', None, lambda: {'a': 1})[1] == etag
+
+
+def test_max_age_expires_entries():
+    cache = ResponseCache()
+    calls = []
+    cache.get_or_build('analytics', None, lambda: calls.append(1) or {}, max_age=0)
+    cache.get_or_build('analytics', None, lambda: calls.append(1) or {}, max_age=0)
+    assert len(calls) == 2
+
+
+def test_lru_bound():
+    cache = ResponseCache(maxsize=2)
+    for limit in (10, 20, 30):
+        cache.get_or_build('broadcasts', limit, lambda: {})
+    assert len(cache) == 2
+
+
+def test_invalidation_is_shared_through_store(tmp_path):
+    async def run():
+        store = SharedStore(str(tmp_path / "shared.db"))
+        one, two = (ResponseCache(store=store, poll_interval=0.01) for _ in range(2))
+        one.start()
+        two.start()
+        one.get_or_build('broadcasts', 50, lambda: {'v': 1})
+        two.get_or_build('broadcasts', 50, lambda: {'v': 1})
+        one.invalidate()
+        # The writing worker sees its own change straight away, the other after a poll
+        assert json.loads(one.get_or_build('broadcasts', 50, lambda: {'v': 2})[0]) == {'v': 2}
+        await asyncio.sleep(0.1)
+        assert json.loads(two.get_or_build('broadcasts', 50, lambda: {'v': 2})[0]) == {'v': 2}
+        await one.stop()
+        await two.stop()
+        assert store.get(GENERATION_KEY) == 1
+        store.close()
+
+    asyncio.run(run())
+
+
+def test_dumps_is_compact_utf8():
+    assert dumps({'hi': 'नमस्ते', 'n': [1, 2]}) == '{"hi":"नमस्ते","n":[1,2]}'.encode('utf-8')
+
+
+def test_endpoint_revalidation(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_PATH', str(tmp_path / "server.db"))
+    monkeypatch.setenv('LLM_BACKEND', 'fake')
+    monkeypatch.chdir(tmp_path)
+    from fastapi.testclient import TestClient
+    import server
+
+    with TestClient(server.app) as client:
+        first = client.get('/api/broadcasts')
+        etag = first.headers['etag']
+        assert first.status_code == 200
+        again = client.get('/api/broadcasts', headers={'If-None-Match': etag})
+        assert again.status_code == 304 and not again.content
+        assert client.get('/api/broadcasts', headers={'If-None-Match': f'W/{etag}, "x"'}).status_code == 304
+
+        server.db.add_broadcast({'message': 'm', 'sourceLanguage': 'en', 'location': '', 'radius': 5000,
+                                 'emergency': False, 'translations': {}})
+        changed = client.get('/api/broadcasts', headers={'If-None-Match': etag})
+        assert changed.status_code == 200 and changed.headers['etag'] != etag
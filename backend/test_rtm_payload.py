@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from rtm_payload import SAFE_PAYLOAD_BYTES, PayloadTooLarge, build_payloads, payload_size
+
+DATA = {'id': 1, 'message': 'Evacuate', 'location': 'Hall A', 'emergency': True, 'timestamp': 't'}
+TRANSLATIONS = {'hi': 'खाली करें', 'ta': 'வெளியேறு', 'te': 'ఖాళీ చేయండి'}
+
+
+def decoded(payloads):
+    return {channel: json.loads(payload)['data'] for channel, payload in payloads}
+
+
+def test_unsharded_small_broadcast_is_one_message():
+    payloads = decoded(build_payloads('ALERTS', DATA, TRANSLATIONS))
+    assert list(payloads) == ['ALERTS']
+    assert payloads['ALERTS']['translations'] == TRANSLATIONS
+
+
+def test_sharded_base_channel_keeps_feed_translations():
+    payloads = decoded(build_payloads('ALERTS', DATA, TRANSLATIONS, shard=True))
+    assert payloads['ALERTS']['translations'] == {'hi': TRANSLATIONS['hi']}
+    for language, text in TRANSLATIONS.items():
+        assert payloads[f'ALERTS_{language}']['translations'] == {language: text}
+        assert payloads[f'ALERTS_{language}']['language'] == language
+
+
+def test_oversized_broadcast_falls_back_to_shards_with_hindi_on_base():
+    translations = {lang: 'अ' * 3000 for lang in ('hi', 'ta', 'te', 'bn', 'mr')}
+    payloads = build_payloads('ALERTS', DATA, translations)
+    assert len(payloads) == 1 + len(translations)
+    assert all(payload_size(p) <= SAFE_PAYLOAD_BYTES for _, p in payloads)
+    assert decoded(payloads)['ALERTS']['translations'] == {'hi': translations['hi']}
+
+
+def test_single_language_over_limit_raises():
+    with pytest.raises(PayloadTooLarge):
+        build_payloads('ALERTS', DATA, {'ta': 'அ' * 20000}, shard=True)
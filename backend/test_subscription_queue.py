@@ -0,0 +1,59 @@
+import asyncio
+
+from subscription_queue import SubscriptionQueue
+
+
+class RecordingBackend:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.posts = []
+
+    async def post(self, path, json, timeout=None):
+        if self.fail:
+            raise ConnectionError("backend down")
+        self.posts.append(json['subscribers'])
+        return {}
+
+
+def test_concurrent_enqueues_share_a_commit(tmp_path):
+    async def run():
+        queue = SubscriptionQueue(RecordingBackend(), path=str(tmp_path / "q.db"))
+        commits = 0
+        store = queue._store
+
+        def counting_store(rows):
+            nonlocal commits
+            commits += 1
+            store(rows)
+
+        queue._store = counting_store
+        await asyncio.gather(*(queue.enqueue(i, f"u{i}", "F", 'en') for i in range(100)))
+        assert commits == 1
+        assert queue.pending() == 100
+        await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_pending_updates_survive_restart_and_overlay_languages(tmp_path):
+    path = str(tmp_path / "q.db")
+
+    async def first_run():
+        queue = SubscriptionQueue(RecordingBackend(fail=True), path=path)
+        await queue.enqueue(1, "a", "A", 'en')
+        await queue.enqueue(1, "a", "A", 'hi')
+        await queue.enqueue(2, "b", "B", 'ta')
+        await queue.stop()
+
+    async def second_run():
+        queue = SubscriptionQueue(RecordingBackend(), path=path)
+        assert queue.pending() == 2
+        assert await queue.pending_languages() == {1: 'hi', 2: 'ta'}
+        assert await queue.flush() == 2
+        assert queue.pending() == 0
+        sent = {item['userId']: item['language'] for item in queue.backend.posts[0]}
+        assert sent == {1: 'hi', 2: 'ta'}
+        await queue.stop()
+
+    asyncio.run(first_run())
+    asyncio.run(second_run())
@@ -0,0 +1,62 @@
+import asyncio
+
+import aiohttp
+import uvicorn
+from telegram.ext import ApplicationBuilder
+
+from telegram_webhook import SECRET_HEADER, LocalTelegramSender, WebhookIngress, create_webhook_app
+
+SECRET = "test-secret"
+
+
+async def serve(queue_size: int):
+    """Webhook app on a real socket; the Application isn't started, so updates stay queued"""
+    application = ApplicationBuilder().token("123:test").update_queue(asyncio.Queue(maxsize=queue_size)).build()
+    ingress = WebhookIngress(application, SECRET, register=False)
+    app = create_webhook_app(ingress, manage_lifespan=False)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_config=None, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    sender = LocalTelegramSender(f"http://127.0.0.1:{port}/webhook", SECRET)
+    return ingress, sender, server, task
+
+
+async def shutdown(sender, server, task):
+    await sender.close()
+    server.should_exit = True
+    await task
+
+
+def test_webhook_statuses():
+    async def run():
+        ingress, sender, server, task = await serve(queue_size=2)
+        queue = ingress.application.update_queue
+        try:
+            assert await sender.send_text(1, "/start") == 200
+            assert queue.qsize() == 1
+
+            # Wrong or missing secret
+            assert await sender.send(sender.make_message_update(1, "hi"), secret_token="wrong") == 403
+            assert await sender.send(sender.make_message_update(1, "hi"), secret_token="") == 403
+
+            # JSON null and an unparseable body
+            assert await sender.send(None) == 400
+            async with aiohttp.ClientSession() as session:
+                async with session.post(sender.webhook_url, data="{not json",
+                                        headers={SECRET_HEADER: SECRET}) as response:
+                    assert response.status == 400
+            assert queue.qsize() == 1
+
+            # Second update fills the queue; the third gets backpressure
+            assert await sender.send_text(2, "hello") == 200
+            assert await sender.send_text(3, "hello") == 503
+
+            assert ingress.stats() == {'received': 2, 'rejected': 2, 'dropped': 1, 'queueDepth': 2}
+            first = queue.get_nowait()
+            assert first.effective_chat.id == 1 and first.message.text == "/start"
+        finally:
+            await shutdown(sender, server, task)
+
+    asyncio.run(run())
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+import token_cache
+from token_cache import TokenCache
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(token_cache.time, "time", clock.time)
+    return clock
+
+
+def build(expires_at: int) -> str:
+    return f"token-{expires_at}"
+
+
+def issue(cache, key, build=build):
+    return asyncio.run(cache.get_or_issue(key, build))
+
+
+def test_reused_only_in_first_half_of_ttl(clock):
+    cache = TokenCache(ttl=1000, reuse_fraction=0.5)
+    token, expires_at = issue(cache, 'k')
+    assert expires_at == clock.now + 1000
+
+    clock.now += 499
+    assert issue(cache, 'k') == (token, expires_at)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    clock.now += 1
+    renewed, renewed_expires = issue(cache, 'k')
+    assert renewed != token
+    assert renewed_expires == clock.now + 1000
+    assert cache.misses == 2
+
+
+def test_handed_out_tokens_keep_minimum_validity(clock):
+    cache = TokenCache(ttl=3600 * 24, reuse_fraction=0.5)
+    for _ in range(200):
+        _, expires_at = issue(cache, 'k')
+        assert expires_at - clock.now >= 3600 * 12
+        clock.now += 977
+
+
+def test_keys_are_independent_and_bounded(clock):
+    cache = TokenCache(ttl=1000, maxsize=2)
+    first, _ = issue(cache, 'a')
+    issue(cache, 'b')
+    issue(cache, 'c')
+    assert len(cache) == 2
+    clock.now += 1
+    assert issue(cache, 'a')[0] != first
+
+
+def test_shared_store_hands_out_same_token(clock, tmp_path):
+    from shared_state import SharedStore
+
+    store = SharedStore(str(tmp_path / "shared.db"))
+    one = TokenCache(ttl=1000, store=store)
+    two = TokenCache(ttl=1000, store=store)
+    assert issue(one, 'k') == issue(two, 'k', lambda e: "other")
+    assert (two.hits, two.misses) == (1, 0)
+    store.close()
+
+
+def test_store_misses_run_off_the_event_loop(clock, tmp_path):
+    import threading
+    from shared_state import SharedStore
+
+    store = SharedStore(str(tmp_path / "shared.db"))
+    threads = []
+
+    def signing(expires_at):
+        threads.append(threading.get_ident())
+        return build(expires_at)
+
+    issue(TokenCache(ttl=1000, store=store), 'k', signing)
+    assert threads and threads[0] != threading.get_ident()
+    store.close()
+
+
+def test_rejects_invalid_reuse_fraction():
+    with pytest.raises(ValueError):
+        TokenCache(reuse_fraction=1)
@@ -0,0 +1,77 @@
+import asyncio
+
+from telegram import Update
+
+from update_processor import PerChatUpdateProcessor
+
+
+def make_update(update_id: int, chat_id: int) -> Update:
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'T'},
+            'text': str(update_id),
+        },
+    }, None)
+
+
+def test_each_chat_stays_in_order_with_one_slot():
+    async def run():
+        processor = PerChatUpdateProcessor(max_concurrent_updates=8)
+        finished = []
+        snapshots = []
+
+        async def handle(chat_id, n, delay):
+            snapshots.append((processor.in_flight, processor.queued))
+            await asyncio.sleep(delay)
+            finished.append((chat_id, n))
+
+        # Interleaved updates; earlier ones in each chat are slower, so unordered
+        # processing would finish them last
+        updates = []
+        for n in range(4):
+            for chat_id in (1, 2):
+                delay = (4 - n) * 0.01 if chat_id == 1 else (4 - n) * 0.005
+                updates.append((make_update(len(updates) + 1, chat_id), handle(chat_id, n, delay)))
+
+        tasks = [asyncio.create_task(processor.process_update(update, coroutine)) for update, coroutine in updates]
+        await asyncio.sleep(0.001)
+        # One update running per chat, the other three parked behind it
+        assert processor.in_flight == 2
+        assert processor.queued == 6
+        assert processor.stats()['activeChats'] == 2
+        await asyncio.gather(*tasks)
+
+        for chat_id in (1, 2):
+            assert [n for c, n in finished if c == chat_id] == [0, 1, 2, 3]
+        assert max(in_flight for in_flight, _ in snapshots) <= 2
+        assert (processor.in_flight, processor.queued, processor.processed) == (0, 0, 8)
+        assert processor.max_queued == 6
+        assert processor.stats()['activeChats'] == 0
+
+    asyncio.run(run())
+
+
+def test_failure_does_not_block_the_chat():
+    async def run():
+        processor = PerChatUpdateProcessor(max_concurrent_updates=4)
+        done = []
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("handler bug")
+
+        async def ok():
+            done.append(True)
+
+        await asyncio.gather(
+            processor.process_update(make_update(1, 5), fail()),
+            processor.process_update(make_update(2, 5), ok()),
+        )
+        assert done == [True]
+        assert (processor.failed, processor.processed, processor.queued) == (1, 2, 0)
+
+    asyncio.run(run())
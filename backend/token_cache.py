@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Tuple
+
+
+class TokenCache:
+    """TTL cache of issued Agora tokens keyed by (kind, user, channel, role).
+
+    A cached token is handed out again only during the first reuse_fraction
+    of its TTL, so every token a client receives still has at least
+    (1 - reuse_fraction) * ttl of validity left, while a reconnect storm
+    still costs one HMAC signing per key. With a
+    shared_state.SharedStore, local misses check the store first so every
+    worker process hands out the same token.
+    """
+
+    def __init__(self, ttl: int = 3600 * 24, reuse_fraction: float = 0.5, maxsize: int = 100_000,
+                 store=None):
+        if not 0 <= reuse_fraction < 1:
+            raise ValueError("reuse_fraction must be in [0, 1)")
+        self.ttl = ttl
+        self.reuse_fraction = reuse_fraction
+        # A cached token is reused only while it has at least this long left
+        self.min_validity = ttl * (1 - reuse_fraction)
+        self.maxsize = maxsize
+        self.store = store
+        self._entries: "OrderedDict[Hashable, Tuple[str, int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_issue(self, key: Hashable, build: Callable[[int], str]) -> Tuple[str, int]:
+        """Return (token, expires_at), calling build(expires_at) only on a miss.
+
+        Local hits return without leaving the event loop; the shared store
+        (and any signing after a store miss) runs on the store's threads.
+        """
+        now = int(time.time())
+        entry = self._entries.get(key)
+        if entry is not None and now < entry[1] - self.min_validity:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+        if self.store is None:
+            entry, issued = self._issue(now, build), True
+        else:
+            entry, issued = await self.store.run(self._shared, f"token:{key!r}", now, build)
+        if issued:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return self._remember(key, entry)
+
+    def _issue(self, now: int, build: Callable[[int], str]) -> Tuple[str, int]:
+        expires_at = now + self.ttl
+        return build(expires_at), expires_at
+
+    def _shared(self, shared_key: str, now: int, build: Callable[[int], str]) -> Tuple[Tuple[str, int], bool]:
+        """Another worker's token if still fresh enough, else a new one saved for the others"""
+        shared = self.store.get(shared_key)
+        if shared is not None and now < shared[1] - self.min_validity:
+            return (shared[0], shared[1]), False
+        entry = self._issue(now, build)
+        self.store.set(shared_key, entry, ttl=self.ttl)
+        return entry, True
+
+    def _remember(self, key: Hashable, entry: Tuple[str, int]) -> Tuple[str, int]:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entry
@@ -0,0 +1,109 @@
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+UPDATE_SECONDS = Histogram('bot_update_seconds', 'Time from update arrival to handler completion', ['outcome'])
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates concurrently while keeping each chat's updates in order.
+
+    Updates for a chat that already has one in flight are parked in that chat's
+    queue and drained by the same task, so a busy chat holds at most one slot.
+    """
+
+    def __init__(self, max_concurrent_updates: int, log_every: int = 500):
+        super().__init__(max_concurrent_updates)
+        self.log_every = log_every
+        self._pending: Dict[int, Deque[Tuple[Awaitable[Any], float]]] = {}
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.processed = 0
+        self.failed = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    @staticmethod
+    def _chat_key(update: object) -> Optional[int]:
+        if isinstance(update, Update):
+            if update.effective_chat:
+                return update.effective_chat.id
+            if update.effective_user:
+                return update.effective_user.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        item = (coroutine, time.monotonic())
+        key = self._chat_key(update)
+
+        if key is None:
+            await self._run(item)
+            return
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.append(item)
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+            return
+
+        pending = self._pending[key] = deque()
+        try:
+            await self._run(item)
+            while pending:
+                self.queued -= 1
+                await self._run(pending.popleft())
+        finally:
+            del self._pending[key]
+            # Only reached on cancellation; don't leave coroutines un-awaited
+            while pending:
+                self.queued -= 1
+                pending.popleft()[0].close()
+
+    async def _run(self, item: Tuple[Awaitable[Any], float]):
+        coroutine, received_at = item
+        self.in_flight += 1
+        outcome = 'ok'
+        try:
+            await coroutine
+        except Exception as e:
+            self.failed += 1
+            outcome = 'error'
+            logger.error(f"Update processing failed: {e}")
+        finally:
+            self.in_flight -= 1
+            latency = time.monotonic() - received_at
+            UPDATE_SECONDS.observe(latency, outcome=outcome)
+            self.processed += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            if self.log_every and self.processed % self.log_every == 0:
+                logger.info(f"Update stats: {self.stats()}")
+
+    def stats(self) -> Dict:
+        """Queue depth and latency counters"""
+        return {
+            'inFlight': self.in_flight,
+            'queued': self.queued,
+            'maxQueued': self.max_queued,
+            'activeChats': len(self._pending),
+            'processed': self.processed,
+            'failed': self.failed,
+            'avgLatencyMs': round(1000 * self.total_latency / self.processed, 1) if self.processed else 0,
+            'maxLatencyMs': round(1000 * self.max_latency, 1),
+        }
+
+    async def initialize(self) -> None:
+        """Nothing to allocate"""
+
+    async def shutdown(self) -> None:
+        logger.info(f"Update stats at shutdown: {self.stats()}")
@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+VENUE_FILE = os.getenv("VENUE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "venue.json"))
+
+Localized = Dict[str, str]
+
+
+@dataclass(frozen=True)
+class Venue:
+    """Venue knowledge: exits, safe zones, facilities and canned responses"""
+    name: str
+    languages: Tuple[str, ...]
+    labels: Dict[str, Localized]
+    exits: Tuple[Localized, ...]
+    safe_zones: Tuple[Localized, ...]
+    medical: Tuple[Localized, ...]
+    water: Tuple[Localized, ...]
+    emergency_numbers: Tuple[str, ...]
+    responses: Dict[str, Localized]
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Venue":
+        languages = tuple(data.get('languages') or ['en'])
+        if 'en' not in languages:
+            raise ValueError("venue data must include English ('en')")
+        return cls(
+            name=data.get('name', ''),
+            languages=languages,
+            labels=dict(data.get('labels', {})),
+            exits=tuple(data.get('exits', [])),
+            safe_zones=tuple(data.get('safe_zones', [])),
+            medical=tuple(data.get('medical', [])),
+            water=tuple(data.get('water', [])),
+            emergency_numbers=tuple(str(n) for n in data.get('emergency_numbers', [])),
+            responses=dict(data.get('responses', {})),
+        )
+
+
+def _pick(text: Localized, language: str) -> str:
+    return text.get(language) or text.get('en', '')
+
+
+def render_location_info(venue: Venue, language: str) -> str:
+    """Markdown block for the bot's /location command"""
+    def label(key):
+        return _pick(venue.labels.get(key, {'en': key}), language)
+
+    def bullets(items):
+        return "\n".join(f"• {_pick(item, language)}" for item in items)
+
+    numbers = f" {label('or')} ".join(venue.emergency_numbers)
+    medical = bullets(venue.medical)
+    if numbers:
+        medical += f"\n• {label('emergency')}: {numbers}"
+
+    return f"""📍 **{label('title')}**
+
+🚪 **{label('exits')}:**
+{bullets(venue.exits)}
+
+🛡️ **{label('safe_zones')}:**
+{bullets(venue.safe_zones)}
+
+🏥 **{label('medical')}:**
+{medical}
+
+💧 **{label('water')}:**
+{bullets(venue.water)}"""
+
+
+def render_prompt_context(venue: Venue) -> str:
+    """Context lines for the Gemini chat prompt"""
+    def joined(items):
+        return "; ".join(_pick(item, 'en') for item in items)
+
+    return "\n".join([
+        f"- Exits: {joined(venue.exits)}",
+        f"- Safe Zones: {joined(venue.safe_zones)}",
+        f"- Medical: {joined(venue.medical)}",
+        f"- Water: {joined(venue.water)}",
+        f"- Emergency Number: {', '.join(venue.emergency_numbers)}",
+    ])
+
+
+class VenueStore:
+    """Loads venue data once, precomputes renderings and reloads when the file changes"""
+
+    def __init__(self, path: str = VENUE_FILE, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._mtime = None
+        self._last_check = 0.0
+        self.venue: Optional[Venue] = None
+        self._location_info: Dict[str, str] = {}
+        self._prompt_context = ""
+        self._responses: Dict[str, Localized] = {}
+        self._keywords: List[str] = []
+        self._load()
+
+    def _load(self):
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, encoding='utf-8') as f:
+            venue = Venue.from_dict(json.load(f))
+
+        # Build everything first so readers never see a half-updated store
+        location_info = {lang: render_location_info(venue, lang) for lang in venue.languages}
+        prompt_context = render_prompt_context(venue)
+        keywords = [key for key in venue.responses if key != 'default']
+
+        self.venue = venue
+        self._location_info = location_info
+        self._prompt_context = prompt_context
+        self._responses = venue.responses
+        self._keywords = keywords
+        self._mtime = mtime
+
+    def refresh(self):
+        """Reload the venue file if it changed (checked at most every check_interval)"""
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        try:
+            if os.path.getmtime(self.path) != self._mtime:
+                self._load()
+                logger.info(f"🔄 Venue data reloaded from {self.path}")
+        except Exception as e:
+            logger.warning(f"⚠️  Venue reload failed, keeping previous data: {e}")
+
+    def location_info(self, language: str = 'en') -> str:
+        self.refresh()
+        return self._location_info.get(language) or self._location_info['en']
+
+    def prompt_context(self) -> str:
+        self.refresh()
+        return self._prompt_context
+
+    def response(self, key: str, language: str = 'en') -> str:
+        self.refresh()
+        return _pick(self._responses.get(key, {}), language)
+
+    def quick_response(self, message: str, language: str = 'en', default: bool = False) -> Optional[str]:
+        """Canned response for the first keyword found in message"""
+        self.refresh()
+        message_lower = message.lower()
+        for keyword in self._keywords:
+            if keyword in message_lower:
+                return _pick(self._responses[keyword], language)
+        if default:
+            return _pick(self._responses.get('default', {}), language) or None
+        return None
@@ -3,7 +3,7 @@ import { useBroadcasts } from '@/lib/BroadcastProvider';
 
 export const BroadcastFeed: React.FC = () => {
   // 1. Get data from the context
-  const { messages, isConnected } = useBroadcasts();
+  const { messages, isConnected, language } = useBroadcasts();
 
   return (
     <div className="p-4">
@@ -31,6 +31,11 @@ export const BroadcastFeed: React.FC = () => {
             <p className="text-sm text-gray-500">
               Hindi: {msg.translations.hi || '...'}
             </p>
+            {language && language !== 'hi' && (
+              <p className="text-sm text-gray-500">
+                {language.toUpperCase()}: {msg.translations[language] || '...'}
+              </p>
+            )}
             <p className="text-xs text-gray-400">
               {new Date(msg.timestamp).toLocaleString()}
             </p>
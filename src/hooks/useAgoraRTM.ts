@@ -4,6 +4,7 @@ import AgoraRTM from 'agora-rtm-sdk';
 export interface BroadcastMessage {
   id: number;
   message: string;
+  language?: string;
   translations: Record<string, string>;
   location: string;
   emergency: boolean;
@@ -13,14 +14,57 @@ export interface BroadcastMessage {
 const APP_ID = import.meta.env.VITE_AGORA_APP_ID;
 const CHANNEL_NAME = 'EMERGENCY_ALERTS';
 const BACKEND_URL = import.meta.env.VITE_BACKEND_URL || 'http://localhost:3001';
+// Renew the RTM token this long before it expires
+const TOKEN_RENEW_MARGIN_MS = 5 * 60 * 1000;
+
+const fetchRtmToken = async (userId: string): Promise<{ token: string; expiresAt?: number }> => {
+  const response = await fetch(`${BACKEND_URL}/api/token/rtm/${userId}`);
+  if (!response.ok) {
+    throw new Error(`Failed to fetch RTM token: ${response.status} ${response.statusText}`);
+  }
+  return response.json();
+};
+
+// Merge a broadcast into the feed; the same broadcast arrives once per joined channel
+// when the backend shards by language, each copy carrying different translations.
+const mergeBroadcast = (prev: BroadcastMessage[], incoming: BroadcastMessage): BroadcastMessage[] => {
+  const index = prev.findIndex((m) => m.id === incoming.id);
+  if (index === -1) return [incoming, ...prev];
+  const merged = { ...prev[index], translations: { ...prev[index].translations, ...incoming.translations } };
+  return [...prev.slice(0, index), merged, ...prev.slice(index + 1)];
+};
 
-export const useAgoraRTM = () => {
+// Always joins the base channel (original message plus Hindi). Pass a language code to also
+// join that language's channel (EMERGENCY_ALERTS_<lang>), which the backend publishes when
+// AGORA_SHARD_BY_LANGUAGE is enabled or a broadcast is too large for one message. Changing
+// the language leaves the old language channel and joins the new one.
+export const useAgoraRTM = (language?: string) => {
   const [messages, setMessages] = useState<BroadcastMessage[]>([]);
   const [isConnected, setIsConnected] = useState(false);
+  const [isLoggedIn, setIsLoggedIn] = useState(false);
   const clientRef = useRef<any>(null);
   const channelRef = useRef<any>(null);
   const isInitializing = useRef(false);
   const isInitialized = useRef(false);
+  const renewTimerRef = useRef<ReturnType<typeof setTimeout> | null>(null);
+
+  // Shared by the base and language channels
+  const handleChannelMessage = (message: any, memberId: string) => {
+    console.log(`📨 Message received from ${memberId}:`, message);
+
+    if (message.text) {
+      try {
+        const payload = JSON.parse(message.text);
+        if (payload.type === 'broadcast') {
+          const broadcastData: BroadcastMessage = payload.data;
+          console.log('📢 Broadcast received:', broadcastData);
+          setMessages((prev) => mergeBroadcast(prev, broadcastData));
+        }
+      } catch (e) {
+        console.error('Failed to parse broadcast message:', e);
+      }
+    }
+  };
 
   useEffect(() => {
     if (!APP_ID) {
@@ -50,18 +94,33 @@ export const useAgoraRTM = () => {
 
         // Fetch token from backend
         console.log('🔑 Fetching RTM token from backend...');
-        const response = await fetch(`${BACKEND_URL}/api/token/rtm/${userId}`);
-        
-        if (!response.ok) {
-          throw new Error(`Failed to fetch RTM token: ${response.status} ${response.statusText}`);
-        }
-        
-        const { token } = await response.json();
+        const { token, expiresAt } = await fetchRtmToken(userId);
         console.log('✅ Token received from backend');
 
+        // Renew ahead of expiry so long-running listeners stay logged in
+        const scheduleRenewal = (expiresAtSeconds?: number) => {
+          if (renewTimerRef.current) clearTimeout(renewTimerRef.current);
+          if (!expiresAtSeconds) return;
+          const delay = Math.max(expiresAtSeconds * 1000 - Date.now() - TOKEN_RENEW_MARGIN_MS, 30 * 1000);
+          renewTimerRef.current = setTimeout(renewToken, delay);
+        };
+        const renewToken = async () => {
+          try {
+            const renewed = await fetchRtmToken(userId);
+            await clientRef.current?.renewToken(renewed.token);
+            console.log('🔑 RTM token renewed');
+            scheduleRenewal(renewed.expiresAt);
+          } catch (error) {
+            console.error('❌ RTM token renewal failed, retrying:', error);
+            renewTimerRef.current = setTimeout(renewToken, 30 * 1000);
+          }
+        };
+
         // Login to Agora RTM with token
         await clientRef.current.login({ uid: userId, token: token });
         console.log('✅ Logged in to Agora RTM');
+        scheduleRenewal(expiresAt);
+        clientRef.current.on('TokenExpired', renewToken);
 
         // Create and join channel
         channelRef.current = clientRef.current.createChannel(CHANNEL_NAME);
@@ -69,25 +128,11 @@ export const useAgoraRTM = () => {
         console.log(`✅ Joined channel: ${CHANNEL_NAME}`);
 
         setIsConnected(true);
+        setIsLoggedIn(true);
         isInitialized.current = true;
 
         // Set up message listener
-        channelRef.current.on('ChannelMessage', (message: any, memberId: string) => {
-          console.log(`📨 Message received from ${memberId}:`, message);
-          
-          if (message.text) {
-            try {
-              const payload = JSON.parse(message.text);
-              if (payload.type === 'broadcast') {
-                const broadcastData: BroadcastMessage = payload.data;
-                console.log('📢 Broadcast received:', broadcastData);
-                setMessages((prev) => [broadcastData, ...prev]);
-              }
-            } catch (e) {
-              console.error('Failed to parse broadcast message:', e);
-            }
-          }
-        });
+        channelRef.current.on('ChannelMessage', handleChannelMessage);
 
         // Connection state listener
         clientRef.current.on('ConnectionStateChanged', (newState: string, reason: string) => {
@@ -108,6 +153,10 @@ export const useAgoraRTM = () => {
     // Cleanup
     return () => {
       const cleanup = async () => {
+        if (renewTimerRef.current) {
+          clearTimeout(renewTimerRef.current);
+          renewTimerRef.current = null;
+        }
         if (!isInitialized.current) {
           return; // Don't cleanup if never initialized
         }
@@ -128,10 +177,42 @@ export const useAgoraRTM = () => {
         
         isInitialized.current = false;
         isInitializing.current = false;
+        setIsLoggedIn(false);
       };
       cleanup();
     };
-  }, []); // Empty dependency array - run once
+  }, []); // Empty dependency array - log in once
+
+  // Language channel: rejoined whenever the language changes, once logged in
+  useEffect(() => {
+    if (!isLoggedIn || !language || !clientRef.current) {
+      return;
+    }
+
+    const channelName = `${CHANNEL_NAME}_${language}`;
+    const channel = clientRef.current.createChannel(channelName);
+    let joined = false;
+    let cancelled = false;
+    const leave = () => channel.leave()
+      .then(() => console.log(`👋 Left channel: ${channelName}`))
+      .catch(() => { /* client may already be logged out */ });
+
+    channel.on('ChannelMessage', handleChannelMessage);
+    channel.join()
+      .then(() => {
+        joined = true;
+        console.log(`✅ Joined channel: ${channelName}`);
+        // Language changed while the join was in flight
+        if (cancelled) leave();
+      })
+      .catch((error: any) => console.error(`❌ Failed to join ${channelName}:`, error));
+
+    return () => {
+      cancelled = true;
+      channel.removeAllListeners?.();
+      if (joined) leave();
+    };
+  }, [language, isLoggedIn]);
 
   return { messages, isConnected };
 };
@@ -1,9 +1,15 @@
-import React, { createContext, useContext } from 'react';
+import React, { createContext, useContext, useEffect, useState } from 'react';
 import { useAgoraRTM, BroadcastMessage } from '@/hooks/useAgoraRTM';
 
+// Remembered across reloads so listeners rejoin their language channel
+const LANGUAGE_STORAGE_KEY = 'listenerLanguage';
+
 interface BroadcastContextType {
   messages: BroadcastMessage[];
   isConnected: boolean;
+  // Listener's language code (e.g. 'ta'); undefined means the base channel only
+  language?: string;
+  setLanguage: (language?: string) => void;
 }
 
 // 1. Create the context
@@ -11,10 +17,21 @@ const BroadcastContext = createContext<BroadcastContextType | undefined>(undefin
 
 // 2. Create the provider component
 export const BroadcastProvider: React.FC<{ children: React.ReactNode }> = ({ children }) => {
-  const { messages, isConnected } = useAgoraRTM();
+  const [language, setLanguage] = useState<string | undefined>(
+    () => localStorage.getItem(LANGUAGE_STORAGE_KEY) || undefined
+  );
+  const { messages, isConnected } = useAgoraRTM(language);
+
+  useEffect(() => {
+    if (language) {
+      localStorage.setItem(LANGUAGE_STORAGE_KEY, language);
+    } else {
+      localStorage.removeItem(LANGUAGE_STORAGE_KEY);
+    }
+  }, [language]);
 
   return (
-    <BroadcastContext.Provider value={{ messages, isConnected }}>
+    <BroadcastContext.Provider value={{ messages, isConnected, language, setLanguage }}>
       {children}
     </BroadcastContext.Provider>
   );
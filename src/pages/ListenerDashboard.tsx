@@ -6,14 +6,33 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@
 import { Input } from '@/components/ui/input';
 import { AlertCircle, Volume2, MessageSquare, Send } from 'lucide-react';
 import { Badge } from '@/components/ui/badge';
+import { useBroadcasts } from '@/lib/BroadcastProvider';
+
+// Backend language codes for the live broadcast channels; English is the base channel
+const LANGUAGE_CODES: Record<string, string | undefined> = {
+  english: undefined,
+  hindi: 'hi',
+  tamil: 'ta',
+  bengali: 'bn',
+  telugu: 'te',
+  marathi: 'mr',
+};
 
 const ListenerDashboard = () => {
-  const [language, setLanguage] = useState('english');
+  const { language: languageCode, setLanguage: setLanguageCode } = useBroadcasts();
+  const [language, setLanguage] = useState(
+    () => Object.keys(LANGUAGE_CODES).find((name) => LANGUAGE_CODES[name] === languageCode) || 'english'
+  );
   const [announcement, setAnnouncement] = useState<any>(null);
   const [translatedText, setTranslatedText] = useState('');
   const [question, setQuestion] = useState('');
   const [chatHistory, setChatHistory] = useState<Array<{ role: string; content: string }>>([]);
 
+  // Follow live broadcasts in the selected language
+  useEffect(() => {
+    setLanguageCode(LANGUAGE_CODES[language]);
+  }, [language, setLanguageCode]);
+
   useEffect(() => {
     // Load latest announcement from localStorage
     const stored = localStorage.getItem('latestAnnouncement');